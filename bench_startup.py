@@ -0,0 +1,117 @@
+"""啟動時間基準測試
+
+量測三個指標（每項都在全新的 Python 直譯器中執行，避免模組快取影響）：
+
+1. import lol_chat_helper       - 套件本身的匯入成本（應該接近零）
+2. import lol_chat_helper.cli   - CLI 路徑在顯示歡迎畫面前的匯入成本
+3. time-to-prompt               - 從直譯器啟動到聊天迴圈可以接受輸入的時間
+                                  （MCP 停用，不需要 LM Studio 在線）
+
+用法：
+    python bench_startup.py
+    python bench_startup.py --runs 10 --budget-import 0.1 --budget-prompt 4.0
+
+超過預算時以非零狀態碼結束，方便放進 CI。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+IMPORT_PACKAGE = """
+import time
+t0 = time.perf_counter()
+import lol_chat_helper
+print(time.perf_counter() - t0)
+"""
+
+IMPORT_CLI = """
+import time
+t0 = time.perf_counter()
+import lol_chat_helper.cli
+print(time.perf_counter() - t0)
+"""
+
+TIME_TO_PROMPT = """
+import time
+t0 = time.perf_counter()
+import asyncio
+from lol_chat_helper import AppConfig, ChatApp
+
+config = AppConfig.from_env()
+config.mcp.enabled = False
+app = ChatApp(config)
+asyncio.run(app.initialize())
+print(time.perf_counter() - t0)
+"""
+
+
+def run_snippet(code: str) -> float:
+    """在新的直譯器中執行程式片段，回傳其印出的秒數"""
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure(code: str, runs: int) -> dict:
+    """重複量測並回傳統計數據（秒）"""
+    samples = [run_snippet(code) for _ in range(runs)]
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="LOL Chat Helper startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="每個指標的量測次數")
+    parser.add_argument("--budget-import", type=float, default=0.1,
+                        help="import lol_chat_helper 的預算（秒，中位數）")
+    parser.add_argument("--budget-cli", type=float, default=0.15,
+                        help="import lol_chat_helper.cli 的預算（秒，中位數）")
+    parser.add_argument("--budget-prompt", type=float, default=5.0,
+                        help="time-to-prompt 的預算（秒，中位數）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式輸出")
+    args = parser.parse_args()
+
+    metrics = {
+        "import_package": (measure(IMPORT_PACKAGE, args.runs), args.budget_import),
+        "import_cli": (measure(IMPORT_CLI, args.runs), args.budget_cli),
+        "time_to_prompt": (measure(TIME_TO_PROMPT, args.runs), args.budget_prompt),
+    }
+
+    over_budget = [
+        name for name, (stats, budget) in metrics.items()
+        if stats["median"] > budget
+    ]
+
+    if args.json:
+        print(json.dumps({
+            name: {**stats, "budget": budget}
+            for name, (stats, budget) in metrics.items()
+        }, indent=2))
+    else:
+        print(f"{'metric':<16} {'median':>9} {'min':>9} {'max':>9} {'budget':>9}")
+        for name, (stats, budget) in metrics.items():
+            flag = "  ❌" if name in over_budget else ""
+            print(
+                f"{name:<16} {stats['median']:>8.3f}s {stats['min']:>8.3f}s "
+                f"{stats['max']:>8.3f}s {budget:>8.3f}s{flag}"
+            )
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,25 @@
 """LOL Chat Helper - Main entry point."""
 
+import argparse
+
 from lol_chat_helper.cli import ChatApp
 
 
 if __name__ == "__main__":
-    app = ChatApp()
+    parser = argparse.ArgumentParser(description="LOL Chat Helper")
+    parser.add_argument("--profile", action="store_true",
+                        help="分析每個回合的 CPU 與記憶體配置（同 PROFILE_ENABLED=true）")
+    parser.add_argument("--profile-dir", help="分析結果的輸出目錄（預設 .profiles）")
+    args = parser.parse_args()
+
+    config = None
+    if args.profile or args.profile_dir:
+        from lol_chat_helper import AppConfig
+
+        config = AppConfig.from_env()
+        config.profile.enabled = True
+        if args.profile_dir:
+            config.profile.directory = args.profile_dir
+
+    app = ChatApp(config)
     app.run()
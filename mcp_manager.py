@@ -5,15 +5,12 @@ from typing import Optional
 
 from langchain_core.tools import BaseTool
 from langchain_mcp_adapters.client import MultiServerMCPClient
-import os
 import dotenv
 
 # 載入環境變數
 dotenv.load_dotenv()
 
-# 設定日誌
-logging_level = logging.DEBUG  if os.getenv("DEBUG", "false").lower() == "true" else logging.INFO
-logging.basicConfig(level=logging_level)
+# 日誌的 handler 與等級由應用程式設定（setup_logging），匯入時不修改全域設定
 logger = logging.getLogger(__name__)
 
 
@@ -135,62 +132,45 @@ class MCPToolManager:
         tools_config = self.config.get("toolsConfig", {})
         enabled_tools = []
 
-        # DEBUG: Log all tool names to understand format
-        logger.info("=" * 60)
-        logger.info("工具過濾診斷資訊")
-        logger.info("=" * 60)
-        logger.info(f"從 MCP 伺服器載入的工具列表 (共 {len(self.all_tools)} 個):")
-        for i, tool in enumerate(self.all_tools, 1):
-            logger.info(f"  {i}. 名稱: {tool.name}")
-            logger.info(f"     描述: {getattr(tool, 'description', 'N/A')[:100]}")
-
-        logger.info(f"\n配置檔案中的 toolsConfig:")
-        for srv_name, srv_config in tools_config.items():
-            enabled_list = srv_config.get("enabled", [])
-            logger.info(f"  伺服器: {srv_name}")
-            logger.info(f"  啟用列表 (共 {len(enabled_list)} 個): {enabled_list}")
-
-        logger.info("\n開始匹配工具...")
-        logger.info("=" * 60)
+        # 診斷資訊只在 DEBUG 時組成，並合併成一筆紀錄
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            lines = [f"工具過濾診斷資訊：從 MCP 伺服器載入 {len(self.all_tools)} 個工具"]
+            for i, tool in enumerate(self.all_tools, 1):
+                lines.append(f"  {i}. {tool.name}: {(getattr(tool, 'description', None) or 'N/A')[:100]}")
+            for srv_name, srv_config in tools_config.items():
+                enabled_list = srv_config.get("enabled", [])
+                lines.append(f"  toolsConfig[{srv_name}] 啟用 {len(enabled_list)} 個: {enabled_list}")
+            logger.debug("\n".join(lines))
 
         for tool in self.all_tools:
             # 解析工具名稱，提取伺服器名稱和純工具名稱
             server_name, pure_tool_name = self._parse_tool_name(tool.name)
-            logger.debug(f"處理工具: {tool.name}")
-            logger.debug(f"  解析結果 -> 伺服器: '{server_name}', 純名稱: '{pure_tool_name}'")
             is_enabled = False
+            source = server_name
 
             # 檢查該伺服器的 enabled 陣列
             if server_name in tools_config:
                 enabled_list = tools_config[server_name].get("enabled", [])
-                logger.debug(f"  找到伺服器配置 '{server_name}'，enabled 列表: {enabled_list}")
-
-                if pure_tool_name in enabled_list:
-                    is_enabled = True
-                    logger.info(f"✅ 啟用: {tool.name} (匹配到: {pure_tool_name})")
-                else:
-                    logger.debug(f"  '{pure_tool_name}' 不在 enabled 列表中")
+                is_enabled = pure_tool_name in enabled_list
             else:
-                logger.debug(f"  伺服器 '{server_name}' 不在 toolsConfig 中")
                 # 如果找不到對應的伺服器配置，嘗試在所有伺服器的 enabled 陣列中查找
                 for srv_name, srv_config in tools_config.items():
                     enabled_list = srv_config.get("enabled", [])
-                    logger.debug(f"  備用檢查 - 伺服器 {srv_name} 的 enabled 列表: {enabled_list}")
 
                     # 檢查純工具名稱或完整名稱是否在 enabled 陣列中
                     if pure_tool_name in enabled_list or tool.name in enabled_list:
                         is_enabled = True
-                        logger.info(f"✅ 啟用: {tool.name} (從伺服器 {srv_name} 配置中找到)")
+                        source = srv_name
                         break
 
             if is_enabled:
                 enabled_tools.append(tool)
-            else:
-                logger.debug(f"❌ 停用: {tool.name}")
+            if debug:
+                state = f"✅ 啟用 (伺服器 {source} 配置)" if is_enabled else "❌ 停用"
+                logger.debug("%s: %s (解析為 %s / %s)", state, tool.name, server_name, pure_tool_name)
 
-        logger.info("=" * 60)
         logger.info(f"過濾完成：啟用 {len(enabled_tools)}/{len(self.all_tools)} 個工具")
-        logger.info("=" * 60)
 
         return enabled_tools
 
@@ -1,40 +1,77 @@
-"""LOL Chat Helper - A chatbot with memory and MCP tools support."""
+"""LOL Chat Helper - A chatbot with memory and MCP tools support.
 
-from lol_chat_helper.config import AppConfig, ModelConfig, MCPConfig, logger
-from lol_chat_helper.mcp import MCPToolManager
-from lol_chat_helper.prompts import get_system_prompt, get_lol_agent_prompt, PromptTemplates
-from lol_chat_helper.nodes import create_agent_node, create_chat_node, LoggingToolNode
-from lol_chat_helper.graph import GraphBuilder, build_lol_agent, build_general_agent, build_custom_agent
-from lol_chat_helper.cli import ChatApp
+Public names are resolved lazily on first attribute access so that importing
+the package (or a light submodule such as ``config``) does not pull in the
+LangChain / LangGraph / MCP import graph.
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from lol_chat_helper.config import AppConfig, ModelConfig, MCPConfig, MemoryConfig, AgentConfig, HTTPConfig, ProfileConfig, logger
+    from lol_chat_helper.checkpoint import AccountedMemorySaver
+    from lol_chat_helper.mcp import MCPToolManager
+    from lol_chat_helper.prompts import get_system_prompt, get_lol_agent_prompt, PromptTemplates
+    from lol_chat_helper.nodes import create_agent_node, create_chat_node, LoggingToolNode
+    from lol_chat_helper.graph import (
+        GraphBuilder, build_lol_agent, build_lol_plan_agent, build_general_agent, build_custom_agent
+    )
+    from lol_chat_helper.cli import ChatApp
 
 __version__ = "0.2.0"
 
-__all__ = [
+# Public name -> defining submodule
+_LAZY_EXPORTS = {
     # Config
-    "AppConfig",
-    "ModelConfig",
-    "MCPConfig",
-    "logger",
+    "AppConfig": "lol_chat_helper.config",
+    "ModelConfig": "lol_chat_helper.config",
+    "MCPConfig": "lol_chat_helper.config",
+    "MemoryConfig": "lol_chat_helper.config",
+    "AgentConfig": "lol_chat_helper.config",
+    "HTTPConfig": "lol_chat_helper.config",
+    "ProfileConfig": "lol_chat_helper.config",
+    "logger": "lol_chat_helper.config",
 
     # MCP
-    "MCPToolManager",
+    "MCPToolManager": "lol_chat_helper.mcp",
 
     # Prompts
-    "get_system_prompt",
-    "get_lol_agent_prompt",
-    "PromptTemplates",
+    "get_system_prompt": "lol_chat_helper.prompts",
+    "get_lol_agent_prompt": "lol_chat_helper.prompts",
+    "PromptTemplates": "lol_chat_helper.prompts",
+
+    # Checkpointing
+    "AccountedMemorySaver": "lol_chat_helper.checkpoint",
 
     # Nodes
-    "create_agent_node",
-    "create_chat_node",
-    "LoggingToolNode",
+    "create_agent_node": "lol_chat_helper.nodes",
+    "create_chat_node": "lol_chat_helper.nodes",
+    "LoggingToolNode": "lol_chat_helper.nodes",
 
     # Graph
-    "GraphBuilder",
-    "build_lol_agent",
-    "build_general_agent",
-    "build_custom_agent",
+    "GraphBuilder": "lol_chat_helper.graph",
+    "build_lol_agent": "lol_chat_helper.graph",
+    "build_lol_plan_agent": "lol_chat_helper.graph",
+    "build_general_agent": "lol_chat_helper.graph",
+    "build_custom_agent": "lol_chat_helper.graph",
 
     # CLI
-    "ChatApp",
-]
+    "ChatApp": "lol_chat_helper.cli",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """Import the defining submodule on first access and cache the attribute."""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
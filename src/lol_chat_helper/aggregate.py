@@ -0,0 +1,272 @@
+"""Vectorized statistics over locally stored match history."""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.tools import BaseTool, StructuredTool
+
+from lol_chat_helper.matches import MatchStore, CREATED_AT_FIELDS, riot_key
+from lol_chat_helper.metrics import metrics
+
+
+MATCH_STATS_TOOL = "lol_summoner_match_stats"
+GROUP_BY = ("champion", "position", "week", "month", "none")
+
+# 各統計欄位在比賽資料中可能的名稱（支援 "stats.kill" 這類點分隔的巢狀路徑）
+FIELD_CANDIDATES = {
+    "champion": ("champion", "champion_name", "champion.name", "champion_key", "champion_id"),
+    "position": ("position", "role", "lane", "team_position"),
+    "win": ("win", "is_win", "result", "stats.result"),
+    "kills": ("kills", "kill", "stats.kill", "stats.kills"),
+    "deaths": ("deaths", "death", "stats.death", "stats.deaths"),
+    "assists": ("assists", "assist", "stats.assist", "stats.assists"),
+    "cs": ("cs", "total_cs", "minion_kill", "stats.minion_kill", "stats.cs"),
+    "damage": (
+        "damage", "total_damage_dealt_to_champions", "damage_dealt_to_champions",
+        "stats.total_damage_dealt_to_champions",
+    ),
+}
+
+
+def _lookup(row: dict, name: str) -> Any:
+    if name in row:
+        return row[name]
+    value: Any = row
+    for part in name.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _column(rows: list[dict], field: str) -> list[Any]:
+    """以第一個出現在資料中的候選名稱取出一整欄"""
+    names = FIELD_CANDIDATES[field]
+    for name in names:
+        if any(_lookup(row, name) is not None for row in rows):
+            return [_lookup(row, name) for row in rows]
+    return [None] * len(rows)
+
+
+def _as_win(value: Any) -> float:
+    if isinstance(value, str):
+        return 1.0 if value.strip().upper() in ("WIN", "VICTORY", "TRUE", "W") else 0.0
+    return 1.0 if value else 0.0
+
+
+def _as_number(values: list[Any]) -> np.ndarray:
+    return np.array(
+        [float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan
+         for v in values],
+        dtype=np.float64,
+    )
+
+
+def _as_datetime(values: list[Any]) -> np.ndarray:
+    parsed = []
+    for value in values:
+        try:
+            if isinstance(value, (int, float)):
+                # 毫秒或秒的 Unix 時間
+                seconds = value / 1000 if value > 1e11 else value
+                parsed.append(np.datetime64(int(seconds), "s"))
+            else:
+                parsed.append(np.datetime64(str(value)[:19], "s"))
+        except (TypeError, ValueError):
+            parsed.append(np.datetime64("NaT"))
+    return np.array(parsed, dtype="datetime64[s]")
+
+
+@dataclass
+class MatchFrame:
+    """以欄為單位的比賽資料（每個欄位一個 NumPy 陣列）"""
+
+    champion: np.ndarray
+    position: np.ndarray
+    win: np.ndarray
+    kills: np.ndarray
+    deaths: np.ndarray
+    assists: np.ndarray
+    cs: np.ndarray
+    damage: np.ndarray
+    created_at: np.ndarray
+
+    @classmethod
+    def from_matches(cls, matches: list[dict]) -> "MatchFrame":
+        """
+        從比賽摘要列表建立
+
+        Args:
+            matches: MatchStore.recent_matches 取出的比賽
+
+        Returns:
+            MatchFrame
+        """
+        created = [next((m[f] for f in CREATED_AT_FIELDS if m.get(f)), None) for m in matches]
+        return cls(
+            champion=np.array([str(v or "?") for v in _column(matches, "champion")], dtype=object),
+            position=np.array([str(v or "?").upper() for v in _column(matches, "position")], dtype=object),
+            win=np.array([_as_win(v) for v in _column(matches, "win")], dtype=np.float64),
+            kills=_as_number(_column(matches, "kills")),
+            deaths=_as_number(_column(matches, "deaths")),
+            assists=_as_number(_column(matches, "assists")),
+            cs=_as_number(_column(matches, "cs")),
+            damage=_as_number(_column(matches, "damage")),
+            created_at=_as_datetime(created),
+        )
+
+    def __len__(self) -> int:
+        return len(self.win)
+
+    def select(self, mask: np.ndarray) -> "MatchFrame":
+        """依布林遮罩篩選"""
+        return MatchFrame(**{name: getattr(self, name)[mask] for name in self.__dataclass_fields__})
+
+    def group_keys(self, group_by: str) -> np.ndarray:
+        """取得分組鍵"""
+        if group_by == "champion":
+            return self.champion
+        if group_by == "position":
+            return self.position
+        if group_by in ("week", "month"):
+            unit = "W" if group_by == "week" else "M"
+            periods = self.created_at.astype(f"datetime64[{unit}]")
+            return np.array([str(p) if not np.isnat(p) else "?" for p in periods], dtype=object)
+        return np.full(len(self), "all", dtype=object)
+
+
+def aggregate(frame: MatchFrame, group_by: str = "champion") -> list[dict]:
+    """
+    依分組一次計算所有統計
+
+    Args:
+        frame: 比賽資料
+        group_by: champion、position、week、month 或 none
+
+    Returns:
+        每組一個 dict：games、wins、win_rate、kills/deaths/assists 平均、kda、cs、damage；
+        依場數由多到少排序
+    """
+    if len(frame) == 0:
+        return []
+
+    keys, inverse = np.unique(frame.group_keys(group_by).astype(str), return_inverse=True)
+    groups = len(keys)
+    games = np.bincount(inverse, minlength=groups).astype(np.float64)
+
+    def mean(values: np.ndarray) -> np.ndarray:
+        valid = ~np.isnan(values)
+        sums = np.bincount(inverse[valid], weights=values[valid], minlength=groups)
+        counts = np.bincount(inverse[valid], minlength=groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    wins = np.bincount(inverse, weights=frame.win, minlength=groups)
+    kills, deaths, assists = mean(frame.kills), mean(frame.deaths), mean(frame.assists)
+    kda = (kills + assists) / np.maximum(deaths, 1.0)
+    cs, damage = mean(frame.cs), mean(frame.damage)
+
+    order = np.lexsort((keys, -games))
+    return [
+        {
+            group_by if group_by != "none" else "group": str(keys[i]),
+            "games": int(games[i]),
+            "wins": int(wins[i]),
+            "win_rate": wins[i] / games[i],
+            "kills": kills[i],
+            "deaths": deaths[i],
+            "assists": assists[i],
+            "kda": kda[i],
+            "cs": cs[i],
+            "damage": damage[i],
+        }
+        for i in order
+    ]
+
+
+def format_stats(rows: list[dict], title: str) -> str:
+    """將統計結果輸出為精簡的 TSV 表格"""
+    if not rows:
+        return f"## {title}\n（沒有符合條件的比賽）"
+
+    def cell(header: str, value: Any) -> str:
+        if isinstance(value, float):
+            if np.isnan(value):
+                return ""
+            return f"{value:.1%}" if header == "win_rate" else f"{value:.1f}"
+        return str(value)
+
+    headers = list(rows[0])
+    lines = [f"## {title}", "\t".join(headers)]
+    for row in rows:
+        lines.append("\t".join(cell(header, row[header]) for header in headers))
+    return "\n".join(lines)
+
+
+def create_match_stats_tool(store: MatchStore) -> BaseTool:
+    """
+    建立以本地比賽紀錄計算統計的工具
+
+    本地資料不足時，會先經由 lol_list_summoner_matches（含增量同步）補齊。
+
+    Args:
+        store: 本地比賽紀錄庫
+
+    Returns:
+        名為 lol_summoner_match_stats 的工具
+    """
+    async def match_stats(
+        game_name: str,
+        tag_line: str,
+        region: str,
+        group_by: str = "champion",
+        last_n: int = 20,
+        champion: Optional[str] = None,
+        position: Optional[str] = None,
+        lang: str = "en_US"
+    ) -> str:
+        if group_by not in GROUP_BY:
+            return f"group_by 必須是 {', '.join(GROUP_BY)} 之一"
+
+        key = riot_key(game_name, tag_line, region)
+        if store.match_list_tool is not None:
+            # 透過原本的比賽紀錄工具同步（最近同步過時不會呼叫上游）
+            await store.match_list_tool.coroutine(
+                game_name=game_name, tag_line=tag_line, region=region, lang=lang, limit=last_n
+            )
+        matches = await asyncio.to_thread(store.recent_matches, key, lang, last_n)
+        if not matches:
+            return (
+                f"本地沒有 {game_name}#{tag_line} ({region}) 的比賽紀錄，"
+                "請確認 Riot ID 與區域是否正確。"
+            )
+
+        frame = MatchFrame.from_matches(matches)
+        mask = np.ones(len(frame), dtype=bool)
+        if champion:
+            mask &= np.char.upper(frame.champion.astype(str)) == champion.upper()
+        if position:
+            mask &= frame.position.astype(str) == position.upper()
+        frame = frame.select(mask)
+
+        metrics.incr("match_stats.calls")
+        filters = ", ".join(f for f in (champion, position) if f)
+        title = (
+            f"{game_name}#{tag_line} 最近 {len(matches)} 場中的 {len(frame)} 場"
+            f"{f'（{filters}）' if filters else ''}，依 {group_by} 分組"
+        )
+        return format_stats(aggregate(frame, group_by), title)
+
+    return StructuredTool.from_function(
+        coroutine=match_stats,
+        name=MATCH_STATS_TOOL,
+        description=(
+            "Compute a summoner's aggregated stats from their recent matches: games, wins, "
+            "win rate, average kills/deaths/assists, KDA, CS and damage, grouped by champion, "
+            "position, week, month or none. Use this instead of reading raw match lists when "
+            "the user asks for win rates, KDA or averages (e.g. \"Faker's win rate on Ahri in "
+            "his last 50 games\"). Optional filters: champion, position (TOP/JUNGLE/MID/ADC/SUPPORT)."
+        ),
+    )
@@ -0,0 +1,313 @@
+"""Composite tools that fan one question out to several upstream queries."""
+
+import asyncio
+from typing import Any, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.fastpath import ANALYSIS_TOOL, CHAMPIONS_TOOL, LANE_META_TOOL
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.tabular import decode_sections, find_map, parse_ids
+from lol_chat_helper.tooling import content_to_text
+
+
+COMPARE_CHAMPIONS_TOOL = "lol_compare_champions"
+COMPARE_LANE_META_TOOL = "lol_compare_lane_meta"
+LANE_POSITIONS = ("top", "jungle", "mid", "adc", "support")
+# 一次呼叫最多展開的上游查詢數與同時進行的查詢數（速率限制另外生效）
+MAX_QUERIES = 12
+MAX_CONCURRENCY = 4
+
+
+def _percent(value: Any) -> str:
+    return f"{value:.1%}" if isinstance(value, (int, float)) else ""
+
+
+def _number(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return "" if value is None else str(value)
+
+
+def _table(title: str, headers: list[str], rows: list[list[str]], notes: list[str]) -> str:
+    """輸出為精簡的 TSV 表格（與 lol_summoner_match_stats 相同的格式）"""
+    lines = [f"## {title}", "\t".join(headers)]
+    lines += ["\t".join(row) for row in rows]
+    lines += notes
+    return "\n".join(lines)
+
+
+def _positions(values: Optional[list[str]]) -> tuple[list[str], list[str]]:
+    """整理位置參數：(有效的位置, 無法辨識的值)"""
+    valid, unknown = [], []
+    for value in values or []:
+        position = str(value).strip().lower()
+        if position in LANE_POSITIONS:
+            if position not in valid:
+                valid.append(position)
+        else:
+            unknown.append(str(value))
+    return valid, unknown
+
+
+class BatchQueries:
+    """
+    將多個英雄或位置的問題展開成並行的上游查詢
+
+    「比較這五隻英雄的勝率」原本需要模型逐一呼叫 lol_get_champion_analysis，
+    常常分成好幾輪。複合工具接受英雄與位置的列表，同時送出所有查詢，
+    將結果合併成一張精簡的表格放在單一 ToolMessage 中回傳，只需要一次模型往返。
+    上游查詢使用已包裝好呼叫防護、速率限制與快取的工具，行為和模型直接呼叫相同。
+    """
+
+    def __init__(self, tools: dict[str, BaseTool]):
+        """
+        初始化
+
+        Args:
+            tools: 不含伺服器前綴的工具名稱對應的上游工具
+        """
+        self.tools = tools
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        analysis = tools.get(ANALYSIS_TOOL)
+        enum = (analysis.args.get("champion") or {}).get("enum", []) if analysis else []
+        self.champion_enum: set[str] = set(enum)
+
+    async def _call(self, name: str, **args: Any) -> Optional[str]:
+        """呼叫上游工具；失敗或不是資料時回傳 None"""
+        async with self._semaphore:
+            try:
+                text = content_to_text(await self.tools[name].ainvoke(args))
+            except Exception as e:
+                logger.debug(f"[Batch] {name} {args} failed: {e}")
+                return None
+        return text if text.lstrip().startswith("{") else None
+
+    def _champions(self, values: Optional[list[str]]) -> tuple[list[str], list[str]]:
+        """將英雄名稱整理成工具的列舉值（"Lee Sin" -> "LEE_SIN"）：(有效的英雄, 無法辨識的值)"""
+        valid, unknown = [], []
+        for value in values or []:
+            champion = str(value).strip().upper().replace(" ", "_").replace("'", "").replace(".", "")
+            if not self.champion_enum or champion in self.champion_enum:
+                if champion not in valid:
+                    valid.append(champion)
+            else:
+                unknown.append(str(value))
+        return valid, unknown
+
+    async def _champion_keys(self, lang: str) -> dict[str, tuple[str, str]]:
+        """英雄 id -> (列舉值, 顯示名稱)；取得失敗時回傳空 dict"""
+        text = await self._call(CHAMPIONS_TOOL, lang=lang) if CHAMPIONS_TOOL in self.tools else None
+        if text is None:
+            return {}
+        by_compact = {value.replace("_", ""): value for value in self.champion_enum}
+        sections, _ = decode_sections(text)
+        keys = {}
+        for row in next(iter(sections.values()), []):
+            key = str(row.get("key", "")).upper()
+            keys[str(row.get("champion_id"))] = (by_compact.get(key, key), str(row.get("name")))
+        return keys
+
+    # -- lol_compare_champions ----------------------------------------------
+
+    async def compare_champions(
+        self,
+        champions: list[str],
+        positions: Optional[list[str]] = None,
+        game_mode: str = "RANKED",
+        lang: str = "en_US"
+    ) -> str:
+        """
+        並行查詢多個英雄（以及位置）的分析資料並合併成一張表
+
+        Args:
+            champions: 英雄列舉值
+            positions: 位置列表；未指定時使用各英雄的主要位置
+            game_mode: 遊戲模式
+            lang: 語言
+
+        Returns:
+            TSV 表格
+        """
+        champion_list, unknown = self._champions(champions)
+        position_list, bad_positions = _positions(positions)
+        unknown += bad_positions
+        queries = [(c, p) for c in champion_list for p in (position_list or [None])]
+        notes = []
+        if unknown:
+            notes.append(f"（無法辨識：{', '.join(unknown)}）")
+        if not queries:
+            return "\n".join(["沒有可以查詢的英雄。"] + notes)
+        if len(queries) > MAX_QUERIES:
+            notes.append(f"（只查詢了前 {MAX_QUERIES} 組，共 {len(queries)} 組）")
+            queries = queries[:MAX_QUERIES]
+
+        async def query(champion: str, position: Optional[str]) -> Optional[str]:
+            args = {"champion": champion, "game_mode": game_mode, "lang": lang}
+            if position:
+                args["position"] = position
+            return await self._call(ANALYSIS_TOOL, **args)
+
+        results = await asyncio.gather(*(query(c, p) for c, p in queries))
+        metrics.incr("batch.fanout", len(queries))
+
+        headers = [
+            "champion", "position", "tier", "rank", "games", "win_rate",
+            "pick_rate", "ban_rate", "kda", "core_items", "weak_against",
+        ]
+        rows, failed = [], []
+        for (champion, position), text in zip(queries, results):
+            row = self._analysis_row(text) if text else None
+            if row is None:
+                failed.append(f"{champion}{f'/{position}' if position else ''}")
+                continue
+            rows.append([champion, row.pop("position") or (position or "").upper()] + list(row.values()))
+        if failed:
+            notes.append(f"（資料暫時無法取得：{', '.join(failed)}）")
+        return _table(f"{game_mode} 英雄比較（{len(rows)} 組）", headers, rows, notes)
+
+    @staticmethod
+    def _analysis_row(text: str) -> Optional[dict[str, str]]:
+        """從 lol_get_champion_analysis 的結果取出比較用的欄位"""
+        sections, extra = decode_sections(text)
+        summary = (sections.get("summary") or [None])[0]
+        if not summary:
+            return None
+        champion_names = find_map(extra, "champion_ids")
+        item_names = find_map(extra, "item_ids")
+        core = (sections.get("core_items") or [{}])[0]
+        counters = sorted(
+            sections.get("weak_counters") or [], key=lambda row: row.get("win_rate") or 0, reverse=True
+        )[:3]
+        return {
+            "position": str(extra.get("position") or "").upper(),
+            "tier": _number(summary.get("average_stats.tier")),
+            "rank": _number(summary.get("average_stats.rank")),
+            "games": _number(summary.get("average_stats.play")),
+            "win_rate": _percent(summary.get("average_stats.win_rate")),
+            "pick_rate": _percent(summary.get("average_stats.pick_rate")),
+            "ban_rate": _percent(summary.get("average_stats.ban_rate")),
+            "kda": _number(summary.get("average_stats.kda")),
+            "core_items": " > ".join(item_names.get(i, f"#{i}") for i in parse_ids(core.get("ids"))),
+            "weak_against": ", ".join(
+                champion_names.get(str(row.get("champion_id")), f"#{row.get('champion_id')}")
+                for row in counters
+            ),
+        }
+
+    # -- lol_compare_lane_meta ----------------------------------------------
+
+    async def compare_lane_meta(
+        self,
+        positions: Optional[list[str]] = None,
+        champions: Optional[list[str]] = None,
+        top_n: int = 5,
+        lang: str = "en_US"
+    ) -> str:
+        """
+        查詢多個位置的路線 meta 並合併成一張表
+
+        只送出一次 position="all" 的查詢（與靜態資料快照、結果快取中的資料集相同），
+        在本地依位置拆開，不會每個位置各查一次上游。
+
+        Args:
+            positions: 位置列表；未指定時查詢全部位置
+            champions: 只列出這些英雄；未指定時列出各位置梯隊前 top_n 名
+            top_n: 未指定英雄時每個位置列出的數量
+            lang: 語言
+
+        Returns:
+            TSV 表格
+        """
+        position_list, unknown = _positions(positions)
+        champion_list, bad_champions = self._champions(champions)
+        unknown += bad_champions
+        notes = [f"（無法辨識：{', '.join(unknown)}）"] if unknown else []
+        position_list = position_list or list(LANE_POSITIONS)
+        if champions and not champion_list:
+            return "\n".join(["沒有可以查詢的英雄。"] + notes)
+
+        keys, text = await asyncio.gather(
+            self._champion_keys(lang),
+            self._call(LANE_META_TOOL, position="all", lang=lang),
+        )
+        metrics.incr("batch.fanout")
+        if text is None:
+            return "\n".join(["路線 meta 資料暫時無法取得。"] + notes)
+
+        lanes: dict[str, list[dict]] = {}
+        sections, _ = decode_sections(text)
+        for section, section_rows in sections.items():
+            lanes.setdefault(section.rsplit(".", 1)[-1], []).extend(section_rows)
+
+        wanted = set(champion_list)
+        headers = ["position", "champion", "tier", "rank", "win_rate", "pick_rate", "ban_rate", "kda"]
+        rows, failed = [], []
+        for position in position_list:
+            if position not in lanes:
+                failed.append(position)
+                continue
+            lane_rows = [row for row in lanes[position] if not row.get("is_rip")]
+            lane_rows.sort(key=lambda row: (row.get("tier") or 9, row.get("rank") or 999))
+            if wanted:
+                lane_rows = [
+                    row for row in lane_rows
+                    if keys.get(str(row.get("champion_id")), ("",))[0] in wanted
+                ]
+            else:
+                lane_rows = lane_rows[:max(1, top_n)]
+            for row in lane_rows:
+                champion_id = str(row.get("champion_id"))
+                name = keys.get(champion_id, (None, f"#{champion_id}"))[1]
+                rows.append([
+                    position.upper(), name, _number(row.get("tier")), _number(row.get("rank")),
+                    _percent(row.get("win_rate")), _percent(row.get("pick_rate")),
+                    _percent(row.get("ban_rate")), _number(row.get("kda")),
+                ])
+        if failed:
+            notes.append(f"（沒有這些位置的資料：{', '.join(failed)}）")
+        if wanted and not keys:
+            notes.append("（無法取得英雄列表，無法依英雄篩選）")
+        return _table(f"路線 meta（{', '.join(position_list)}）", headers, rows, notes)
+
+
+def create_batch_tools(tools: dict[str, BaseTool]) -> dict[str, BaseTool]:
+    """
+    建立複合查詢工具
+
+    Args:
+        tools: 不含伺服器前綴的工具名稱對應的上游工具（已包裝好呼叫防護與快取）
+
+    Returns:
+        工具名稱對應工具；上游缺少對應工具時不建立
+    """
+    batch = BatchQueries(tools)
+    created: dict[str, BaseTool] = {}
+    if ANALYSIS_TOOL in tools:
+        created[COMPARE_CHAMPIONS_TOOL] = StructuredTool.from_function(
+            coroutine=batch.compare_champions,
+            name=COMPARE_CHAMPIONS_TOOL,
+            description=(
+                "Compare several champions in ONE call: tier, rank, games, win rate, pick rate, "
+                "ban rate, KDA, core items and the champions each one is weak against, returned as "
+                "one table. Use this instead of calling lol_get_champion_analysis once per champion "
+                "whenever the user asks about two or more champions (e.g. \"compare Ahri, Lux and "
+                "Syndra\") or one champion in several positions. champions use the same names as "
+                f"lol_get_champion_analysis (e.g. AHRI, LEE_SIN), max {MAX_QUERIES} champion/position "
+                "pairs; positions: top, jungle, mid, adc, support (omit for each champion's main position)."
+            ),
+        )
+    if LANE_META_TOOL in tools:
+        created[COMPARE_LANE_META_TOOL] = StructuredTool.from_function(
+            coroutine=batch.compare_lane_meta,
+            name=COMPARE_LANE_META_TOOL,
+            description=(
+                "Lane meta for several positions in ONE call, as one table: tier, rank, win rate, pick "
+                "rate, ban rate and KDA. Give champions to see where those champions stand in each "
+                "position (e.g. \"is Sett better top or support?\"), or omit them for the top_n "
+                "champions of each position. positions: top, jungle, mid, adc, support (omit for all). "
+                "Use this instead of calling lol_list_lane_meta_champions once per position."
+            ),
+        )
+    return created
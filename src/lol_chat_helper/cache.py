@@ -0,0 +1,113 @@
+"""Cache of full tool results that were replaced by digests in the conversation."""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from lol_chat_helper.metrics import metrics
+
+
+RECALL_TOOL_NAME = "recall_tool_result"
+
+
+class ToolResultCache:
+    """
+    以參照 id 為鍵的工具結果快取
+
+    對話中的舊工具結果被摘要取代後，完整內容保存在這裡，模型需要時可以
+    透過 recall 工具取回。依最近使用順序（LRU）保留，總大小不超過 max_bytes。
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        """
+        初始化快取
+
+        Args:
+            max_bytes: 快取內容的總大小上限（以 UTF-8 位元組計）
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self.total_bytes = 0
+
+    def put(self, key: str, content: str):
+        """
+        存入內容（已存在時更新並標記為最近使用）
+
+        Args:
+            key: 參照 id
+            content: 完整內容
+        """
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._sizes[key]
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(evicted)
+                metrics.incr("tool_cache.evicted")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        取得內容
+
+        Args:
+            key: 參照 id
+
+        Returns:
+            完整內容；不存在或已被淘汰時回傳 None
+        """
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                metrics.incr("tool_cache.miss")
+                return None
+            self._entries.move_to_end(key)
+        metrics.incr("tool_cache.hit")
+        return content
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
+def create_recall_tool(cache: ToolResultCache) -> BaseTool:
+    """
+    建立取回已歸檔工具結果的工具
+
+    Args:
+        cache: 保存完整工具結果的快取
+
+    Returns:
+        名為 recall_tool_result 的工具
+    """
+    def recall_tool_result(ref: str) -> str:
+        content = cache.get(ref)
+        if content is None:
+            return f"找不到 ref={ref} 的完整內容（可能已過期），請重新呼叫原本的工具查詢。"
+        return content
+
+    async def arecall_tool_result(ref: str) -> str:
+        return recall_tool_result(ref)
+
+    return StructuredTool.from_function(
+        func=recall_tool_result,
+        coroutine=arecall_tool_result,
+        name=RECALL_TOOL_NAME,
+        description=(
+            "取回先前對話中已歸檔的完整工具結果。當舊的工具結果只剩摘要"
+            "（標示為 [已歸檔的工具結果 ref=...]）而你需要其中的細節時使用，"
+            "參數 ref 為摘要中的參照 id。"
+        ),
+    )
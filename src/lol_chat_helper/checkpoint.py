@@ -0,0 +1,502 @@
+"""Memory-accounted conversation checkpointer with LRU spill to disk.
+
+Large ToolMessage bodies are stored once, by content hash, in a shared
+reference-counted ``ContentStore``; checkpoints only keep the hash.
+"""
+
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import weakref
+import tempfile
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from langchain_core.messages import ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+
+
+def _typed_size(value: Any) -> int:
+    """序列化後的 (type, bytes) 或包含它的 tuple 所佔的位元組數"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(_typed_size(item) for item in value)
+    return 0
+
+
+CONTENT_REF_KEY = "content_ref"
+
+
+class ContentStore:
+    """
+    以內容雜湊為鍵、具參照計數的共用內容儲存區
+
+    同一份工具結果（例如 lol_list_items）不論出現在幾個對話、幾個 checkpoint，
+    都只保存一份；參照數歸零時才釋放。
+    """
+
+    def __init__(self):
+        """初始化空的儲存區"""
+        self._lock = threading.Lock()
+        self._contents: dict[str, Any] = {}
+        self._sizes: dict[str, int] = {}
+        self._refs: Counter = Counter()
+        self.total_bytes = 0
+
+    def put(self, content: Any, digest: Optional[str] = None) -> str:
+        """
+        存入內容並增加一個參照
+
+        Args:
+            content: 字串或 content block 列表
+            digest: 已知的內容雜湊；內容仍在儲存區時直接增加參照，不重新計算
+
+        Returns:
+            內容雜湊
+        """
+        if digest is not None:
+            with self._lock:
+                if digest in self._contents:
+                    self._refs[digest] += 1
+                    return digest
+        encoded = json.dumps(content, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        digest = hashlib.sha256(encoded).hexdigest()[:32]
+        with self._lock:
+            if digest not in self._contents:
+                self._contents[digest] = content
+                self._sizes[digest] = len(encoded)
+                self.total_bytes += len(encoded)
+            self._refs[digest] += 1
+        return digest
+
+    def get(self, digest: str) -> Optional[Any]:
+        """依雜湊取得內容（已釋放時回傳 None）"""
+        return self._contents.get(digest)
+
+    def entry(self, digest: str) -> Optional[tuple[Any, int]]:
+        """依雜湊取得 (內容, 位元組數)，寫到磁碟時使用（已釋放時回傳 None）"""
+        with self._lock:
+            if digest not in self._contents:
+                return None
+            return self._contents[digest], self._sizes[digest]
+
+    def restore(self, digest: str, content: Any, size: int, count: int):
+        """
+        放回從磁碟載入的內容並增加參照（不重新計算雜湊）
+
+        Args:
+            digest: 內容雜湊
+            content: 內容
+            size: 位元組數
+            count: 增加的參照數
+        """
+        with self._lock:
+            if digest not in self._contents:
+                self._contents[digest] = content
+                self._sizes[digest] = size
+                self.total_bytes += size
+            self._refs[digest] += count
+
+    def release(self, digest: str, count: int = 1):
+        """
+        減少參照，歸零時釋放內容
+
+        Args:
+            digest: 內容雜湊
+            count: 減少的參照數
+        """
+        with self._lock:
+            self._refs[digest] -= count
+            if self._refs[digest] <= 0:
+                del self._refs[digest]
+                self._contents.pop(digest, None)
+                self.total_bytes -= self._sizes.pop(digest, 0)
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+
+def _map_tool_messages(
+    value: Any,
+    fn: Callable[[ToolMessage], ToolMessage],
+    depth: int = 0
+) -> Any:
+    """對 value 中（list/dict 巢狀）的每個 ToolMessage 套用 fn，未變更時回傳原物件"""
+    if isinstance(value, ToolMessage):
+        return fn(value)
+    if depth >= 3:
+        return value
+    if type(value) is list:
+        mapped = [_map_tool_messages(item, fn, depth + 1) for item in value]
+        return mapped if any(a is not b for a, b in zip(mapped, value)) else value
+    if type(value) is dict:
+        mapped = {key: _map_tool_messages(item, fn, depth + 1) for key, item in value.items()}
+        return mapped if any(mapped[key] is not value[key] for key in value) else value
+    return value
+
+
+class DedupSerializer(SerializerProtocol):
+    """
+    把大型 ToolMessage 內容移到 ContentStore 的序列化器
+
+    序列化時以雜湊取代工具結果內容（記錄在 response_metadata 中），
+    載入 state 時再依雜湊補回。外層的 checkpointer 可以用 ``collect()``
+    取得一次寫入所新增的參照，以便刪除對話時釋放。
+    """
+
+    def __init__(
+        self,
+        store: ContentStore,
+        serde: Optional[SerializerProtocol] = None,
+        min_bytes: int = 1024
+    ):
+        """
+        初始化序列化器
+
+        Args:
+            store: 共用內容儲存區
+            serde: 實際負責序列化的 serializer（預設 JsonPlusSerializer）
+            min_bytes: 內容至少多大才移到儲存區
+        """
+        self.store = store
+        self.serde = serde or JsonPlusSerializer()
+        self.min_bytes = min_bytes
+        self._collected: Optional[Counter] = None
+        # id(message) -> (弱參照, 當時的 content, 雜湊)：state 中的同一則訊息每次寫入
+        # checkpoint 都會再序列化一次，記住雜湊就不必重新計算
+        self._digests: dict[int, tuple[weakref.ref, Any, str]] = {}
+
+    def _remember(self, message: ToolMessage, digest: str):
+        key = id(message)
+        ref = weakref.ref(message, lambda _, key=key: self._digests.pop(key, None))
+        self._digests[key] = (ref, message.content, digest)
+
+    def _known_digest(self, message: ToolMessage) -> Optional[str]:
+        entry = self._digests.get(id(message))
+        if entry is None or entry[0]() is not message or entry[1] is not message.content:
+            return None
+        return entry[2]
+
+    @contextmanager
+    def collect(self) -> Iterator[Counter]:
+        """收集區塊內序列化時新增的內容參照"""
+        self._collected = collected = Counter()
+        try:
+            yield collected
+        finally:
+            self._collected = None
+
+    def _dehydrate(self, message: ToolMessage) -> ToolMessage:
+        content = message.content
+        known = self._known_digest(message)
+        if known is None and (not content or len(str(content)) < self.min_bytes):
+            return message
+        digest = self.store.put(content, known)
+        if known is None:
+            self._remember(message, digest)
+        if self._collected is not None:
+            self._collected[digest] += 1
+        return message.model_copy(update={
+            "content": "",
+            "response_metadata": {**message.response_metadata, CONTENT_REF_KEY: digest},
+        })
+
+    def _rehydrate(self, message: ToolMessage) -> ToolMessage:
+        digest = message.response_metadata.get(CONTENT_REF_KEY)
+        if digest is None:
+            return message
+        content = self.store.get(digest)
+        if content is None:
+            logger.warning(f"找不到工具結果內容 {digest}，可能已被釋放")
+            content = "[工具結果已釋放]"
+        metadata = {k: v for k, v in message.response_metadata.items() if k != CONTENT_REF_KEY}
+        restored = message.model_copy(update={"content": content, "response_metadata": metadata})
+        self._remember(restored, digest)
+        return restored
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        return self.serde.dumps_typed(_map_tool_messages(obj, self._dehydrate))
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        return _map_tool_messages(self.serde.loads_typed(data), self._rehydrate)
+
+
+class AccountedMemorySaver(MemorySaver):
+    """
+    記錄每個對話執行緒記憶體用量的 MemorySaver
+
+    每個 thread_id 的 checkpoint、pending writes 和 channel blob 都以序列化後的
+    位元組數計算（近似值），加上共用 ContentStore 的大小即為總用量。總用量
+    超過 max_bytes 時，依最近使用順序（LRU）把閒置的執行緒寫到 spill_dir，
+    從記憶體移除；之後再讀寫該執行緒時會自動載回，對 graph 而言完全透明。
+    沒有 spill 目錄時，超量的閒置執行緒會直接被淘汰。
+
+    大型工具結果經由 DedupSerializer 存在共用的 ContentStore，每個執行緒記錄
+    自己持有的參照，刪除或淘汰執行緒時釋放。寫到磁碟的執行緒連同它參照的
+    內容一起寫出並釋放參照，只有其他仍在記憶體中的執行緒也用到的內容會留下。
+
+    ``list(None)`` 只列出目前在記憶體中的執行緒。
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 0,
+        spill_dir: Optional[str] = None,
+        dedup_min_bytes: int = 1024,
+        **kwargs: Any
+    ):
+        """
+        初始化 checkpointer
+
+        Args:
+            max_bytes: 所有執行緒合計的記憶體上限（位元組），0 表示不限制
+            spill_dir: 存放閒置執行緒的目錄；實際檔案寫在其中的專屬子目錄，
+                       None 時使用系統暫存目錄，設為空字串則不落地、直接淘汰
+            dedup_min_bytes: 工具結果至少多大才以內容雜湊共用，0 表示停用
+            **kwargs: 傳給 MemorySaver（例如 serde）
+        """
+        self.content_store = ContentStore()
+        self._dedup: Optional[DedupSerializer] = None
+        if dedup_min_bytes > 0:
+            self._dedup = DedupSerializer(
+                self.content_store, kwargs.pop("serde", None), min_bytes=dedup_min_bytes
+            )
+            kwargs["serde"] = self._dedup
+        super().__init__(**kwargs)
+        self.max_bytes = max_bytes
+        self.spill_dir: Optional[str] = None
+        if max_bytes > 0 and spill_dir != "":
+            if spill_dir:
+                os.makedirs(spill_dir, exist_ok=True)
+            self.spill_dir = tempfile.mkdtemp(prefix="threads-", dir=spill_dir or None)
+
+        self._lock = threading.RLock()
+        # 在記憶體中的執行緒，依最近使用排序（最舊在前）
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._keys: dict[str, dict[str, set]] = defaultdict(
+            lambda: {"writes": set(), "blobs": set()}
+        )
+        self._spilled: set[str] = set()
+        # 每個執行緒持有的共用內容參照
+        self._refs: dict[str, Counter] = defaultdict(Counter)
+        self.total_bytes = 0
+
+    # -- BaseCheckpointSaver -------------------------------------------------
+
+    def get_tuple(self, config):
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_tuple(config)
+
+    def list(self, config, **kwargs):
+        with self._lock:
+            if config:
+                self._touch(config["configurable"]["thread_id"])
+            # 在鎖內取出全部結果，避免迭代時執行緒被移出記憶體
+            return iter(list(super().list(config, **kwargs)))
+
+    def get_delta_channel_history(self, *, config, channels):
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_delta_channel_history(config=config, channels=channels)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._touch(thread_id)
+            with self._collect_refs(thread_id):
+                result = super().put(config, checkpoint, metadata, new_versions)
+
+            added = _typed_size(self.storage[thread_id][checkpoint_ns][checkpoint["id"]])
+            keys = self._keys[thread_id]["blobs"]
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                keys.add(key)
+                added += _typed_size(self.blobs.get(key))
+
+            self._account(thread_id, added)
+            return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        outer_key = (
+            thread_id,
+            config["configurable"].get("checkpoint_ns", ""),
+            config["configurable"]["checkpoint_id"],
+        )
+        with self._lock:
+            self._touch(thread_id)
+            before = self._writes_size(outer_key)
+            with self._collect_refs(thread_id):
+                super().put_writes(config, writes, task_id, task_path)
+            self._keys[thread_id]["writes"].add(outer_key)
+            self._account(thread_id, self._writes_size(outer_key) - before)
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            super().delete_thread(thread_id)
+            self.total_bytes -= self._sizes.pop(thread_id, 0)
+            self._keys.pop(thread_id, None)
+            for digest, count in self._refs.pop(thread_id, Counter()).items():
+                self.content_store.release(digest, count)
+            if thread_id in self._spilled:
+                self._spilled.discard(thread_id)
+                self._remove_spill_file(thread_id)
+
+    # -- Accounting ----------------------------------------------------------
+
+    @contextmanager
+    def _collect_refs(self, thread_id: str) -> Iterator[None]:
+        """把區塊內新增的共用內容參照記在執行緒名下"""
+        if self._dedup is None:
+            yield
+            return
+        with self._dedup.collect() as collected:
+            yield
+        self._refs[thread_id].update(collected)
+
+    def _writes_size(self, outer_key: tuple) -> int:
+        return sum(_typed_size(value) for value in self.writes.get(outer_key, {}).values())
+
+    def _touch(self, thread_id: str):
+        """標記執行緒為最近使用，已寫到磁碟時先載回"""
+        if thread_id in self._spilled:
+            self._reload(thread_id)
+            if self.max_bytes > 0 and self._used_bytes() > self.max_bytes:
+                self._enforce_cap(keep=thread_id)
+        if thread_id in self._sizes:
+            self._sizes.move_to_end(thread_id)
+        else:
+            self._sizes[thread_id] = 0
+
+    def _used_bytes(self) -> int:
+        """執行緒資料加上共用內容的總用量"""
+        return self.total_bytes + self.content_store.total_bytes
+
+    def _account(self, thread_id: str, added: int):
+        self._sizes[thread_id] += added
+        self.total_bytes += added
+        if self.max_bytes > 0 and self._used_bytes() > self.max_bytes:
+            self._enforce_cap(keep=thread_id)
+
+    def _enforce_cap(self, keep: str):
+        """依 LRU 順序移出閒置執行緒，直到低於上限（目前使用中的執行緒除外）"""
+        for thread_id in list(self._sizes):
+            if self._used_bytes() <= self.max_bytes:
+                break
+            if thread_id == keep:
+                continue
+            if self.spill_dir:
+                self._spill(thread_id)
+            else:
+                size = self._sizes.get(thread_id, 0)
+                self.delete_thread(thread_id)
+                metrics.incr("checkpoint.evicted")
+                logger.warning(f"對話記憶超過上限，已淘汰閒置執行緒 {thread_id}（{size} bytes）")
+
+    # -- Spill / reload ------------------------------------------------------
+
+    def _spill_path(self, thread_id: str) -> str:
+        digest = hashlib.sha1(thread_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}.pkl")
+
+    def _spill(self, thread_id: str):
+        """把執行緒的所有資料寫到磁碟並從記憶體移除"""
+        keys = self._keys.pop(thread_id, {"writes": set(), "blobs": set()})
+        size = self._sizes.pop(thread_id, 0)
+        refs = self._refs.pop(thread_id, Counter())
+        contents = {}
+        for digest, count in refs.items():
+            entry = self.content_store.entry(digest)
+            if entry is not None:
+                contents[digest] = (*entry, count)
+        data = {
+            "thread_id": thread_id,
+            "size": size,
+            "storage": {ns: dict(cps) for ns, cps in self.storage.pop(thread_id, {}).items()},
+            "writes": {key: self.writes.pop(key) for key in keys["writes"] if key in self.writes},
+            "blobs": {key: self.blobs.pop(key) for key in keys["blobs"] if key in self.blobs},
+            "contents": contents,
+        }
+
+        path = self._spill_path(thread_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        # 內容已經寫進檔案；沒有其他執行緒參照的部分在這裡釋放
+        for digest, count in refs.items():
+            self.content_store.release(digest, count)
+
+        self._spilled.add(thread_id)
+        self.total_bytes -= size
+        metrics.incr("checkpoint.spilled")
+        logger.debug(f"已將閒置執行緒 {thread_id} 寫入磁碟（{size} bytes）")
+
+    def _reload(self, thread_id: str):
+        """從磁碟載回執行緒"""
+        path = self._spill_path(thread_id)
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+
+        namespaces = self.storage[thread_id]
+        for ns, checkpoints in data["storage"].items():
+            namespaces[ns].update(checkpoints)
+        for key, value in data["writes"].items():
+            self.writes[key].update(value)
+        self.blobs.update(data["blobs"])
+        for digest, (content, content_size, count) in data.get("contents", {}).items():
+            self.content_store.restore(digest, content, content_size, count)
+            self._refs[thread_id][digest] += count
+
+        keys = self._keys[thread_id]
+        keys["writes"].update(data["writes"])
+        keys["blobs"].update(data["blobs"])
+        self._sizes[thread_id] = self._sizes.get(thread_id, 0) + data["size"]
+        self.total_bytes += data["size"]
+
+        self._spilled.discard(thread_id)
+        self._remove_spill_file(thread_id)
+        metrics.incr("checkpoint.reloaded")
+        logger.debug(f"已從磁碟載回執行緒 {thread_id}（{data['size']} bytes）")
+
+    def _remove_spill_file(self, thread_id: str):
+        try:
+            os.remove(self._spill_path(thread_id))
+        except FileNotFoundError:
+            pass
+
+    # -- Lifecycle -----------------------------------------------------------
+
+    def status(self) -> dict:
+        """取得記憶體用量統計"""
+        with self._lock:
+            return {
+                "threads_in_memory": len(self._sizes),
+                "threads_spilled": len(self._spilled),
+                "bytes": self._used_bytes(),
+                "thread_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "shared_contents": len(self.content_store),
+                "shared_bytes": self.content_store.total_bytes,
+            }
+
+    def close(self):
+        """刪除本實例寫到磁碟的所有執行緒檔案"""
+        with self._lock:
+            if self.spill_dir:
+                shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self._spilled.clear()
@@ -1,13 +1,26 @@
 """CLI module for LOL Chat Helper."""
 
-from .app import ChatApp
-from .display import display_welcome, display_history, display_tools_status
+from .display import (
+    display_welcome, display_history, display_tools_status, display_metrics, display_profile
+)
 from .commands import CommandHandler
 
+
+def __getattr__(name: str):
+    # ChatApp pulls in the model/graph stack; load it only when asked for.
+    if name == "ChatApp":
+        from .app import ChatApp
+
+        return ChatApp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     "ChatApp",
     "display_welcome",
     "display_history",
     "display_tools_status",
+    "display_metrics",
+    "display_profile",
     "CommandHandler",
 ]
@@ -1,17 +1,17 @@
 """Main chat application."""
 
 import uuid
+import signal
 import asyncio
-from typing import Optional
+from typing import Coroutine, Optional, TYPE_CHECKING
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
-
-from ..config import AppConfig, logger
-from ..mcp import MCPToolManager
-from ..graph import build_lol_agent
+from ..config import AppConfig, logger, setup_logging
 from .display import display_welcome
 from .commands import CommandHandler
+from .input import AsyncLineReader
+
+if TYPE_CHECKING:
+    from ..mcp import MCPToolManager
 
 
 class ChatApp:
@@ -25,22 +25,46 @@ class ChatApp:
             config: 應用程式配置（如未提供則從環境變數載入）
         """
         self.config = config or AppConfig.from_env()
+        setup_logging(self.config.log_level, self.config.log_file)
         self.app = None
-        self.mcp_manager: Optional[MCPToolManager] = None
+        self.model = None
+        self.role_models: dict = {}
+        self.http_clients = None
+        self.checkpointer = None
+        self.result_cache = None
+        self.mcp_manager: Optional["MCPToolManager"] = None
+        self.profiler = None
         self.command_handler: Optional[CommandHandler] = None
         self.has_tools = False
+        self.reader: Optional[AsyncLineReader] = None
+        self._answer_task: Optional[asyncio.Task] = None
+        self._background_tasks: set[asyncio.Task] = set()
+        self._exit_requested = False
 
     async def initialize(self):
         """初始化應用程式（非同步）"""
-        # 初始化模型
+        # 重量級依賴延遲到此處載入，讓歡迎畫面可以先顯示
+        from langchain_openai import ChatOpenAI
+        from ..mcp import MCPToolManager
+        from ..checkpoint import AccountedMemorySaver
+        from ..cache import ToolResultCache
+        from ..transport import ModelHTTPClients
+
+        if self.config.profile.enabled:
+            from ..profiling import TurnProfiler
+            self.profiler = TurnProfiler.from_config(self.config.profile)
+
+        # 初始化模型（主要模型撰寫回答，其他角色可以使用較小的模型）
+        # 所有模型共用同一個 keep-alive 連線池
         logger.info("正在初始化語言模型...")
-        model = ChatOpenAI(
-            base_url=self.config.model.base_url,
-            api_key=self.config.model.api_key,
-            model=self.config.model.model_name,
-            temperature=self.config.model.temperature,
-            streaming=self.config.model.streaming,
-        )
+        self.http_clients = ModelHTTPClients(self.config.http)
+        self.model = self._create_model(ChatOpenAI, self.config.model, self.http_clients)
+        self.role_models = {
+            role: self._create_model(ChatOpenAI, profile, self.http_clients)
+            for role, profile in self.config.profiles.items()
+        }
+        for role, profile in self.config.profiles.items():
+            logger.info(f"{role} 使用模型 {profile.model_name}")
 
         # 初始化 MCP 工具
         tools = []
@@ -61,18 +85,118 @@ class ChatApp:
                 tools = []
                 self.has_tools = False
 
-        # 建構 graph
+        # 建構 graph（checkpointer 獨立保存，重建 graph 時對話不會遺失）
         logger.info("正在建構 agent graph...")
-        self.app = build_lol_agent(model=model, tools=tools, enable_memory=True)
+        self.checkpointer = AccountedMemorySaver(
+            max_bytes=int(self.config.memory.max_mb * 1024 * 1024),
+            spill_dir=self.config.memory.spill_dir,
+            dedup_min_bytes=self.config.memory.dedup_min_bytes,
+        )
+        if self.config.memory.age_tool_results:
+            self.result_cache = ToolResultCache(int(self.config.memory.tool_cache_mb * 1024 * 1024))
+        self._build_graph(tools)
 
         # 初始化命令處理器
-        self.command_handler = CommandHandler(self.app, self.mcp_manager)
+        self.command_handler = CommandHandler(self.app, self.mcp_manager, self.profiler)
+
+        # 監看 MCP 配置，toolsConfig 變更時熱重載工具
+        if self.mcp_manager and self.config.mcp.reload_interval > 0:
+            self.spawn_background(
+                self.mcp_manager.watch_config(
+                    self._on_tools_changed, self.config.mcp.reload_interval
+                ),
+                name="mcp-config-watcher",
+            )
+
+        # 載入（或依新版本重建）靜態資料快照，之後定期檢查遊戲版本
+        if self.mcp_manager and self.mcp_manager.static_data:
+            self.spawn_background(
+                self.mcp_manager.static_data.maintain(), name="static-snapshot"
+            )
+
+        # 熱門查詢在快取過期前以背景優先權重新查詢
+        if self.mcp_manager and self.mcp_manager.cache_warmer:
+            self.spawn_background(self.mcp_manager.cache_warmer.run(), name="cache-warmer")
 
         if self.has_tools:
             logger.info("聊天機器人已啟動（含 MCP 工具）")
         else:
             logger.info("聊天機器人已啟動（純聊天模式）")
 
+    @staticmethod
+    def _create_model(chat_class, profile, http_clients=None):
+        """依模型設定建立 chat model（http_clients 提供共用的連線池）"""
+        return chat_class(
+            base_url=profile.base_url,
+            api_key=profile.api_key,
+            model=profile.model_name,
+            temperature=profile.temperature,
+            streaming=profile.streaming,
+            max_tokens=profile.max_tokens,
+            **(http_clients.model_kwargs() if http_clients else {}),
+        )
+
+    def _build_graph(self, tools: list):
+        """以目前的模型與 checkpointer 建構 graph"""
+        from ..graph import build_lol_agent
+        from ..results import TabularResultFilter
+        from ..encoding import ToolResultEncoder
+        from ..nodes import TokenBudgeter
+
+        # 先裁剪、再編碼為精簡格式
+        result_processors = []
+        if self.mcp_manager:
+            result_processors.append(TabularResultFilter.from_config(self.mcp_manager.config))
+            result_processors.append(ToolResultEncoder.from_config(self.mcp_manager.config))
+
+        fast_path = None
+        if self.mcp_manager and self.config.agent.fast_path:
+            from ..fastpath import FastPath
+            fast_path = FastPath.from_tools(
+                tools,
+                pure_name=self.mcp_manager.registry.pure_name_of,
+                lang=self.config.agent.fast_path_lang,
+            )
+
+        turn_budget = None
+        agent_config = self.config.agent
+        if agent_config.turn_deadline > 0 or agent_config.turn_max_steps > 0:
+            from ..turns import TurnBudget
+            turn_budget = TurnBudget(
+                deadline=agent_config.turn_deadline,
+                max_steps=agent_config.turn_max_steps,
+                answer_reserve=agent_config.answer_reserve,
+            )
+
+        budgeter = None
+        if self.config.model.context_budget > 0:
+            budgeter = TokenBudgeter(
+                self.config.model.context_budget, tokenizer=self.config.model.tokenizer
+            )
+
+        self.app = build_lol_agent(
+            model=self.model,
+            tools=tools,
+            enable_memory=True,
+            checkpointer=self.checkpointer,
+            result_processors=result_processors,
+            budgeter=budgeter,
+            result_cache=self.result_cache,
+            plan_steps=self.config.agent.plan_steps,
+            routing=self.config.agent.routing,
+            router_model=self.role_models.get("router"),
+            tool_model=self.role_models.get("tools"),
+            fast_path=fast_path,
+            turn_budget=turn_budget,
+        )
+
+    def _on_tools_changed(self, tools: list):
+        """工具熱重載：重建綁定新工具集合的 graph，沿用同一個 checkpointer"""
+        self._build_graph(tools)
+        if self.command_handler:
+            self.command_handler.app = self.app
+        logger.info(f"已套用新的工具設定（{len(tools)} 個工具），對話記憶保留")
+
     async def run_async(self):
         """執行聊天應用程式（非同步版本）"""
         # 顯示歡迎訊息
@@ -93,16 +217,39 @@ class ChatApp:
             print("3. 本地伺服器正在運行 (預設: http://localhost:1234)\n")
             return
 
+        from langchain_core.messages import HumanMessage
+
         # 生成對話執行緒 ID
         thread_id = str(uuid.uuid4())
         config = {"configurable": {"thread_id": thread_id}}
 
+        # 非同步讀取使用者輸入，讓背景任務在使用者思考時也能執行
+        self.reader = AsyncLineReader()
+        self.reader.start()
+        self._install_interrupt_handler()
+
         # 主要對話循環
         try:
             while True:
                 try:
-                    # 取得使用者輸入
-                    user_input = input("👤 你: ").strip()
+                    # 取得使用者輸入（回應進行中輸入的內容會排隊，這裡直接取出並顯示）
+                    if self.reader.pending():
+                        user_input = await self.reader.readline()
+                        if user_input is not None:
+                            print(f"👤 你: {user_input}")
+                    else:
+                        print("👤 你: ", end="", flush=True)
+                        user_input = await self.reader.readline()
+
+                    # EOF 或 Ctrl-C 關閉了讀取器
+                    if user_input is None:
+                        if self._exit_requested:
+                            print("\n\n[系統] 偵測到中斷訊號，正在退出...\n")
+                        else:
+                            print()
+                        break
+
+                    user_input = user_input.strip()
 
                     # 處理空輸入
                     if not user_input:
@@ -122,16 +269,34 @@ class ChatApp:
                     # 處理使用者訊息
                     input_message = HumanMessage(content=user_input)
 
-                    # 取得 AI 回應
+                    # 取得 AI 回應（以任務執行，Ctrl-C 只會取消這次回應）
                     print("🤖 AI: ", end="", flush=True)
+                    if self.profiler:
+                        self.profiler.start_turn()
+                    self._answer_task = asyncio.create_task(
+                        self.app.ainvoke({"messages": [input_message]}, config)
+                    )
                     try:
-                        output = await self.app.ainvoke({"messages": [input_message]}, config)
+                        output = await self._answer_task
                         ai_response = output["messages"][-1].content
                         print(ai_response)
+                    except asyncio.CancelledError:
+                        # 外層任務被取消時照常傳遞，只吞掉 Ctrl-C 造成的取消
+                        if asyncio.current_task().cancelling():
+                            raise
+                        print("\n[系統] 已取消目前的回應")
                     except Exception as e:
                         print(f"\n[錯誤] AI 回應失敗: {e}")
                         print("請檢查 LM Studio 是否正常運作。\n")
                         logger.error(f"AI 回應錯誤: {e}", exc_info=True)
+                    finally:
+                        self._answer_task = None
+                        if self.profiler:
+                            profile = self.profiler.finish_turn(user_input[:40])
+                            logger.info(
+                                f"[Profile] Turn {profile.number}: {profile.wall:.2f}s wall, "
+                                f"{profile.cpu:.2f}s CPU -> {self.profiler.directory}"
+                            )
 
                     print()  # 空行增加可讀性
 
@@ -144,8 +309,68 @@ class ChatApp:
 
         finally:
             # 清理資源
+            self._remove_interrupt_handler()
+            self.reader.close()
+            await self._cancel_background_tasks()
             if self.mcp_manager:
                 await self.mcp_manager.cleanup()
+            if self.checkpointer:
+                self.checkpointer.close()
+            if self.http_clients:
+                await self.http_clients.aclose()
+            if self.profiler:
+                self.profiler.close()
+
+    def _install_interrupt_handler(self):
+        """安裝 SIGINT 處理：回應進行中時取消回應，閒置時退出"""
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self._on_interrupt)
+        except (NotImplementedError, RuntimeError):
+            # Windows 等平台不支援，沿用 KeyboardInterrupt 的預設行為
+            logger.debug("事件迴圈不支援 signal handler，Ctrl-C 將直接退出")
+
+    def _remove_interrupt_handler(self):
+        """移除 SIGINT 處理"""
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGINT)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    def _on_interrupt(self):
+        """Ctrl-C 處理函數"""
+        if self._answer_task is not None and not self._answer_task.done():
+            self._answer_task.cancel()
+            return
+        self._exit_requested = True
+        if self.reader:
+            self.reader.close()
+
+    def spawn_background(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        """
+        在事件迴圈中啟動背景任務（例如快取預熱、keepalive）
+
+        任務會被保留參照直到完成，程式結束時統一取消。
+
+        Args:
+            coro: 要執行的協程
+            name: 任務名稱（除錯用）
+
+        Returns:
+            建立的任務
+        """
+        task = asyncio.create_task(coro, name=name)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def _cancel_background_tasks(self):
+        """取消所有背景任務並等待其結束"""
+        tasks = list(self._background_tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     def run(self):
         """執行聊天應用程式（同步入口點）"""
@@ -5,24 +5,34 @@ from typing import Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ..mcp import MCPToolManager
+    from ..profiling import TurnProfiler
 
-from .display import display_welcome, display_history, display_tools_status
+from .display import (
+    display_welcome, display_history, display_tools_status, display_metrics, display_profile
+)
 from ..config import Commands
 
 
 class CommandHandler:
     """處理 CLI 命令的類別"""
 
-    def __init__(self, app, mcp_manager: Optional["MCPToolManager"] = None):
+    def __init__(
+        self,
+        app,
+        mcp_manager: Optional["MCPToolManager"] = None,
+        profiler: Optional["TurnProfiler"] = None
+    ):
         """
         初始化命令處理器
 
         Args:
             app: Graph 應用實例
             mcp_manager: MCP 工具管理器（可選）
+            profiler: 回合分析器（分析模式啟用時）
         """
         self.app = app
         self.mcp_manager = mcp_manager
+        self.profiler = profiler
         self.has_tools = mcp_manager is not None and mcp_manager._initialized
 
     def handle_command(self, user_input: str, config: dict) -> tuple[bool, Optional[dict]]:
@@ -60,6 +70,16 @@ class CommandHandler:
             display_tools_status(self.mcp_manager)
             return False, None
 
+        # Show metrics
+        if command == Commands.METRICS:
+            display_metrics(self.mcp_manager, getattr(self.app, "checkpointer", None))
+            return False, None
+
+        # Show last turn profile
+        if command == Commands.PROFILE:
+            display_profile(self.profiler)
+            return False, None
+
         # Show help
         if command == Commands.HELP:
             display_welcome(self.has_tools)
@@ -84,5 +104,7 @@ class CommandHandler:
             command == Commands.NEW or
             command == Commands.HISTORY or
             command == Commands.TOOLS or
+            command == Commands.METRICS or
+            command == Commands.PROFILE or
             command == Commands.HELP
         )
@@ -4,8 +4,10 @@ from typing import Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ..mcp import MCPToolManager
+    from ..profiling import TurnProfiler
 
 from ..config import logger
+from ..metrics import metrics
 
 
 def display_welcome(has_tools: bool = False):
@@ -27,6 +29,8 @@ def display_welcome(has_tools: bool = False):
     print("  /history       - 顯示當前對話歷史")
     if has_tools:
         print("  /tools         - 顯示 MCP 工具狀態")
+    print("  /metrics       - 顯示效能指標")
+    print("  /profile       - 顯示上一個回合的效能分析（需以 --profile 啟動）")
     print("  /help          - 顯示幫助訊息")
     print("\n請確保 LM Studio 已啟動並載入了模型！")
     if has_tools:
@@ -119,3 +123,162 @@ def display_tools_status(mcp_manager: Optional["MCPToolManager"]):
     except Exception as e:
         print(f"\n[錯誤] 無法取得工具狀態: {e}\n")
         logger.error(f"取得工具狀態時發生錯誤: {e}", exc_info=True)
+
+
+def display_metrics(mcp_manager: Optional["MCPToolManager"] = None, checkpointer=None):
+    """
+    顯示效能指標（計數器、延遲分位數、斷路器狀態與對話記憶用量）
+
+    Args:
+        mcp_manager: MCP 工具管理器實例（可選）
+        checkpointer: Graph 的 checkpointer（可選，提供 status() 時顯示記憶體用量）
+    """
+    snapshot = metrics.snapshot()
+
+    print("\n" + "=" * 60)
+    print("效能指標")
+    print("=" * 60)
+
+    if snapshot["timings"]:
+        print("\n延遲 (秒):")
+        for name, stats in sorted(snapshot["timings"].items()):
+            print(
+                f"  {name}: n={stats['count']} p50={stats['p50']:.3f} "
+                f"p95={stats['p95']:.3f} p99={stats['p99']:.3f} max={stats['max']:.3f}"
+            )
+
+    if snapshot["counters"]:
+        print("\n計數器:")
+        for name, value in sorted(snapshot["counters"].items()):
+            print(f"  {name}: {value:g}")
+
+    routed_chat = metrics.counter("route.chat")
+    routed_agent = metrics.counter("route.agent")
+    if routed_chat or routed_agent:
+        misrouted = metrics.counter("route.misrouted")
+        toolless = metrics.counter("route.agent_no_tools")
+        misroute_rate = misrouted / routed_chat if routed_chat else 0.0
+        print(
+            f"\n路由: 聊天 {routed_chat:g} 次，agent {routed_agent:g} 次；"
+            f"聊天轉交 agent {misrouted:g} 次（{misroute_rate:.0%}），agent 未用工具 {toolless:g} 次"
+        )
+        agent_p50 = metrics.quantile("model.agent", 0.5)
+        chat_p50 = metrics.quantile("model.chat", 0.5)
+        if agent_p50 is not None and chat_p50 is not None:
+            # 留在聊天節點的回合省下 agent 呼叫；轉交的回合多付一次聊天呼叫
+            saved = (routed_chat - misrouted) * (agent_p50 - chat_p50) - misrouted * chat_p50
+            print(f"估計節省的模型時間: {saved:.1f} 秒（p50 agent {agent_p50:.2f}s / 聊天 {chat_p50:.2f}s）")
+
+    fast_hits = metrics.counter("fastpath.hit")
+    fast_misses = metrics.counter("fastpath.miss")
+    if fast_hits or fast_misses:
+        fast_p50 = metrics.quantile("fastpath.latency", 0.5)
+        latency = f"，p50 {fast_p50 * 1000:.0f} ms" if fast_p50 is not None else ""
+        print(
+            f"\n模板回答: 命中 {fast_hits:g}/{fast_hits + fast_misses:g}"
+            f"（{fast_hits / (fast_hits + fast_misses):.0%}）{latency}，"
+            f"比對成功但改交 agent {metrics.counter('fastpath.fallback'):g} 次"
+        )
+
+    turn_p99 = metrics.quantile("turn.seconds", 0.99)
+    if turn_p99 is not None:
+        forced = {
+            reason: metrics.counter(f"turn.forced.{reason}")
+            for reason in ("deadline", "steps", "repeat")
+        }
+        print(
+            f"\n回合時間: p99 {turn_p99:.1f} 秒；強制回答 逾時 {forced['deadline']:g} 次、"
+            f"步驟用完 {forced['steps']:g} 次、重複呼叫 {forced['repeat']:g} 次"
+        )
+
+    if mcp_manager:
+        status = mcp_manager.get_tools_status()
+        breakers = status.get("breakers", {})
+        if breakers:
+            print("\n斷路器:")
+            for server_name, info in breakers.items():
+                print(f"  {server_name}: {info['state']} (連續失敗 {info['failures']} 次)")
+
+        rate_limits = status.get("rate_limits", {})
+        if rate_limits:
+            print("\n速率限制:")
+            for name, info in rate_limits.items():
+                server = name.split(".", 1)[0]
+                line = f"  {name}: 剩餘 {info['tokens']:.1f} 個 token，排隊中 {info['waiting']}"
+                if name == server:
+                    line += (
+                        f"，延後 {metrics.counter(f'ratelimit.{server}.throttled'):g} 次"
+                        f"（共 {metrics.counter(f'ratelimit.{server}.throttled_seconds'):.1f} 秒），"
+                        f"排隊逾時 {metrics.counter(f'ratelimit.{server}.rejected'):g} 次"
+                    )
+                print(line)
+
+        for server_name, replicas in status.get("replicas", {}).items():
+            print(f"\n📦 {server_name} replicas:")
+            for replica_name, info in replicas.items():
+                p50 = f"{info['p50']:.3f}s" if info["p50"] is not None else "-"
+                state = "❌ 已剔除" if info["ejected"] else "✅"
+                print(
+                    f"  {state} {replica_name}: 進行中 {info['outstanding']}，"
+                    f"請求 {info['requests']:g}，錯誤 {info['errors']:g}，p50 {p50}"
+                )
+
+        if mcp_manager.response_cache:
+            cache = mcp_manager.response_cache.status()
+            hits = metrics.counter("response_cache.hit")
+            lookups = hits + metrics.counter("response_cache.miss")
+            hit_rate = f"{hits / lookups:.0%}" if lookups else "-"
+            print(
+                f"\n工具結果快取: {cache['fresh']}/{cache['entries']} 筆有效，命中率 {hit_rate}，"
+                f"熱門項目 miss {metrics.counter('response_cache.hot_miss'):g} 次，"
+                f"預熱 {metrics.counter('response_cache.warmed'):g} 次"
+            )
+
+        if mcp_manager.static_data:
+            static = mcp_manager.static_data.status()
+            if static["patch"]:
+                print(
+                    f"\n靜態資料快照: 版本 {static['patch']}，{static['datasets']} 個資料集，"
+                    f"{static['bytes'] / 1024:.0f} KB"
+                )
+            else:
+                print("\n靜態資料快照: 尚未載入")
+
+    if hasattr(checkpointer, "status"):
+        memory = checkpointer.status()
+        limit = f"{memory['max_bytes'] / 1024 / 1024:.0f} MB" if memory["max_bytes"] else "不限"
+        print(
+            f"\n對話記憶: {memory['bytes'] / 1024 / 1024:.1f} MB / {limit}，"
+            f"記憶體中 {memory['threads_in_memory']} 個對話，已寫入磁碟 {memory['threads_spilled']} 個"
+        )
+        if memory.get("shared_contents"):
+            print(
+                f"其中共用工具結果: {memory['shared_contents']} 份，"
+                f"{memory['shared_bytes'] / 1024 / 1024:.1f} MB"
+            )
+
+    if not snapshot["timings"] and not snapshot["counters"]:
+        print("\n[系統] 目前還沒有任何指標")
+
+    print("\n" + "=" * 60 + "\n")
+
+
+def display_profile(profiler: Optional["TurnProfiler"] = None):
+    """
+    顯示上一個回合的效能分析
+
+    Args:
+        profiler: 回合分析器（分析模式未啟用時為 None）
+    """
+    if profiler is None:
+        print("\n[系統] 分析模式未啟用，請以 --profile 啟動（或設定 PROFILE_ENABLED=true）\n")
+        return
+    profile = profiler.last()
+    if profile is None:
+        print("\n[系統] 還沒有完成的回合可以分析\n")
+        return
+    print("\n" + "=" * 60)
+    print("  效能分析")
+    print("=" * 60)
+    print(profile.summary(profiler.top_n))
+    print("\n" + "=" * 60 + "\n")
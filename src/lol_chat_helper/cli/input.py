@@ -0,0 +1,82 @@
+"""Asynchronous line reader for the CLI chat loop."""
+
+import sys
+import asyncio
+import threading
+from typing import Optional, TextIO
+
+
+class AsyncLineReader:
+    """
+    以背景執行緒讀取 stdin 的非同步行讀取器
+
+    阻塞的 readline() 在專用的 daemon 執行緒中執行，讀到的每一行透過
+    call_soon_threadsafe 放入 asyncio.Queue。事件迴圈因此不會被使用者輸入卡住，
+    背景任務可以在使用者思考時繼續執行；回應進行中輸入的內容也會依序排入佇列。
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        """
+        初始化行讀取器
+
+        Args:
+            stream: 輸入來源（預設為 sys.stdin）
+        """
+        self.stream = stream or sys.stdin
+        self._queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def start(self):
+        """在目前的事件迴圈上啟動讀取執行緒"""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(
+            target=self._read_loop,
+            name="stdin-reader",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _read_loop(self):
+        """讀取執行緒主體：逐行讀取直到 EOF"""
+        while not self._closed:
+            try:
+                line = self.stream.readline()
+            except (OSError, ValueError):
+                line = ""
+
+            if not line:
+                self._put(None)
+                return
+            self._put(line.rstrip("\r\n"))
+
+    def _put(self, item: Optional[str]):
+        """從任意執行緒安全地將項目放入佇列"""
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:
+            # 事件迴圈已關閉（程式正在結束）
+            self._closed = True
+
+    async def readline(self) -> Optional[str]:
+        """
+        等待下一行輸入
+
+        Returns:
+            去除換行字元的輸入行；EOF 或讀取器關閉時回傳 None
+        """
+        if self._closed and self._queue.empty():
+            return None
+        return await self._queue.get()
+
+    def pending(self) -> int:
+        """目前排隊中的輸入行數"""
+        return self._queue.qsize()
+
+    def close(self):
+        """關閉讀取器，喚醒正在等待 readline() 的呼叫者"""
+        self._closed = True
+        self._queue.put_nowait(None)
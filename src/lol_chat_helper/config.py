@@ -1,14 +1,28 @@
 """Configuration management for LOL Chat Helper."""
 
 import os
+import queue
+import atexit
 import logging
+import threading
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
-from dataclasses import dataclass
-from dotenv import load_dotenv
+from dataclasses import dataclass, field, replace
 
 
-# Load environment variables
-load_dotenv()
+_env_loaded = False
+
+
+def load_env() -> None:
+    """Load the ``.env`` file once, on first use instead of at import time."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    _env_loaded = True
 
 
 @dataclass
@@ -20,16 +34,75 @@ class ModelConfig:
     model_name: str
     temperature: float
     streaming: bool = False
+    context_budget: int = 0  # max prompt tokens before tool outputs are trimmed, 0 disables
+    tokenizer: str = "estimate"  # "estimate" or "tiktoken:<encoding>"
+    max_tokens: Optional[int] = None  # completion token cap, None leaves it to the server
 
     @classmethod
     def from_env(cls) -> "ModelConfig":
         """Create ModelConfig from environment variables."""
+        load_env()
         return cls(
             base_url=os.getenv("LM_STUDIO_BASE_URL", "http://localhost:1234/v1"),
             api_key=os.getenv("OPENAI_API_KEY", "lm-studio"),
             model_name=os.getenv("MODEL_NAME", "gpt-oss:20b"),
             temperature=float(os.getenv("MODEL_TEMPERATURE", "0.7")),
             streaming=os.getenv("MODEL_STREAMING", "false").lower() == "true",
+            context_budget=int(os.getenv("MODEL_CONTEXT_BUDGET", "0")),
+            tokenizer=os.getenv("MODEL_TOKENIZER", "estimate"),
+            max_tokens=int(os.getenv("MODEL_MAX_TOKENS")) if os.getenv("MODEL_MAX_TOKENS") else None,
+        )
+
+    def profile_from_env(self, role: str) -> Optional["ModelConfig"]:
+        """
+        Create a model profile for ``role`` from ``<ROLE>_MODEL_*`` variables.
+
+        Unset fields inherit from this config; returns None when
+        ``<ROLE>_MODEL_NAME`` is not set.
+        """
+        load_env()
+        prefix = f"{role.upper()}_MODEL_"
+        name = os.getenv(f"{prefix}NAME")
+        if not name:
+            return None
+        max_tokens = os.getenv(f"{prefix}MAX_TOKENS")
+        return replace(
+            self,
+            model_name=name,
+            base_url=os.getenv(f"{prefix}BASE_URL", self.base_url),
+            api_key=os.getenv(f"{prefix}API_KEY", self.api_key),
+            temperature=float(os.getenv(f"{prefix}TEMPERATURE", str(self.temperature))),
+            max_tokens=int(max_tokens) if max_tokens else self.max_tokens,
+            streaming=False,
+        )
+
+
+@dataclass
+class HTTPConfig:
+    """Connection pool shared by every model client (all roles, graphs and sessions)."""
+
+    max_connections: int = 20  # concurrent connections per pool
+    max_keepalive: int = 10  # idle connections kept open for reuse
+    keepalive_expiry: float = 120.0  # seconds an idle connection stays open
+    http2: bool = False  # needs the h2 package; falls back to HTTP/1.1 without it
+    connect_timeout: float = 5.0
+    read_timeout: float = 120.0  # per read; streaming answers reset it on every chunk
+    connect_retries: int = 1  # transport-level retries of failed connection attempts
+    max_retries: int = 2  # request retries on 429/5xx/timeouts by the OpenAI client
+
+    @classmethod
+    def from_env(cls) -> "HTTPConfig":
+        """Create HTTPConfig from environment variables."""
+        load_env()
+        return cls(
+            max_connections=int(os.getenv("MODEL_HTTP_MAX_CONNECTIONS", "20")),
+            max_keepalive=int(os.getenv("MODEL_HTTP_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("MODEL_HTTP_KEEPALIVE_EXPIRY", "120")),
+            http2=os.getenv("MODEL_HTTP2", "false").lower() == "true",
+            connect_timeout=float(os.getenv("MODEL_HTTP_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("MODEL_HTTP_READ_TIMEOUT", "120")),
+            connect_retries=int(os.getenv("MODEL_HTTP_CONNECT_RETRIES", "1")),
+            max_retries=int(os.getenv("MODEL_MAX_RETRIES", "2")),
         )
 
 
@@ -39,16 +112,96 @@ class MCPConfig:
 
     enabled: bool
     config_path: str
+    reload_interval: float = 2.0  # seconds between config file checks, 0 disables hot reload
 
     @classmethod
     def from_env(cls) -> "MCPConfig":
         """Create MCPConfig from environment variables."""
+        load_env()
         return cls(
             enabled=os.getenv("MCP_ENABLED", "true").lower() == "true",
             config_path=os.getenv("MCP_CONFIG_PATH", "mcp_config.json"),
+            reload_interval=float(os.getenv("MCP_RELOAD_INTERVAL", "2.0")),
+        )
+
+
+@dataclass
+class MemoryConfig:
+    """Configuration for conversation memory (checkpointer)."""
+
+    max_mb: float = 256.0  # memory cap across all threads, 0 disables accounting limits
+    spill_dir: Optional[str] = None  # idle threads are written here; "" evicts instead
+    dedup_min_bytes: int = 1024  # tool results at least this large are stored once by hash, 0 disables
+    age_tool_results: bool = True  # replace tool results from earlier turns with digests
+    tool_cache_mb: float = 32.0  # full results of aged tool outputs, recallable by the model
+
+    @classmethod
+    def from_env(cls) -> "MemoryConfig":
+        """Create MemoryConfig from environment variables."""
+        load_env()
+        return cls(
+            max_mb=float(os.getenv("MEMORY_MAX_MB", "256")),
+            spill_dir=os.getenv("MEMORY_SPILL_DIR"),
+            dedup_min_bytes=int(os.getenv("MEMORY_DEDUP_MIN_BYTES", "1024")),
+            age_tool_results=os.getenv("MEMORY_AGE_TOOL_RESULTS", "true").lower() == "true",
+            tool_cache_mb=float(os.getenv("MEMORY_TOOL_CACHE_MB", "32")),
+        )
+
+
+@dataclass
+class AgentConfig:
+    """Configuration for the agent graph."""
+
+    plan_steps: int = 0  # >0 plans up to this many tool calls in one model call, 0 keeps the agent/tools loop
+    routing: bool = True  # route small talk to a chat node without tool schemas
+    fast_path: bool = True  # answer tier lists, skin sales and core builds from templates
+    fast_path_lang: str = "zh_TW"  # language of fast-path lookups and answers
+    turn_deadline: float = 90.0  # seconds per turn before a final answer is forced, 0 disables
+    turn_max_steps: int = 6  # tool rounds per turn before a final answer is forced, 0 disables
+    answer_reserve: float = 15.0  # seconds of the deadline kept for writing the final answer
+
+    @classmethod
+    def from_env(cls) -> "AgentConfig":
+        """Create AgentConfig from environment variables."""
+        load_env()
+        return cls(
+            plan_steps=int(os.getenv("AGENT_PLAN_STEPS", "0")),
+            routing=os.getenv("AGENT_ROUTING", "true").lower() == "true",
+            fast_path=os.getenv("AGENT_FAST_PATH", "true").lower() == "true",
+            fast_path_lang=os.getenv("AGENT_FAST_PATH_LANG", "zh_TW"),
+            turn_deadline=float(os.getenv("AGENT_TURN_DEADLINE", "90")),
+            turn_max_steps=int(os.getenv("AGENT_TURN_MAX_STEPS", "6")),
+            answer_reserve=float(os.getenv("AGENT_ANSWER_RESERVE", "15")),
         )
 
 
+@dataclass
+class ProfileConfig:
+    """Configuration for the per-turn profiling mode."""
+
+    enabled: bool = False
+    directory: str = ".profiles"  # folded stacks, allocation diffs and summaries per turn
+    interval: float = 0.005  # seconds between stack samples
+    memory: bool = True  # capture tracemalloc allocation diffs (slows the process down)
+    top_n: int = 15  # entries per ranking in the /profile summary
+
+    @classmethod
+    def from_env(cls) -> "ProfileConfig":
+        """Create ProfileConfig from environment variables."""
+        load_env()
+        return cls(
+            enabled=os.getenv("PROFILE_ENABLED", "false").lower() == "true",
+            directory=os.getenv("PROFILE_DIR", ".profiles"),
+            interval=float(os.getenv("PROFILE_INTERVAL", "0.005")),
+            memory=os.getenv("PROFILE_MEMORY", "true").lower() == "true",
+            top_n=int(os.getenv("PROFILE_TOP_N", "15")),
+        )
+
+
+# Roles that can run on their own model profile (see ModelConfig.profile_from_env)
+MODEL_ROLES = ("tools", "router")
+
+
 @dataclass
 class AppConfig:
     """Main application configuration."""
@@ -56,36 +209,108 @@ class AppConfig:
     model: ModelConfig
     mcp: MCPConfig
     log_level: str
+    memory: MemoryConfig = field(default_factory=MemoryConfig)
+    agent: AgentConfig = field(default_factory=AgentConfig)
+    # role -> model profile; "tools" picks tools in the agent loop and plans,
+    # "router" settles turns the routing rules cannot; ``model`` writes the answers
+    profiles: dict[str, ModelConfig] = field(default_factory=dict)
+    http: HTTPConfig = field(default_factory=HTTPConfig)
+    profile: ProfileConfig = field(default_factory=ProfileConfig)
+    log_file: Optional[str] = None
 
     @classmethod
     def from_env(cls) -> "AppConfig":
         """Create AppConfig from environment variables."""
+        load_env()
+        model = ModelConfig.from_env()
+        profiles = {}
+        for role in MODEL_ROLES:
+            profile = model.profile_from_env(role)
+            if profile is not None:
+                profiles[role] = profile
         return cls(
-            model=ModelConfig.from_env(),
+            model=model,
             mcp=MCPConfig.from_env(),
             log_level=os.getenv("LOG_LEVEL", "INFO"),
+            memory=MemoryConfig.from_env(),
+            agent=AgentConfig.from_env(),
+            profiles=profiles,
+            http=HTTPConfig.from_env(),
+            profile=ProfileConfig.from_env(),
+            log_file=os.getenv("LOG_FILE") or None,
         )
 
 
 # Logging configuration
-def setup_logging(level: str = "INFO") -> logging.Logger:
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_log_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", log_file: Optional[str] = None) -> logging.Logger:
     """Setup logging configuration.
 
+    The root logger only gets a QueueHandler; formatting and console/file
+    writes happen on a QueueListener thread so logging never blocks the
+    event loop. Calling it again only changes the level.
+
     Args:
         level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        log_file: Also write logs to this file (optional)
 
     Returns:
         Configured logger instance
     """
-    logging.basicConfig(
-        level=getattr(logging, level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    global _log_listener
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper()))
+    if _log_listener is None:
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers: list[logging.Handler] = [logging.StreamHandler()]
+        if log_file:
+            handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(QueueHandler(log_queue))
+        _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _log_listener.start()
+        # Flush whatever is still queued when the process exits
+        atexit.register(stop_logging)
     return logging.getLogger(__name__)
 
 
-# Global logger instance
-logger = setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+def stop_logging():
+    """Flush queued records and stop the logging thread."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+class LogSampler:
+    """Sample high-volume log lines per key.
+
+    The first ``burst`` lines for a key are always logged, after that only
+    one in every ``every`` (``every=1`` logs everything).
+    """
+
+    def __init__(self, burst: int = 20, every: int = 10):
+        self.burst = burst
+        self.every = max(1, every)
+        self._seen: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def should_log(self, key: str) -> bool:
+        """Count one occurrence of ``key`` and tell whether to log it."""
+        with self._lock:
+            self._seen[key] += 1
+            seen = self._seen[key]
+        return seen <= self.burst or (seen - self.burst) % self.every == 0
+
+
+# Global logger instance (handlers are installed by setup_logging at startup)
+logger = logging.getLogger(__name__)
 
 
 # Constants
@@ -100,4 +325,6 @@ class Commands:
     NEW = '/new'
     HISTORY = '/history'
     TOOLS = '/tools'
+    METRICS = '/metrics'
+    PROFILE = '/profile'
     HELP = '/help'
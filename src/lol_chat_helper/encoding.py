@@ -0,0 +1,208 @@
+"""Compact prompt encodings for headers/rows tool results."""
+
+import json
+from typing import Any, Optional
+
+from langchain_core.messages import ToolMessage
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.tabular import TabularDecoder, is_tabular
+from lol_chat_helper.tokens import estimate_tokens
+from lol_chat_helper.tooling import content_to_text
+
+
+ENCODINGS = ("tsv", "markdown", "json")
+LEGEND_MAX_CHARS = 48
+
+
+def _format_value(value: Any, markdown: bool) -> str:
+    """將單一儲存格的值轉為精簡文字"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = str(value)
+    text = text.replace("\t", " ").replace("\r", " ").replace("\n", " ")
+    if markdown:
+        text = text.replace("|", "\\|")
+    return text
+
+
+def _format_extra(value: Any, markdown: bool) -> str:
+    """將非表格的值（例如 metadata_maps 的 id 對照表）轉為單行文字"""
+    if isinstance(value, dict):
+        return ", ".join(f"{k}={_format_value(v, markdown)}" for k, v in value.items())
+    return _format_value(value, markdown)
+
+
+def _extra_lines(extra: dict[str, Any], markdown: bool) -> list[str]:
+    """
+    將非表格的值依上層路徑分組，每組輸出一行
+
+    例如 metadata_maps.item_ids.3118 / metadata_maps.item_ids.4645 會合併為
+    "metadata_maps.item_ids: 3118=惡意, 4645=黯影之炎"。
+    """
+    groups: dict[str, list[str]] = {}
+    lines: dict[str, str] = {}
+    for path, value in extra.items():
+        parent, _, leaf = path.rpartition(".")
+        if parent and not isinstance(value, (dict, list)):
+            groups.setdefault(parent, []).append(f"{leaf}={_format_value(value, markdown)}")
+            lines.setdefault(parent, "")
+        else:
+            lines[path] = _format_extra(value, markdown)
+
+    return [
+        f"{key}: {', '.join(groups[key]) if key in groups else text}"
+        for key, text in lines.items()
+    ]
+
+
+def _legend(headers: list[str], descriptions: dict[str, str]) -> list[str]:
+    """
+    以 column_descriptions 產生欄位說明
+
+    column_descriptions 的鍵可能帶有路徑前綴（例如 "position.*.win_rate"），
+    以最後一段比對欄位名稱；說明過長時截斷。
+    """
+    by_column = {}
+    for key, description in descriptions.items():
+        by_column.setdefault(key, description)
+        by_column.setdefault(key.rsplit(".", 1)[-1], description)
+
+    lines = []
+    for header in headers:
+        description = by_column.get(header)
+        if not description:
+            continue
+        if len(description) > LEGEND_MAX_CHARS:
+            description = description[:LEGEND_MAX_CHARS - 1] + "…"
+        lines.append(f"{header}: {description}")
+    return lines
+
+
+def encode_tabular(text: str, fmt: str = "tsv", legend: bool = True) -> str:
+    """
+    將 headers/rows 格式的 JSON 重新編碼為精簡的表格文字
+
+    每個區段只輸出一次欄位列，後面接每列資料；欄位說明只列出實際出現的欄位。
+
+    Args:
+        text: 原始 JSON 文字
+        fmt: "tsv" 或 "markdown"（"json" 則輸出無縮排的 JSON）
+        legend: 是否附上欄位說明
+
+    Returns:
+        編碼後的文字
+
+    Raises:
+        ValueError: 文字不是可解碼的 JSON 或格式不支援
+    """
+    if fmt not in ENCODINGS:
+        raise ValueError(f"Unknown encoding: {fmt}")
+    # 完整結果已經在記憶體中且要全部輸出，直接用 json.loads 解析；逐值解碼只留給有 limit 的讀取
+    document = json.loads(text)
+    if fmt == "json":
+        return json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+
+    markdown = fmt == "markdown"
+    decoder = TabularDecoder(document)
+    sections: dict[str, tuple[list[str], list[list[Any]]]] = {}
+    for row in decoder:
+        section = sections.get(row.section)
+        if section is None:
+            section = sections[row.section] = (row.headers, [])
+        section[1].append(row.values)
+
+    lines = _extra_lines(decoder.extra, markdown)
+
+    used_headers: list[str] = []
+    for name, (headers, rows) in sections.items():
+        if lines:
+            lines.append("")
+        lines.append(f"## {name} ({len(rows)} rows)")
+        if markdown:
+            lines.append("| " + " | ".join(headers) + " |")
+            lines.append("|" + "---|" * len(headers))
+            for values in rows:
+                lines.append("| " + " | ".join(_format_value(v, True) for v in values) + " |")
+        else:
+            lines.append("\t".join(headers))
+            for values in rows:
+                lines.append("\t".join(_format_value(v, False) for v in values))
+        used_headers.extend(h for h in headers if h not in used_headers)
+
+    if legend:
+        legend_lines = _legend(used_headers, decoder.column_descriptions)
+        if legend_lines:
+            lines.append("")
+            lines.append("欄位說明:")
+            lines.extend(f"- {line}" for line in legend_lines)
+
+    return "\n".join(lines)
+
+
+class ToolResultEncoder:
+    """
+    依 toolResults 設定將表格工具結果改寫為精簡格式
+
+    設定位於 mcp_config.json 的 toolResults 區塊，"*" 為預設值：
+    {
+      "toolResults": {
+        "*": {"encoding": "tsv"},
+        "lol_get_champion_analysis": {"encoding": "markdown", "legend": false}
+      }
+    }
+
+    每次改寫都會估算前後的 token 數，累計在 encoding.tokens_before /
+    encoding.tokens_after 指標中（/metrics 可查看）。
+    """
+
+    def __init__(self, rules: Optional[dict[str, dict]] = None):
+        """
+        初始化編碼器
+
+        Args:
+            rules: 工具名稱（或 "*"）對應的編碼設定
+        """
+        self.rules = rules or {}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ToolResultEncoder":
+        """從完整的 MCP 配置建立編碼器"""
+        return cls(config.get("toolResults", {}))
+
+    def _rule(self, tool_name: str) -> dict:
+        default = self.rules.get("*", {})
+        return {**default, **self.rules.get(tool_name, {})}
+
+    def __call__(self, message: ToolMessage) -> ToolMessage:
+        rule = self._rule(message.name or "")
+        fmt = rule.get("encoding")
+        if not fmt or fmt == "raw":
+            return message
+
+        text = content_to_text(message.content)
+        if not is_tabular(text):
+            return message
+
+        try:
+            encoded = encode_tabular(text, fmt=fmt, legend=rule.get("legend", True))
+        except ValueError as e:
+            logger.debug(f"[ToolResult] {message.name} 無法以 {fmt} 編碼，保留原始結果: {e}")
+            return message
+
+        before = estimate_tokens(text)
+        after = estimate_tokens(encoded)
+        metrics.incr("encoding.tokens_before", before)
+        metrics.incr("encoding.tokens_after", after)
+        metrics.incr(f"encoding.{message.name}.tokens_saved", before - after)
+        logger.debug(
+            f"[ToolResult] {message.name} 編碼為 {fmt}: 約 {before} -> {after} tokens "
+            f"(節省 {1 - after / max(before, 1):.0%})"
+        )
+        return message.model_copy(update={"content": encoded})
@@ -0,0 +1,348 @@
+"""Template answers for fixed-shape lookups, rendered without calling the model."""
+
+import re
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import BaseTool
+from langgraph.graph import END, MessagesState
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.tabular import decode_sections, find_map, parse_ids
+from lol_chat_helper.tooling import content_to_text
+
+
+FAST_PATH_KEY = "fast_path"
+# 超過這個長度的訊息通常帶有額外條件，交給 agent
+MAX_QUERY_CHARS = 40
+
+POSITIONS = {
+    "top": "top", "上路": "top", "上單": "top",
+    "jungle": "jungle", "jg": "jungle", "打野": "jungle",
+    "mid": "mid", "中路": "mid", "中單": "mid",
+    "adc": "adc", "bot": "adc", "下路": "adc", "射手": "adc",
+    "support": "support", "sup": "support", "輔助": "support",
+}
+POSITION_NAMES = {"top": "上路", "jungle": "打野", "mid": "中路", "adc": "下路", "support": "輔助"}
+# 出現這些詞表示問題需要推理或比較，不走固定模板
+_REASONING = re.compile(
+    r"比較|vs\.?|為什麼|為何|why|compare|還是|如果|怎麼打|對上|適合|推薦.*給|\S+#[0-9A-Za-z]{2,5}\b",
+    re.IGNORECASE,
+)
+_TIER_LIST = re.compile(r"tier\s*list|梯隊|強勢英雄|版本強勢|最強的?英雄|meta\s*英雄|op\s*英雄", re.IGNORECASE)
+_SKIN_SALE = re.compile(
+    r"(特價|折扣|打折|sale|discount).{0,8}(造型|skin)|(造型|skin).{0,8}(特價|折扣|打折|sale|discount)",
+    re.IGNORECASE,
+)
+_CORE_BUILD = re.compile(r"出裝|核心裝|出什麼裝|裝備怎麼出|core\s*build|build", re.IGNORECASE)
+_UNSUPPORTED_MODE = re.compile(r"aram|大亂鬥|urf|極限", re.IGNORECASE)
+
+LANE_META_TOOL = "lol_list_lane_meta_champions"
+CHAMPIONS_TOOL = "lol_list_champions"
+SKIN_SALE_TOOL = "lol_list_discounted_skins"
+ANALYSIS_TOOL = "lol_get_champion_analysis"
+
+
+def _rate(win: Any, play: Any) -> str:
+    try:
+        return f"{win / play:.1%}"
+    except (TypeError, ZeroDivisionError):
+        return "-"
+
+
+class FastPath:
+    """
+    意圖樣式 → 工具呼叫 → 回答模板
+
+    只處理形狀固定的查詢（路線梯隊、特價造型、英雄核心出裝）。訊息太長、
+    含比較或推理用語、英雄無法唯一辨識，或工具結果無法解析時都回傳 None，
+    由 agent 處理。
+    """
+
+    def __init__(self, tools: dict[str, BaseTool], lang: str = "zh_TW", top_n: int = 10):
+        """
+        初始化 fast path
+
+        Args:
+            tools: 不含伺服器前綴的工具名稱對應的工具（已包好呼叫防護與快取）
+            lang: 查詢與回答使用的語言
+            top_n: 梯隊每個位置列出的英雄數
+        """
+        self.tools = tools
+        self.lang = lang
+        self.top_n = top_n
+        self._champion_names: Optional[dict[str, str]] = None
+        self._aliases: Optional[dict[str, str]] = None
+        self._display: dict[str, str] = {}
+        self.intents: list[tuple[str, re.Pattern, Callable[[str], Awaitable[Optional[str]]]]] = [
+            ("skin_sale", _SKIN_SALE, self._skin_sale),
+            ("tier_list", _TIER_LIST, self._tier_list),
+            ("core_build", _CORE_BUILD, self._core_build),
+        ]
+
+    @classmethod
+    def from_tools(
+        cls,
+        tools: list[BaseTool],
+        pure_name: Callable[[str], str] = lambda name: name,
+        **kwargs: Any
+    ) -> "FastPath":
+        """
+        從啟用的工具列表建立
+
+        Args:
+            tools: 啟用的工具
+            pure_name: 完整工具名稱轉為純名稱的函數（例如 ToolRegistry.pure_name_of）
+            **kwargs: 傳給建構子
+
+        Returns:
+            FastPath
+        """
+        return cls({pure_name(tool.name): tool for tool in tools}, **kwargs)
+
+    async def _call(self, name: str, **args: Any) -> Optional[str]:
+        tool = self.tools.get(name)
+        if tool is None:
+            return None
+        try:
+            text = content_to_text(await tool.ainvoke(args))
+        except Exception as e:
+            logger.debug(f"[FastPath] {name} failed: {e}")
+            return None
+        return text if text.lstrip().startswith("{") else None
+
+    async def answer(self, text: str) -> Optional[tuple[str, str]]:
+        """
+        嘗試直接回答
+
+        Args:
+            text: 使用者輸入
+
+        Returns:
+            (意圖名稱, 回答)；沒有把握時回傳 None
+        """
+        if len(text) > MAX_QUERY_CHARS or _REASONING.search(text):
+            return None
+        for name, pattern, handler in self.intents:
+            if pattern.search(text):
+                try:
+                    rendered = await handler(text)
+                except Exception as e:
+                    logger.warning(f"[FastPath] {name} failed to render: {e}")
+                    rendered = None
+                if rendered is None:
+                    metrics.incr("fastpath.fallback")
+                    return None
+                return name, rendered
+        return None
+
+    # -- Champion names ------------------------------------------------------
+
+    async def _load_champions(self):
+        """英雄 id → 名稱，以及名稱/key → 工具參數用的英雄列舉值"""
+        if self._champion_names is not None:
+            return
+        enum = []
+        analysis = self.tools.get(ANALYSIS_TOOL)
+        if analysis is not None:
+            enum = (analysis.args.get("champion") or {}).get("enum", [])
+        by_compact = {value.replace("_", ""): value for value in enum}
+        aliases = {value.lower().replace("_", " "): value for value in enum}
+        names: dict[str, str] = {}
+
+        text = await self._call(CHAMPIONS_TOOL, lang=self.lang)
+        if text:
+            sections, _ = decode_sections(text)
+            for row in next(iter(sections.values()), []):
+                names[str(row.get("champion_id"))] = str(row.get("name"))
+                value = by_compact.get(str(row.get("key", "")).upper())
+                if value:
+                    aliases[str(row.get("name")).lower()] = value
+                    aliases[str(row.get("key")).lower()] = value
+                    self._display[value] = str(row.get("name"))
+        self._aliases = aliases
+        if text:
+            # 取得失敗時下次再試，這次只能辨識英文名稱
+            self._champion_names = names
+
+    def _find_champions(self, text: str) -> list[str]:
+        lowered = text.lower()
+        # 英文別名不論長短都必須是完整的詞（"personal" 不會命中 Sona、"best" 不會命中
+        # Sion 這類子字串），前後可以緊接中文；中文別名以子字串比對
+        found = {
+            value for alias, value in (self._aliases or {}).items()
+            if (re.search(rf"(?<![a-z]){re.escape(alias)}(?![a-z])", lowered)
+                if alias.isascii() else alias in lowered)
+        }
+        return sorted(found)
+
+    @staticmethod
+    def _find_position(text: str) -> Optional[str]:
+        lowered = text.lower()
+        words = set(re.findall(r"[a-z]+", lowered))
+        for word, position in POSITIONS.items():
+            if (word in words) if word.isascii() else (word in lowered):
+                return position
+        return None
+
+    # -- Intents -------------------------------------------------------------
+
+    async def _tier_list(self, text: str) -> Optional[str]:
+        if _UNSUPPORTED_MODE.search(text):
+            return None
+        position = self._find_position(text)
+        meta, _ = await asyncio.gather(
+            self._call(LANE_META_TOOL, lang=self.lang, position=position or "all"),
+            self._load_champions(),
+        )
+        if meta is None:
+            return None
+        sections, _ = decode_sections(meta)
+        names = self._champion_names or {}
+        lines = []
+        for section, rows in sections.items():
+            lane = section.rsplit(".", 1)[-1]
+            if position and lane != position:
+                continue
+            ranked = sorted(
+                (row for row in rows if not row.get("is_rip")),
+                key=lambda row: (row.get("tier") or 9, row.get("rank") or 999),
+            )[:self.top_n]
+            if not ranked:
+                continue
+            lines.append(f"**{POSITION_NAMES.get(lane, lane)}**")
+            for row in ranked:
+                name = names.get(str(row.get("champion_id")), f"#{row.get('champion_id')}")
+                lines.append(
+                    f"- T{row.get('tier')} {name}：勝率 {row.get('win_rate', 0):.1%}、"
+                    f"選取率 {row.get('pick_rate', 0):.1%}、禁用率 {row.get('ban_rate', 0):.1%}"
+                )
+        if not lines:
+            return None
+        return "目前版本的路線梯隊（依 OP.GG 資料）：\n\n" + "\n".join(lines)
+
+    async def _skin_sale(self, text: str) -> Optional[str]:
+        result = await self._call(SKIN_SALE_TOOL, lang=self.lang)
+        if result is None:
+            return None
+        sections, extra = decode_sections(result)
+        skins = find_map(extra, "skin_ids")
+        rows = sections.get("skin_sales", [])
+        if not rows:
+            return None
+        lines = []
+        for row in rows:
+            name = skins.get(str(row.get("skin_id")), f"#{row.get('skin_id')}")
+            discount = row.get("discount_rate")
+            off = f"（{discount:.0%} off）" if isinstance(discount, (int, float)) else ""
+            ends = str(row.get("ended_at") or "")[:10]
+            lines.append(f"- {name}：{row.get('cost')} {row.get('currency', 'RP')}{off}，至 {ends}")
+        return f"目前特價中的造型（共 {len(rows)} 款）：\n\n" + "\n".join(lines)
+
+    async def _core_build(self, text: str) -> Optional[str]:
+        await self._load_champions()
+        champions = self._find_champions(text)
+        if len(champions) != 1:
+            return None
+        args = {"champion": champions[0], "lang": self.lang, "game_mode": "RANKED"}
+        position = self._find_position(text)
+        if position:
+            args["position"] = position
+        result = await self._call(ANALYSIS_TOOL, **args)
+        if result is None:
+            return None
+        sections, extra = decode_sections(result)
+        items = find_map(extra, "item_ids")
+        core = sections.get("core_items") or []
+        if not core:
+            return None
+
+        def build_line(label: str, section: str) -> Optional[str]:
+            rows = sections.get(section) or []
+            if not rows or not parse_ids(rows[0].get("ids")):
+                return None
+            row = rows[0]
+            names = " → ".join(items.get(i, f"#{i}") for i in parse_ids(row.get("ids")))
+            return f"- {label}：{names}（勝率 {_rate(row.get('win'), row.get('play'))}，{row.get('play')} 場）"
+
+        champion = self._display.get(champions[0], champions[0])
+        lane = str(extra.get("position") or position or "").lower()
+        title = f"{champion}{f'（{POSITION_NAMES.get(lane, lane)}）' if lane else ''} 的推薦出裝："
+        lines = [
+            line for line in (
+                build_line("核心裝", "core_items"),
+                build_line("鞋子", "boots"),
+                build_line("起始裝", "starter_items"),
+            ) if line
+        ]
+        skills = sections.get("skills") or []
+        if skills:
+            order = parse_ids(skills[0].get("order"))
+            if order:
+                lines.append(f"- 技能加點：{' '.join(order)}")
+        return title + "\n\n" + "\n".join(lines)
+
+
+def create_fast_path_node(fast_path: FastPath) -> Callable[[MessagesState], Awaitable[dict]]:
+    """
+    建立 fast path 節點：能以模板回答時直接產生回覆，否則不產生訊息
+
+    Args:
+        fast_path: FastPath 實例
+
+    Returns:
+        非同步的節點函數
+    """
+    async def fast_path_node(state: MessagesState) -> dict:
+        """
+        嘗試以模板回答最新的使用者訊息
+
+        Args:
+            state: 當前的訊息狀態
+
+        Returns:
+            包含回覆的字典；交給 agent 時為空
+        """
+        last = state["messages"][-1]
+        if not isinstance(last, HumanMessage):
+            return {}
+        start = time.monotonic()
+        result = await fast_path.answer(content_to_text(last.content))
+        elapsed = time.monotonic() - start
+        if result is None:
+            metrics.incr("fastpath.miss")
+            return {}
+        intent, rendered = result
+        metrics.incr("fastpath.hit")
+        metrics.incr(f"fastpath.hit.{intent}")
+        metrics.observe("fastpath.latency", elapsed)
+        logger.info(f"[FastPath] Answered '{intent}' in {elapsed * 1000:.0f}ms")
+        return {"messages": AIMessage(content=rendered, response_metadata={FAST_PATH_KEY: intent})}
+
+    return fast_path_node
+
+
+def route_after_fast_path(
+    route: Optional[Callable[[MessagesState], Awaitable[str]]] = None,
+    default: str = "agent"
+) -> Callable[[MessagesState], Awaitable[str]]:
+    """
+    fast path 已回答時結束，否則交給原本的路由
+
+    Args:
+        route: 原本的非同步入口路由（例如閒聊路由），None 表示一律走 default
+        default: 沒有 route 時的下一個節點
+
+    Returns:
+        非同步的路由函數
+    """
+    async def routed(state: MessagesState) -> str:
+        last = state["messages"][-1]
+        if isinstance(last, AIMessage) and FAST_PATH_KEY in last.response_metadata:
+            return END
+        return await route(state) if route is not None else default
+
+    return routed
@@ -2,12 +2,27 @@
 
 from typing import Optional
 from langchain_core.language_models import BaseChatModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langchain_core.tools import BaseTool
-from langgraph.graph import START, StateGraph, MessagesState
+from langgraph.graph import START, END, StateGraph, MessagesState
 from langgraph.prebuilt import tools_condition
 from langgraph.checkpoint.memory import MemorySaver
 
-from lol_chat_helper.nodes import create_agent_node, create_chat_node, LoggingToolNode
+from lol_chat_helper.nodes import (
+    create_agent_node, create_chat_node, create_aging_node, create_routing_node,
+    route_after_chat, track_toolless_turns, LoggingToolNode, TokenBudgeter,
+    ROUTE_AGENT, ROUTE_CHAT
+)
+from lol_chat_helper.cache import ToolResultCache, create_recall_tool
+from lol_chat_helper.fastpath import FastPath, create_fast_path_node, route_after_fast_path
+from lol_chat_helper.planning import (
+    PlanState, create_planner_node, create_execute_node, route_after_plan, route_after_synthesis
+)
+from lol_chat_helper.results import ToolResultProcessor
+from lol_chat_helper.turns import (
+    TurnBudget, TurnState, create_turn_node, create_deadline_tool_node, create_finalize_node,
+    ROUTE_FINALIZE
+)
 from lol_chat_helper.prompts import get_system_prompt
 from lol_chat_helper.config import logger
 
@@ -19,13 +34,28 @@ class GraphBuilder:
         self,
         model: BaseChatModel,
         agent_type: str = "lol",
-        enable_memory: bool = True
+        enable_memory: bool = True,
+        checkpointer: Optional[BaseCheckpointSaver] = None
     ):
-        """Initialize Graph builder."""
+        """Initialize Graph builder.
+
+        Passing an existing checkpointer lets a rebuilt graph (e.g. after a
+        tool hot reload) keep every conversation thread.
+        """
         self.model = model
         self.agent_type = agent_type
         self.enable_memory = enable_memory
+        self.checkpointer = checkpointer
         self.tools: list[BaseTool] = []
+        self.result_processors: list[ToolResultProcessor] = []
+        self.budgeter: Optional[TokenBudgeter] = None
+        self.result_cache: Optional[ToolResultCache] = None
+        self.plan_steps = 0
+        self.tool_model: Optional[BaseChatModel] = None
+        self.routing = False
+        self.fast_path: Optional[FastPath] = None
+        self.turn_budget: Optional[TurnBudget] = None
+        self.router_model: Optional[BaseChatModel] = None
         self.system_prompt: Optional[str] = None
         self.workflow: Optional[StateGraph] = None
 
@@ -35,6 +65,47 @@ class GraphBuilder:
         logger.info(f"Set {len(tools)} tools")
         return self
 
+    def with_result_processors(self, processors: list[ToolResultProcessor]) -> "GraphBuilder":
+        """Set processors applied to tool results before they enter the state."""
+        self.result_processors = processors
+        return self
+
+    def with_token_budget(self, budgeter: TokenBudgeter) -> "GraphBuilder":
+        """Limit prompt tokens before every model call."""
+        self.budgeter = budgeter
+        return self
+
+    def with_result_aging(self, cache: ToolResultCache) -> "GraphBuilder":
+        """Replace tool results from earlier turns with digests after each answer."""
+        self.result_cache = cache
+        return self
+
+    def with_tool_model(self, model: BaseChatModel) -> "GraphBuilder":
+        """Pick tools (and plans) with a smaller model; the main model only writes answers."""
+        self.tool_model = model
+        return self
+
+    def with_planning(self, max_steps: int = 8) -> "GraphBuilder":
+        """Plan all tool calls in one model call and run them concurrently before answering."""
+        self.plan_steps = max_steps
+        return self
+
+    def with_routing(self, router_model: Optional[BaseChatModel] = None) -> "GraphBuilder":
+        """Send small talk to a chat node without tool schemas; data questions to the agent."""
+        self.routing = True
+        self.router_model = router_model
+        return self
+
+    def with_fast_path(self, fast_path: FastPath) -> "GraphBuilder":
+        """Answer fixed-shape lookups from templates before any model call."""
+        self.fast_path = fast_path
+        return self
+
+    def with_turn_budget(self, budget: TurnBudget) -> "GraphBuilder":
+        """Cap each turn's time and tool rounds; force a final answer when the budget runs out."""
+        self.turn_budget = budget
+        return self
+
     def with_system_prompt(self, prompt: str) -> "GraphBuilder":
         """Set custom system prompt."""
         self.system_prompt = prompt
@@ -51,7 +122,14 @@ class GraphBuilder:
             )
 
         # Create workflow
-        self.workflow = StateGraph(state_schema=MessagesState)
+        planning = bool(self.tools) and self.plan_steps > 0
+        if planning:
+            state_schema = PlanState
+        elif self.tools and self.turn_budget is not None:
+            state_schema = TurnState
+        else:
+            state_schema = MessagesState
+        self.workflow = StateGraph(state_schema=state_schema)
 
         if self.tools:
             self._build_agent_graph()
@@ -59,45 +137,163 @@ class GraphBuilder:
             self._build_chat_graph()
 
         # Compile graph
-        checkpointer = MemorySaver() if self.enable_memory else None
+        checkpointer = None
+        if self.enable_memory:
+            checkpointer = self.checkpointer or MemorySaver()
         app = self.workflow.compile(checkpointer=checkpointer)
 
         logger.info(
             f"Graph built - type: {self.agent_type}, "
-            f"tools: {len(self.tools)}, memory: {self.enable_memory}"
+            f"tools: {len(self.tools)}, memory: {self.enable_memory}, "
+            f"planning: {self.plan_steps > 0}, routing: {self.routing}, "
+            f"turn budget: {self.turn_budget is not None}"
         )
 
         return app
 
     def _build_agent_graph(self):
         """Build agent graph with tools."""
+        tools = list(self.tools)
+        if self.result_cache is not None:
+            tools.append(create_recall_tool(self.result_cache))
+
         # Create agent node
         agent_node = create_agent_node(
             model=self.model,
             system_prompt=self.system_prompt,
-            tools=self.tools
+            tools=tools,
+            budgeter=self.budgeter,
+            tool_model=self.tool_model
         )
 
+        tool_node = LoggingToolNode(tools, result_processors=self.result_processors)
+        budget = self.turn_budget
+        end_target = "age" if self.result_cache is not None else END
+
+        if budget is not None:
+            # Model calls share the turn deadline; a cut-off call hands over to finalize
+            agent_node = budget.limit(agent_node, "agent")
+
         # Add nodes
         self.workflow.add_node("agent", agent_node)
-        self.workflow.add_node("tools", LoggingToolNode(self.tools))
+        if budget is not None:
+            # 工具最多執行到回合期限；預算用完時由 finalize 根據已取得的資料回答
+            self.workflow.add_node("tools", create_deadline_tool_node(tool_node, budget))
+            self.workflow.add_node(
+                "finalize",
+                create_finalize_node(
+                    model=self.model,
+                    system_prompt=self.system_prompt,
+                    budget=budget,
+                    budgeter=self.budgeter
+                )
+            )
+            self.workflow.add_edge("finalize", end_target)
+        else:
+            self.workflow.add_node("tools", tool_node)
 
         # Add edges
-        self.workflow.add_edge(START, "agent")
-        self.workflow.add_conditional_edges(
-            "agent",
-            tools_condition,
-        )
-        self.workflow.add_edge("tools", "agent")
+        if self.plan_steps > 0:
+            # 先一次規劃所有工具呼叫並行執行，agent 再根據結果回答
+            # （規劃遺漏時 agent 仍可以照常呼叫工具）
+            planner_node = create_planner_node(
+                model=self.tool_model or self.model,
+                system_prompt=self.system_prompt,
+                tools=tools,
+                budgeter=self.budgeter,
+                max_steps=self.plan_steps
+            )
+            if budget is not None:
+                planner_node = budget.limit(planner_node, "planner")
+            self.workflow.add_node("planner", planner_node)
+            self.workflow.add_node("execute", create_execute_node(tool_node, budget))
+            self.workflow.add_conditional_edges(
+                "planner",
+                route_after_plan,
+                {"execute": "execute", "agent": "agent"},
+            )
+            self._add_tools_exit("execute")
+            entry = "planner"
+            route = route_after_synthesis
+        else:
+            entry = "agent"
+            route = tools_condition
+
+        start_route = None
+        start_targets = {ROUTE_AGENT: entry}
+        if self.routing:
+            # 閒聊先交給不帶工具 schema 的聊天節點，聊天節點判斷需要查詢時再轉給 agent
+            chat_node = create_chat_node(
+                model=self.model,
+                system_prompt=self.system_prompt,
+                budgeter=self.budgeter,
+                escalate=True
+            )
+            if budget is not None:
+                chat_node = budget.limit(chat_node, "chat")
+            self.workflow.add_node("chat", chat_node)
+            start_route = create_routing_node(self.tools, self.router_model)
+            start_targets[ROUTE_CHAT] = "chat"
+            self.workflow.add_conditional_edges(
+                "chat",
+                route_after_chat,
+                {ROUTE_AGENT: entry, END: end_target},
+            )
+            route = track_toolless_turns(route)
+
+        source = START
+        if budget is not None:
+            # 回合開始時間記錄在 state 中，供期限與步驟檢查使用
+            self.workflow.add_node("turn", create_turn_node(budget))
+            self.workflow.add_edge(START, "turn")
+            source = "turn"
+
+        if self.fast_path is not None:
+            # 形狀固定的查詢直接以模板回答，其餘照原本的入口
+            self.workflow.add_node("fast_path", create_fast_path_node(self.fast_path))
+            self.workflow.add_edge(source, "fast_path")
+            self.workflow.add_conditional_edges(
+                "fast_path",
+                route_after_fast_path(start_route, ROUTE_AGENT),
+                {**start_targets, END: end_target},
+            )
+        elif start_route is not None:
+            self.workflow.add_conditional_edges(source, start_route, start_targets)
+        else:
+            self.workflow.add_edge(source, entry)
+
+        if self.result_cache is not None:
+            # 回答完成後先把舊回合的工具結果歸檔再結束
+            self.workflow.add_node("age", create_aging_node(self.result_cache))
+            self.workflow.add_edge("age", END)
+
+        agent_targets = {"tools": "tools", END: end_target}
+        if budget is not None:
+            route = budget.guard(route)
+            agent_targets[ROUTE_FINALIZE] = "finalize"
+        self.workflow.add_conditional_edges("agent", route, agent_targets)
+        self._add_tools_exit("tools")
 
         logger.info("Built agent graph with tools")
 
+    def _add_tools_exit(self, node: str):
+        """Return to the agent after tools run, or finalize when the turn is out of time."""
+        if self.turn_budget is None:
+            self.workflow.add_edge(node, "agent")
+            return
+        self.workflow.add_conditional_edges(
+            node,
+            self.turn_budget.after_tools,
+            {"agent": "agent", ROUTE_FINALIZE: "finalize"},
+        )
+
     def _build_chat_graph(self):
         """Build pure chat graph."""
         # Create chat node
         chat_node = create_chat_node(
             model=self.model,
-            system_prompt=self.system_prompt
+            system_prompt=self.system_prompt,
+            budgeter=self.budgeter
         )
 
         # Add node and edges
@@ -111,22 +307,63 @@ class GraphBuilder:
 def build_lol_agent(
     model: BaseChatModel,
     tools: Optional[list[BaseTool]] = None,
-    enable_memory: bool = True
+    enable_memory: bool = True,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    result_processors: Optional[list[ToolResultProcessor]] = None,
+    budgeter: Optional[TokenBudgeter] = None,
+    result_cache: Optional[ToolResultCache] = None,
+    plan_steps: int = 0,
+    routing: bool = False,
+    router_model: Optional[BaseChatModel] = None,
+    tool_model: Optional[BaseChatModel] = None,
+    fast_path: Optional[FastPath] = None,
+    turn_budget: Optional[TurnBudget] = None
 ):
-    """Build LOL agent."""
-    builder = GraphBuilder(model, agent_type="lol", enable_memory=enable_memory)
+    """Build LOL agent (plan-and-execute when plan_steps > 0)."""
+    builder = GraphBuilder(
+        model, agent_type="lol", enable_memory=enable_memory, checkpointer=checkpointer
+    )
     if tools:
         builder.with_tools(tools)
+    if result_processors:
+        builder.with_result_processors(result_processors)
+    if budgeter:
+        builder.with_token_budget(budgeter)
+    if result_cache is not None:
+        builder.with_result_aging(result_cache)
+    if plan_steps > 0:
+        builder.with_planning(plan_steps)
+    if routing:
+        builder.with_routing(router_model)
+    if tool_model is not None:
+        builder.with_tool_model(tool_model)
+    if fast_path is not None:
+        builder.with_fast_path(fast_path)
+    if turn_budget is not None:
+        builder.with_turn_budget(turn_budget)
     return builder.build()
 
 
+def build_lol_plan_agent(
+    model: BaseChatModel,
+    tools: Optional[list[BaseTool]] = None,
+    max_steps: int = 8,
+    **kwargs
+):
+    """Build LOL plan-and-execute agent: one planning call, concurrent tools, one answer."""
+    return build_lol_agent(model, tools, plan_steps=max_steps, **kwargs)
+
+
 def build_general_agent(
     model: BaseChatModel,
     tools: Optional[list[BaseTool]] = None,
-    enable_memory: bool = True
+    enable_memory: bool = True,
+    checkpointer: Optional[BaseCheckpointSaver] = None
 ):
     """Build general agent."""
-    builder = GraphBuilder(model, agent_type="general", enable_memory=enable_memory)
+    builder = GraphBuilder(
+        model, agent_type="general", enable_memory=enable_memory, checkpointer=checkpointer
+    )
     if tools:
         builder.with_tools(tools)
     return builder.build()
@@ -136,10 +373,13 @@ def build_custom_agent(
     model: BaseChatModel,
     system_prompt: str,
     tools: Optional[list[BaseTool]] = None,
-    enable_memory: bool = True
+    enable_memory: bool = True,
+    checkpointer: Optional[BaseCheckpointSaver] = None
 ):
     """Build custom agent."""
-    builder = GraphBuilder(model, agent_type="custom", enable_memory=enable_memory)
+    builder = GraphBuilder(
+        model, agent_type="custom", enable_memory=enable_memory, checkpointer=checkpointer
+    )
     builder.with_system_prompt(system_prompt)
     if tools:
         builder.with_tools(tools)
@@ -0,0 +1,335 @@
+"""Read-through TTL cache for upstream tool results, kept warm by popularity."""
+
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from langchain_core.tools import BaseTool
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.ratelimit import batch_priority, traffic_priority
+from lol_chat_helper.snapshot import dataset_key, _schema_defaults
+from lol_chat_helper.tooling import content_to_text, tool_result, wrap_tool, ToolCoroutine
+
+
+@dataclass
+class _Entry:
+    """一筆快取的工具結果"""
+
+    text: str
+    expires: float
+
+
+@dataclass
+class _Usage:
+    """一組工具參數的查詢熱度與重新查詢所需的資訊"""
+
+    pure_name: str
+    params: dict
+    score: float = 0.0
+    last_seen: float = field(default_factory=time.monotonic)
+
+
+class ResponseCache:
+    """
+    上游工具結果的 read-through TTL 快取
+
+    設定位於 mcp_config.json 的 responseCache 區塊：
+    {
+      "responseCache": {
+        "enabled": true,
+        "maxEntries": 500,
+        "ttl": {"lol_list_lane_meta_champions": 1800, "lol_list_discounted_skins": 3600},
+        "warmer": {"enabled": true, "topK": 20, "minScore": 2, "interval": 30,
+                   "refreshAhead": 120, "budgetPerMinute": 10, "halfLife": 3600}
+      }
+    }
+
+    只有在 ttl 中列出的工具會被快取（玩家資料等每次都應該即時查詢的工具不列）。
+    desired_value_description 會原樣傳給上游並且是快取鍵的一部分：上游依它只回傳
+    需要的欄位，而大多數工具在本地沒有 toolResults 裁剪規則，拿掉它會讓每次命中都
+    回傳完整結果、佔用更多 prompt。代價是同一組參數要求不同欄位時各自快取。
+    每次查詢都會累計該組參數的熱度，CacheWarmer 依熱度在過期前重新查詢最熱門的項目，
+    熱門的查詢不會遇到冷快取。
+    """
+
+    def __init__(
+        self,
+        ttl: dict[str, float],
+        max_entries: int = 500,
+        half_life: float = 3600.0
+    ):
+        """
+        初始化快取
+
+        Args:
+            ttl: 工具名稱（不含伺服器前綴）對應快取秒數
+            max_entries: 最多保存的結果數
+            half_life: 熱度減半的時間（秒）
+        """
+        self.ttl = {name: float(seconds) for name, seconds in ttl.items() if seconds}
+        self.max_entries = max_entries
+        self.half_life = half_life
+        self.entries: dict[str, _Entry] = {}
+        self.usage: dict[str, _Usage] = {}
+        # 不經快取、直接查詢上游的呼叫（預熱使用）
+        self.fetchers: dict[str, ToolCoroutine] = {}
+        # 快取鍵 -> (發起查詢的優先權, 查詢任務)
+        self._inflight: dict[str, tuple[int, asyncio.Task]] = {}
+        # 預熱中的熱門項目；這些項目仍然 miss 代表預熱跟不上
+        self.warm_keys: set[str] = set()
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["ResponseCache"]:
+        """從完整的 MCP 配置建立；停用或沒有設定 ttl 時回傳 None"""
+        data = config.get("responseCache", {})
+        if not data.get("enabled", True) or not data.get("ttl"):
+            return None
+        return cls(
+            ttl=data["ttl"],
+            max_entries=int(data.get("maxEntries", 500)),
+            half_life=float(data.get("warmer", {}).get("halfLife", 3600)),
+        )
+
+    def _touch(self, key: str, pure_name: str, params: dict):
+        """累計熱度（以 half_life 指數衰減）"""
+        now = time.monotonic()
+        usage = self.usage.get(key)
+        if usage is None:
+            usage = self.usage[key] = _Usage(pure_name, params, last_seen=now)
+            if len(self.usage) > self.max_entries * 4:
+                coldest = min(self.usage, key=lambda k: self._score(self.usage[k], now))
+                del self.usage[coldest]
+        usage.score = self._score(usage, now) + 1.0
+        usage.last_seen = now
+
+    def _score(self, usage: _Usage, now: float) -> float:
+        return usage.score * 0.5 ** ((now - usage.last_seen) / self.half_life)
+
+    def hottest(self, k: int, min_score: float = 0.0) -> list[tuple[str, _Usage]]:
+        """
+        目前最熱門的 k 組參數
+
+        Args:
+            k: 數量
+            min_score: 衰減後的熱度低於此值的項目不列入
+
+        Returns:
+            (快取鍵, 使用資訊) 列表，依熱度由高到低
+        """
+        now = time.monotonic()
+        scored = [(self._score(usage, now), key, usage) for key, usage in self.usage.items()]
+        ranked = sorted((item for item in scored if item[0] >= min_score), key=lambda item: item[0], reverse=True)
+        return [(key, usage) for _, key, usage in ranked[:k]]
+
+    def store(self, key: str, pure_name: str, text: str):
+        """
+        存入結果（超過上限時淘汰最快過期的項目）
+
+        Args:
+            key: 快取鍵
+            pure_name: 工具名稱
+            text: 結果內容
+        """
+        self.entries[key] = _Entry(text, time.monotonic() + self.ttl[pure_name])
+        while len(self.entries) > self.max_entries:
+            oldest = min(self.entries, key=lambda k: self.entries[k].expires)
+            del self.entries[oldest]
+            metrics.incr("response_cache.evicted")
+
+    def fresh(self, key: str) -> Optional[str]:
+        """尚未過期的結果；沒有或已過期時回傳 None"""
+        entry = self.entries.get(key)
+        if entry is None or entry.expires <= time.monotonic():
+            return None
+        return entry.text
+
+    async def fetch(self, key: str, pure_name: str, params: dict) -> Any:
+        """
+        向上游查詢並存入快取；同一個鍵同時只會有一個查詢
+
+        查詢在獨立的任務中執行，第一個呼叫者被取消時其他等待者仍會取得結果。
+        任務沿用發起者的優先權；進行中的查詢是背景優先權（預熱）而呼叫者更優先時，
+        以呼叫者的優先權另外查詢，使用者不會排在背景工作後面。
+
+        Args:
+            key: 快取鍵
+            pure_name: 工具名稱
+            params: 查詢參數（包含 desired_value_description）
+
+        Returns:
+            上游的原始回傳值
+        """
+        priority = traffic_priority.get()
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] <= priority:
+            return await asyncio.shield(inflight[1])
+
+        task = asyncio.ensure_future(self._fetch(key, pure_name, params))
+        entry = (priority, task)
+        self._inflight[key] = entry
+
+        def done(finished: asyncio.Future):
+            if self._inflight.get(key) is entry:
+                del self._inflight[key]
+            if not finished.cancelled():
+                finished.exception()  # 沒有等待者時不留下未取得的例外
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, pure_name: str, params: dict) -> Any:
+        result = await self.fetchers[pure_name](**params)
+        text = content_to_text(result[0] if isinstance(result, tuple) else result)
+        # 只保存看起來是正常資料的結果（錯誤訊息或暫時無法取得的說明不保存）
+        if text.lstrip().startswith("{"):
+            self.store(key, pure_name, text)
+        return result
+
+    def wrap(self, tool: BaseTool, pure_name: str) -> BaseTool:
+        """
+        讓工具先從快取回應
+
+        Args:
+            tool: 已包裝好呼叫防護與速率限制的工具
+            pure_name: 不含伺服器前綴的工具名稱
+
+        Returns:
+            包裝後的工具；沒有設定 ttl 的工具回傳原工具
+        """
+        if pure_name not in self.ttl:
+            return tool
+        defaults = _schema_defaults(tool)
+
+        def wrapper(coroutine):
+            self.fetchers[pure_name] = coroutine
+
+            async def cached(**kwargs: Any):
+                params = dict(kwargs)
+                key = dataset_key(pure_name, {**defaults, **params})
+                # dataset_key 忽略 desired_value_description（快照保存完整資料），這裡要分開快取
+                description = params.get("desired_value_description")
+                if description:
+                    key = f"{key}|{description}"
+                self._touch(key, pure_name, params)
+                text = self.fresh(key)
+                if text is not None:
+                    metrics.incr("response_cache.hit")
+                    return tool_result(tool, text)
+                metrics.incr("response_cache.miss")
+                if key in self.warm_keys:
+                    metrics.incr("response_cache.hot_miss")
+                return await self.fetch(key, pure_name, params)
+            return cached
+
+        return wrap_tool(tool, wrapper)
+
+    def status(self) -> dict:
+        """快取狀態"""
+        now = time.monotonic()
+        return {
+            "entries": len(self.entries),
+            "fresh": sum(1 for entry in self.entries.values() if entry.expires > now),
+            "tracked": len(self.usage),
+        }
+
+
+class CacheWarmer:
+    """
+    背景預熱：在熱門項目過期前重新查詢
+
+    每 interval 秒檢查熱度前 top_k（且熱度不低於 min_score）的項目，快取在 refresh_ahead 秒內過期
+    （或已經過期）的項目以背景優先權重新查詢，每分鐘最多 budget_per_minute 次，
+    不會和使用者的查詢搶上游的速率限制。
+    """
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        top_k: int = 20,
+        min_score: float = 2.0,
+        interval: float = 30.0,
+        refresh_ahead: float = 120.0,
+        budget_per_minute: int = 10
+    ):
+        """
+        初始化預熱
+
+        Args:
+            cache: 要預熱的快取
+            top_k: 維持預熱的熱門項目數
+            min_score: 衰減後的熱度至少要有多少才預熱（只查詢過一次且已經冷掉的項目不預熱）
+            interval: 檢查間隔（秒）
+            refresh_ahead: 過期前多久重新查詢（秒）
+            budget_per_minute: 每分鐘最多向上游查詢的次數
+        """
+        self.cache = cache
+        self.top_k = top_k
+        self.min_score = min_score
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.budget_per_minute = budget_per_minute
+        self._spent: list[float] = []
+
+    @classmethod
+    def from_config(cls, cache: ResponseCache, config: dict) -> Optional["CacheWarmer"]:
+        """從完整的 MCP 配置建立；停用時回傳 None"""
+        data = config.get("responseCache", {}).get("warmer", {})
+        if not data.get("enabled", True):
+            return None
+        return cls(
+            cache,
+            top_k=int(data.get("topK", 20)),
+            min_score=float(data.get("minScore", 2.0)),
+            interval=float(data.get("interval", 30)),
+            refresh_ahead=float(data.get("refreshAhead", 120)),
+            budget_per_minute=int(data.get("budgetPerMinute", 10)),
+        )
+
+    def _budget_left(self) -> int:
+        now = time.monotonic()
+        self._spent = [t for t in self._spent if now - t < 60]
+        return self.budget_per_minute - len(self._spent)
+
+    async def warm_once(self) -> int:
+        """
+        預熱一輪
+
+        Returns:
+            重新查詢的項目數
+        """
+        refreshed = 0
+        deadline = time.monotonic() + self.refresh_ahead
+        hottest = self.cache.hottest(self.top_k, self.min_score)
+        self.cache.warm_keys = {key for key, _ in hottest}
+        for key, usage in hottest:
+            entry = self.cache.entries.get(key)
+            if entry is not None and entry.expires > deadline:
+                continue
+            if self._budget_left() <= 0:
+                metrics.incr("response_cache.warm_deferred")
+                break
+            self._spent.append(time.monotonic())
+            try:
+                await self.cache.fetch(key, usage.pure_name, usage.params)
+            except Exception as e:
+                metrics.incr("response_cache.warm_failed")
+                logger.debug(f"[Warmer] Refresh failed for {key}: {e}")
+                continue
+            refreshed += 1
+        if refreshed:
+            metrics.incr("response_cache.warmed", refreshed)
+            logger.debug(f"[Warmer] Refreshed {refreshed} hot entries")
+        return refreshed
+
+    async def run(self):
+        """背景任務：定期預熱（上游呼叫以背景優先權排隊）"""
+        with batch_priority():
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    await self.warm_once()
+                except Exception as e:
+                    logger.warning(f"快取預熱失敗: {e}")
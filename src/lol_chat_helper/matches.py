@@ -0,0 +1,463 @@
+"""Local, incrementally synced store of summoner match history."""
+
+import json
+import time
+import zlib
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from langchain_core.tools import BaseTool
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.tabular import TabularDecoder, is_tabular
+from lol_chat_helper.tooling import content_to_text, tool_result, wrap_tool
+
+
+MATCH_LIST_TOOL = "lol_list_summoner_matches"
+GAME_DETAIL_TOOL = "lol_get_summoner_game_detail"
+
+# OP.GG 的欄位名稱可能隨版本變動，依序嘗試
+MATCH_ID_FIELDS = ("game_id", "match_id", "id", "gameId")
+CREATED_AT_FIELDS = ("created_at", "game_created_at", "gameCreation", "created")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summoners (
+    riot_id TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    descriptions BLOB,
+    PRIMARY KEY (riot_id, lang)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    riot_id TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    game_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    body BLOB NOT NULL,
+    PRIMARY KEY (riot_id, lang, game_id)
+);
+CREATE INDEX IF NOT EXISTS matches_recent ON matches (riot_id, lang, created_at DESC);
+CREATE TABLE IF NOT EXISTS game_details (
+    region TEXT NOT NULL,
+    game_id TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    body BLOB NOT NULL,
+    PRIMARY KEY (region, game_id, lang)
+);
+"""
+
+
+def _pack(value: Any) -> bytes:
+    """以精簡 JSON + zlib 壓縮儲存"""
+    text = value if isinstance(value, str) else json.dumps(
+        value, ensure_ascii=False, separators=(",", ":")
+    )
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def _unpack_text(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def _first_field(row: dict, names: Iterable[str]) -> Optional[Any]:
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def riot_key(game_name: str, tag_line: str, region: str) -> str:
+    """
+    Riot ID 的正規化鍵（不分大小寫），例如 ``hide on bush#kr1@KR``
+
+    Args:
+        game_name: Riot ID 前半
+        tag_line: Riot ID 後半
+        region: 伺服器區域
+    """
+    return f"{game_name.strip().lower()}#{tag_line.strip().lower()}@{region.strip().upper()}"
+
+
+def extract_matches(text: str) -> Optional[tuple[list[dict], dict]]:
+    """
+    從 lol_list_summoner_matches 的結果中取出比賽列表
+
+    支援 headers/rows 格式與一般 JSON（任意位置的物件陣列）。
+
+    Args:
+        text: 工具結果文字
+
+    Returns:
+        (依時間由新到舊的比賽列表, column_descriptions)；無法解析時回傳 None
+    """
+    if is_tabular(text):
+        decoder = TabularDecoder(text)
+        try:
+            rows = [row.as_dict() for row in decoder]
+        except ValueError:
+            return None
+        matches = [row for row in rows if _first_field(row, MATCH_ID_FIELDS) is not None]
+        descriptions = decoder.column_descriptions
+    else:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            return None
+        matches = _find_match_list(payload) or []
+        descriptions = payload.get("column_descriptions", {}) if isinstance(payload, dict) else {}
+
+    if not matches:
+        return None
+    matches.sort(key=lambda m: str(_first_field(m, CREATED_AT_FIELDS) or ""), reverse=True)
+    return matches, descriptions
+
+
+def _find_match_list(value: Any, depth: int = 0) -> Optional[list[dict]]:
+    """在一般 JSON 中尋找帶有比賽 id 的物件陣列"""
+    if depth > 4:
+        return None
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value) and \
+                _first_field(value[0], MATCH_ID_FIELDS) is not None:
+            return list(value)
+        items = value
+    elif isinstance(value, dict):
+        items = value.values()
+    else:
+        return None
+    for item in items:
+        found = _find_match_list(item, depth + 1)
+        if found:
+            return found
+    return None
+
+
+class MatchStore:
+    """
+    以 Riot ID 與比賽 id 為鍵的本地比賽紀錄（SQLite）
+
+    比賽摘要與比賽詳細資料都以 zlib 壓縮的 JSON 存放在磁碟上。查詢比賽紀錄時，
+    最近同步過且本地筆數足夠就直接使用本地資料；否則先以少量筆數向上游探測，
+    只有探測結果全是新比賽時才抓取完整筆數，新比賽合併進本地資料後再回傳。
+    比賽詳細資料在比賽結束後不會再變，第一次取得後永久使用本地資料。
+
+    設定位於 mcp_config.json 的 matchStore 區塊：
+    {
+      "matchStore": {"enabled": true, "path": ".cache/matches.sqlite3",
+                     "freshSeconds": 300, "probeLimit": 5}
+    }
+    """
+
+    def __init__(
+        self,
+        path: str = ".cache/matches.sqlite3",
+        fresh_seconds: float = 300.0,
+        probe_limit: int = 5,
+        default_limit: int = 20
+    ):
+        """
+        初始化比賽紀錄庫
+
+        Args:
+            path: SQLite 檔案路徑（":memory:" 表示只存在記憶體）
+            fresh_seconds: 同步後多久內直接使用本地資料（秒）
+            probe_limit: 增量同步時先向上游要求的比賽筆數
+            default_limit: 呼叫端未指定 limit 時的筆數
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.fresh_seconds = fresh_seconds
+        self.probe_limit = probe_limit
+        self.default_limit = default_limit
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        # 包裝後的 lol_list_summoner_matches，供本地工具觸發同步
+        self.match_list_tool: Optional[BaseTool] = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["MatchStore"]:
+        """從完整的 MCP 配置建立比賽紀錄庫；停用時回傳 None"""
+        data = config.get("matchStore", {})
+        if not data.get("enabled", True):
+            return None
+        return cls(
+            path=data.get("path", ".cache/matches.sqlite3"),
+            fresh_seconds=float(data.get("freshSeconds", 300)),
+            probe_limit=int(data.get("probeLimit", 5)),
+            default_limit=int(data.get("defaultLimit", 20)),
+        )
+
+    # -- Storage -------------------------------------------------------------
+
+    def known_ids(self, key: str, lang: str) -> set[str]:
+        """本地已有的比賽 id"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT game_id FROM matches WHERE riot_id = ? AND lang = ?", (key, lang)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def add_matches(self, key: str, lang: str, matches: list[dict], descriptions: dict) -> int:
+        """
+        合併比賽並更新同步時間
+
+        Returns:
+            新增的比賽數
+        """
+        records = []
+        for match in matches:
+            game_id = str(_first_field(match, MATCH_ID_FIELDS))
+            created_at = str(_first_field(match, CREATED_AT_FIELDS) or "")
+            records.append((key, lang, game_id, created_at, _pack(match)))
+
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO matches (riot_id, lang, game_id, created_at, body) "
+                "VALUES (?, ?, ?, ?, ?)",
+                records,
+            )
+            added = self._db.total_changes - before
+            self._db.execute(
+                "INSERT OR REPLACE INTO summoners (riot_id, lang, synced_at, descriptions) "
+                "VALUES (?, ?, ?, ?)",
+                (key, lang, time.time(), _pack(descriptions) if descriptions else None),
+            )
+        return added
+
+    def recent_matches(self, key: str, lang: str, limit: Optional[int] = None) -> list[dict]:
+        """依時間由新到舊取出本地比賽"""
+        query = (
+            "SELECT body FROM matches WHERE riot_id = ? AND lang = ? "
+            "ORDER BY created_at DESC"
+        )
+        params: tuple = (key, lang)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [json.loads(_unpack_text(row[0])) for row in rows]
+
+    def summoner(self, key: str, lang: str) -> Optional[tuple[float, dict]]:
+        """取得 (上次同步時間, column_descriptions)；從未同步時回傳 None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT synced_at, descriptions FROM summoners WHERE riot_id = ? AND lang = ?",
+                (key, lang),
+            ).fetchone()
+        if row is None:
+            return None
+        descriptions = json.loads(_unpack_text(row[1])) if row[1] else {}
+        return row[0], descriptions
+
+    def match_count(self, key: str, lang: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM matches WHERE riot_id = ? AND lang = ?", (key, lang)
+            ).fetchone()[0]
+
+    def game_detail(self, region: str, game_id: str, lang: str) -> Optional[str]:
+        """取得本地的比賽詳細資料"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body FROM game_details WHERE region = ? AND game_id = ? AND lang = ?",
+                (region.upper(), game_id, lang),
+            ).fetchone()
+        return _unpack_text(row[0]) if row else None
+
+    def save_game_detail(self, region: str, game_id: str, lang: str, text: str):
+        """儲存比賽詳細資料"""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO game_details (region, game_id, lang, body) "
+                "VALUES (?, ?, ?, ?)",
+                (region.upper(), game_id, lang, _pack(text)),
+            )
+
+    def close(self):
+        """關閉資料庫連線"""
+        with self._lock:
+            self._db.close()
+
+    # -- Sync ----------------------------------------------------------------
+
+    async def sync(
+        self,
+        key: str,
+        lang: str,
+        limit: int,
+        fetch: Callable[[int], Awaitable[str]]
+    ) -> Optional[int]:
+        """
+        從上游增量同步比賽紀錄
+
+        Args:
+            key: riot_key
+            lang: 語言
+            limit: 需要的比賽筆數
+            fetch: 以筆數向上游查詢、回傳結果文字的函數
+
+        Returns:
+            新增的比賽數；上游結果無法解析時回傳 None
+        """
+        known = await asyncio.to_thread(self.known_ids, key, lang)
+        probe = min(limit, self.probe_limit) if known else limit
+
+        extracted = extract_matches(await fetch(probe))
+        if extracted is None:
+            return None
+        matches, descriptions = extracted
+        new = [m for m in matches if str(_first_field(m, MATCH_ID_FIELDS)) not in known]
+
+        # 探測到的全是新比賽，代表與本地資料之間可能還有缺口
+        if known and probe < limit and len(new) == len(matches) and len(matches) >= probe:
+            extracted = extract_matches(await fetch(limit))
+            if extracted is None:
+                return None
+            matches, descriptions = extracted
+            new = [m for m in matches if str(_first_field(m, MATCH_ID_FIELDS)) not in known]
+
+        added = await asyncio.to_thread(self.add_matches, key, lang, new, descriptions)
+        metrics.incr("match_store.sync")
+        metrics.incr("match_store.new_matches", added)
+        logger.debug(f"比賽紀錄同步 {key}: 新增 {added} 場")
+        return added
+
+    def render(self, key: str, lang: str, limit: int, note: str = "") -> str:
+        """
+        將本地比賽以 headers/rows 格式輸出（與上游格式相容，可再經過裁剪與編碼）
+
+        Args:
+            key: riot_key
+            lang: 語言
+            limit: 最多幾場
+            note: 附加說明
+
+        Returns:
+            JSON 文字
+        """
+        matches = self.recent_matches(key, lang, limit)
+        info = self.summoner(key, lang)
+        headers: list[str] = []
+        for match in matches:
+            for column in match:
+                if column not in headers:
+                    headers.append(column)
+
+        payload: dict[str, Any] = {}
+        if info and info[1]:
+            payload["column_descriptions"] = info[1]
+        payload["data"] = {
+            "matches": {
+                "headers": headers,
+                "rows": [[match.get(column) for column in headers] for match in matches],
+            }
+        }
+        payload["source"] = "local match store"
+        if info:
+            payload["synced_at"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(info[0]))
+        if note:
+            payload["note"] = note
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+    # -- Tool wrapping -------------------------------------------------------
+
+    def wrap(self, tool: BaseTool, pure_name: str) -> BaseTool:
+        """
+        讓比賽相關工具經過本地紀錄庫
+
+        Args:
+            tool: 已包裝好呼叫防護的工具
+            pure_name: 不含伺服器前綴的工具名稱
+
+        Returns:
+            包裝後的工具；不是比賽相關工具時回傳原工具
+        """
+        if pure_name == MATCH_LIST_TOOL:
+            self.match_list_tool = wrap_tool(
+                tool, lambda coroutine: self._wrap_match_list(tool, coroutine)
+            )
+            return self.match_list_tool
+        if pure_name == GAME_DETAIL_TOOL:
+            return wrap_tool(tool, lambda coroutine: self._wrap_game_detail(tool, coroutine))
+        return tool
+
+    def _wrap_match_list(self, tool: BaseTool, coroutine):
+        async def match_list(**kwargs):
+            game_name, tag_line = kwargs.get("game_name"), kwargs.get("tag_line")
+            region = kwargs.get("region")
+            if not (game_name and tag_line and region):
+                return await coroutine(**kwargs)
+
+            key = riot_key(game_name, tag_line, region)
+            lang = kwargs.get("lang") or ""
+            limit = int(kwargs.get("limit") or self.default_limit)
+
+            # SQLite 的讀寫都在 worker 執行緒進行，不阻塞事件迴圈
+            info = await asyncio.to_thread(self.summoner, key, lang)
+            if info and time.time() - info[0] < self.fresh_seconds \
+                    and await asyncio.to_thread(self.match_count, key, lang) >= limit:
+                metrics.incr("match_store.hit")
+                return tool_result(tool, await asyncio.to_thread(self.render, key, lang, limit))
+
+            last_result = None
+
+            async def fetch(count: int) -> str:
+                nonlocal last_result
+                # 同步時要求完整欄位，不帶 desired_value_description
+                params = {k: v for k, v in kwargs.items() if k != "desired_value_description"}
+                params["limit"] = count
+                last_result = await coroutine(**params)
+                content = last_result[0] if isinstance(last_result, tuple) else last_result
+                return content_to_text(content)
+
+            try:
+                added = await self.sync(key, lang, limit, fetch)
+            except Exception as e:
+                if info is None:
+                    raise
+                logger.warning(f"同步 {key} 的比賽紀錄失敗，改用本地資料: {e}")
+                added = None
+
+            if added is None:
+                if info is None:
+                    # 上游回傳的不是比賽列表（例如找不到召喚師），把剛才的結果原樣交給模型，
+                    # 不再向上游查詢一次
+                    return last_result
+                return tool_result(tool, await asyncio.to_thread(
+                    self.render, key, lang, limit, "上游暫時無法取得最新資料，以下為本地保存的紀錄"
+                ))
+            return tool_result(tool, await asyncio.to_thread(self.render, key, lang, limit))
+
+        return match_list
+
+    def _wrap_game_detail(self, tool: BaseTool, coroutine):
+        async def game_detail(**kwargs):
+            region, game_id = kwargs.get("region"), kwargs.get("game_id")
+            if not (region and game_id):
+                return await coroutine(**kwargs)
+            lang = kwargs.get("lang") or ""
+
+            cached = await asyncio.to_thread(self.game_detail, region, str(game_id), lang)
+            if cached is not None:
+                metrics.incr("match_store.detail_hit")
+                return tool_result(tool, cached)
+
+            metrics.incr("match_store.detail_miss")
+            params = {k: v for k, v in kwargs.items() if k != "desired_value_description"}
+            result = await coroutine(**params)
+            text = content_to_text(result[0] if isinstance(result, tuple) else result)
+            # 只保存看起來是正常資料的結果（錯誤訊息或暫時無法取得的說明不保存）
+            if text.lstrip().startswith("{"):
+                await asyncio.to_thread(self.save_game_detail, region, str(game_id), lang, text)
+            return result
+
+        return game_detail
@@ -1,13 +1,26 @@
 """MCP (Model Context Protocol) Tool Manager."""
 
 import json
+import asyncio
+import logging
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from langchain_core.tools import BaseTool
 from langchain_mcp_adapters.client import MultiServerMCPClient
 
 from lol_chat_helper.config import logger
+from lol_chat_helper.resilience import ToolCallGuard
+from lol_chat_helper.ratelimit import RateLimiter
+from lol_chat_helper.hotcache import ResponseCache, CacheWarmer
+from lol_chat_helper.replicas import ReplicaGroup, ReplicaSession, replica_names
+from lol_chat_helper.registry import ToolRegistry
+from lol_chat_helper.matches import MatchStore
+from lol_chat_helper.snapshot import StaticDataStore
+
+
+# 程序內實作的工具所屬的「伺服器」名稱（在 toolsConfig 中同樣以此分組）
+LOCAL_SERVER = "local"
 
 
 class MCPToolManager:
@@ -15,6 +28,8 @@ class MCPToolManager:
     MCP 工具管理器
 
     負責管理 MCP 伺服器連線、工具載入和過濾。
+    工具以名稱索引保存在 ToolRegistry 中；toolsConfig 變更時可以熱重載，
+    只重建啟用集合，不會中斷 MCP 連線。
     """
 
     def __init__(self, config_path: str = "mcp_config.json"):
@@ -28,10 +43,31 @@ class MCPToolManager:
         self.config_path = Path(config_path)
         self.config = self._load_config()
         self.client: Optional[MultiServerMCPClient] = None
-        self.all_tools: list[BaseTool] = []
-        self.enabled_tools: list[BaseTool] = []
+        self.registry = ToolRegistry()
+        self.rate_limiter = RateLimiter.from_config(self.config)
+        self.call_guard = ToolCallGuard.from_config(
+            self.config, hedge_admission=self.rate_limiter.try_acquire
+        )
+        self.response_cache = ResponseCache.from_config(self.config)
+        self.cache_warmer: Optional[CacheWarmer] = None
+        if self.response_cache:
+            self.cache_warmer = CacheWarmer.from_config(self.response_cache, self.config)
+        self.replica_groups: dict[str, ReplicaGroup] = {}
+        self.replica_sessions: list[ReplicaSession] = []
+        self.match_store: Optional[MatchStore] = None
+        self.static_data: Optional[StaticDataStore] = None
         self._initialized = False
 
+    @property
+    def all_tools(self) -> list[BaseTool]:
+        """所有已載入的工具"""
+        return self.registry.all_tools()
+
+    @property
+    def enabled_tools(self) -> list[BaseTool]:
+        """啟用的工具"""
+        return self.registry.enabled_tools()
+
     def _load_config(self) -> dict:
         """載入 MCP 配置檔案"""
         try:
@@ -63,25 +99,54 @@ class MCPToolManager:
         try:
             logger.info("開始初始化 MCP 客戶端...")
 
-            # 建立 MultiServerMCPClient
+            # 建立 MultiServerMCPClient（replicas > 1 的伺服器展開成多個連線）
             mcp_servers = self.config.get("mcpServers", {})
             if not mcp_servers:
                 raise ValueError("MCP 配置中沒有定義任何伺服器")
 
-            self.client = MultiServerMCPClient(mcp_servers)
+            connections = self._build_connections(mcp_servers)
+            self.client = MultiServerMCPClient(connections)
 
             # 紀錄連線的伺服器
             self.servers = list(mcp_servers.keys())
             logger.info(f"已連線到 MCP 伺服器: {self.servers}")
 
-            # 載入所有工具
+            # 本地比賽紀錄庫：重複查詢同一位玩家時只向上游同步新比賽
+            self.match_store = MatchStore.from_config(self.config)
+            # 靜態資料（英雄、裝備、路線 meta）依遊戲版本寫成共用的 mmap 快照
+            self.static_data = StaticDataStore.from_config(self.config)
+
+            # 載入所有工具，並加上呼叫期限、hedge 與斷路器；
+            # 速率限制在防護之外，排隊的時間不計入呼叫期限
             logger.info("正在從 MCP 伺服器載入工具...")
-            self.all_tools = await self.client.get_tools()
-            logger.info(f"成功載入 {len(self.all_tools)} 個工具")
+            upstream: dict[str, BaseTool] = {}
+            for server_name in self.servers:
+                for tool in await self._load_server_tools(server_name):
+                    _, pure_tool_name = self._parse_tool_name(tool.name)
+                    tool = self.call_guard.wrap(tool, server_name)
+                    tool = self.rate_limiter.wrap(tool, server_name)
+                    if self.response_cache:
+                        tool = self.response_cache.wrap(tool, pure_tool_name)
+                    if self.match_store:
+                        tool = self.match_store.wrap(tool, pure_tool_name)
+                    if self.static_data:
+                        tool = self.static_data.wrap(tool, pure_tool_name)
+                    self.registry.register(tool, server_name, pure_tool_name)
+                    upstream[pure_tool_name] = tool
+            # 本地工具（以本地比賽紀錄計算統計），是否啟用同樣由 toolsConfig 決定
+            if self.match_store:
+                from lol_chat_helper.aggregate import create_match_stats_tool, MATCH_STATS_TOOL
+                self.registry.register(
+                    create_match_stats_tool(self.match_store), LOCAL_SERVER, MATCH_STATS_TOOL
+                )
+            # 複合查詢工具：一次呼叫並行展開多個英雄／位置的上游查詢
+            from lol_chat_helper.batch import create_batch_tools
+            for name, tool in create_batch_tools(upstream).items():
+                self.registry.register(tool, LOCAL_SERVER, name)
+            logger.info(f"成功載入 {len(self.registry)} 個工具")
 
             # 過濾啟用的工具
-            self.enabled_tools = self._filter_enabled_tools()
-            logger.info(f"啟用 {len(self.enabled_tools)}/{len(self.all_tools)} 個工具")
+            self._apply_tools_config()
 
             self._initialized = True
             return self.enabled_tools
@@ -108,9 +173,116 @@ class MCPToolManager:
                 return server, tool_name[len(prefix):]
         return "", tool_name
 
-    def _filter_enabled_tools(self) -> list[BaseTool]:
+    def _build_connections(self, mcp_servers: dict) -> dict:
+        """
+        將 mcpServers 設定轉換為 MultiServerMCPClient 的連線設定
+
+        伺服器設定中的 "replicas": N 會展開成 N 個相同的連線（例如
+        opgg-mcp、opgg-mcp@2 ...），並建立對應的 ReplicaGroup。
+
+        Args:
+            mcp_servers: mcp_config.json 的 mcpServers 區塊
+
+        Returns:
+            連線名稱對應連線設定的字典
+        """
+        connections = {}
+        self.replica_groups = {}
+        for server_name, server_config in mcp_servers.items():
+            connection = {
+                key: value for key, value in server_config.items()
+                if key not in ("replicas", "loadBalancing")
+            }
+            count = max(1, int(server_config.get("replicas", 1)))
+            names = replica_names(server_name, count)
+            for name in names:
+                connections[name] = dict(connection)
+
+            if count > 1:
+                balancing = server_config.get("loadBalancing", {})
+                self.replica_groups[server_name] = ReplicaGroup(
+                    server_name,
+                    names,
+                    eject_after=int(balancing.get("ejectAfter", 3)),
+                    eject_seconds=float(balancing.get("ejectSeconds", 30.0)),
+                )
+                logger.info(f"伺服器 {server_name} 使用 {count} 個 replica")
+        return connections
+
+    async def _load_server_tools(self, server_name: str) -> list[BaseTool]:
+        """
+        載入單一（邏輯）伺服器的工具
+
+        有多個 replica 時，每個 replica 維持一個持續開啟的 session 並從中載入
+        工具，再將同名工具合併成由 ReplicaGroup 路由的單一工具；連線失敗的
+        replica 會被略過。
+
+        Args:
+            server_name: 伺服器名稱
+
+        Returns:
+            工具列表
+        """
+        group = self.replica_groups.get(server_name)
+        if group is None:
+            tools = await self.client.get_tools(server_name=server_name)
+        else:
+            sessions = [
+                ReplicaSession(name, lambda name=name: self.client.session(name))
+                for name in group.replicas
+            ]
+            results = await asyncio.gather(
+                *(self._load_replica_tools(session) for session in sessions),
+                return_exceptions=True,
+            )
+            tools_by_replica: dict[str, dict[str, BaseTool]] = {}
+            for session, result in zip(sessions, results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"replica {session.name} 載入工具失敗，已略過: {result}")
+                    await session.close()
+                    continue
+                self.replica_sessions.append(session)
+                tools_by_replica[session.name] = {tool.name: tool for tool in result}
+            if not tools_by_replica:
+                raise RuntimeError(f"伺服器 {server_name} 的所有 replica 都無法連線")
+
+            first = next(iter(tools_by_replica.values()))
+            tools = [
+                group.wrap({
+                    replica_name: replica_tools[tool_name]
+                    for replica_name, replica_tools in tools_by_replica.items()
+                    if tool_name in replica_tools
+                })
+                for tool_name in first
+            ]
+
+        return tools
+
+    async def _load_replica_tools(self, session: ReplicaSession) -> list[BaseTool]:
+        """
+        從 replica 的持續 session 載入工具（呼叫時沿用同一個 session）
+
+        Args:
+            session: replica session
+
+        Returns:
+            綁定到該 session 的工具列表
         """
-        根據配置過濾啟用的工具
+        from langchain_mcp_adapters.tools import load_mcp_tools
+
+        await session.connect()
+        return await load_mcp_tools(
+            session,
+            callbacks=self.client.callbacks,
+            tool_interceptors=self.client.tool_interceptors,
+            server_name=session.name,
+            tool_name_prefix=self.client.tool_name_prefix,
+            handle_tool_errors=self.client.handle_tool_errors,
+        )
+
+    def _apply_tools_config(self) -> bool:
+        """
+        根據配置重建啟用的工具集合
 
         新格式：toolsConfig 按伺服器分組，enabled 是工具名稱陣列
         例如：
@@ -123,69 +295,74 @@ class MCPToolManager:
         }
 
         Returns:
-            啟用的工具列表
+            啟用集合是否有變動
         """
-        tools_config = self.config.get("toolsConfig", {})
-        enabled_tools = []
-
-        # DEBUG: Log all tool names to understand format
-        logger.info("=" * 60)
-        logger.info("工具過濾診斷資訊")
-        logger.info("=" * 60)
-        logger.info(f"從 MCP 伺服器載入的工具列表 (共 {len(self.all_tools)} 個):")
-        for i, tool in enumerate(self.all_tools, 1):
-            logger.info(f"  {i}. 名稱: {tool.name}")
-            logger.info(f"     描述: {getattr(tool, 'description', 'N/A')[:100]}")
-
-        logger.info(f"\n配置檔案中的 toolsConfig:")
-        for srv_name, srv_config in tools_config.items():
-            enabled_list = srv_config.get("enabled", [])
-            logger.info(f"  伺服器: {srv_name}")
-            logger.info(f"  啟用列表 (共 {len(enabled_list)} 個): {enabled_list}")
-
-        logger.info("\n開始匹配工具...")
-        logger.info("=" * 60)
-
-        for tool in self.all_tools:
-            # 解析工具名稱，提取伺服器名稱和純工具名稱
-            server_name, pure_tool_name = self._parse_tool_name(tool.name)
-            logger.debug(f"處理工具: {tool.name}")
-            logger.debug(f"  解析結果 -> 伺服器: '{server_name}', 純名稱: '{pure_tool_name}'")
-            is_enabled = False
-
-            # 檢查該伺服器的 enabled 陣列
-            if server_name in tools_config:
-                enabled_list = tools_config[server_name].get("enabled", [])
-                logger.debug(f"  找到伺服器配置 '{server_name}'，enabled 列表: {enabled_list}")
-
-                if pure_tool_name in enabled_list:
-                    is_enabled = True
-                    logger.info(f"✅ 啟用: {tool.name} (匹配到: {pure_tool_name})")
-                else:
-                    logger.debug(f"  '{pure_tool_name}' 不在 enabled 列表中")
-            else:
-                logger.debug(f"  伺服器 '{server_name}' 不在 toolsConfig 中")
-                # 如果找不到對應的伺服器配置，嘗試在所有伺服器的 enabled 陣列中查找
-                for srv_name, srv_config in tools_config.items():
-                    enabled_list = srv_config.get("enabled", [])
-                    logger.debug(f"  備用檢查 - 伺服器 {srv_name} 的 enabled 列表: {enabled_list}")
-
-                    # 檢查純工具名稱或完整名稱是否在 enabled 陣列中
-                    if pure_tool_name in enabled_list or tool.name in enabled_list:
-                        is_enabled = True
-                        logger.info(f"✅ 啟用: {tool.name} (從伺服器 {srv_name} 配置中找到)")
-                        break
-
-            if is_enabled:
-                enabled_tools.append(tool)
-            else:
-                logger.debug(f"❌ 停用: {tool.name}")
-
-        logger.info("=" * 60)
-        logger.info(f"過濾完成：啟用 {len(enabled_tools)}/{len(self.all_tools)} 個工具")
-        logger.info("=" * 60)
-
-        return enabled_tools
+        added, removed = self.registry.apply_config(self.config.get("toolsConfig", {}))
+
+        if logger.isEnabledFor(logging.DEBUG):
+            for name in sorted(added):
+                logger.debug(f"✅ 啟用: {name}")
+            for name in sorted(removed):
+                logger.debug(f"❌ 停用: {name}")
+
+        logger.info(f"工具過濾完成：啟用 {len(self.registry.enabled_names())}/{len(self.registry)} 個工具")
+        return bool(added or removed)
+
+    def reload_config(self) -> bool:
+        """
+        重新讀取配置檔案並重建啟用的工具集合
+
+        只有 toolsConfig 會立即生效；mcpServers 的變更需要重新啟動。
+        讀取失敗時保留目前的配置。
+
+        Returns:
+            啟用集合是否有變動
+        """
+        try:
+            config = self._load_config()
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"重新載入 MCP 配置失敗，保留目前的設定: {e}")
+            return False
+
+        if config.get("mcpServers") != self.config.get("mcpServers"):
+            logger.warning("mcpServers 的變更需要重新啟動才會生效")
+
+        self.config["toolsConfig"] = config.get("toolsConfig", {})
+        if not self._initialized:
+            return False
+        return self._apply_tools_config()
+
+    def _config_mtime(self) -> Optional[float]:
+        try:
+            return self.config_path.stat().st_mtime
+        except OSError:
+            return None
+
+    async def watch_config(
+        self,
+        on_change: Callable[[list[BaseTool]], None],
+        interval: float = 2.0
+    ):
+        """
+        監看配置檔案，toolsConfig 變更時熱重載
+
+        以輪詢檔案修改時間的方式監看，適合作為背景任務執行。
+
+        Args:
+            on_change: 啟用集合變動時呼叫，參數為新的啟用工具列表
+            interval: 輪詢間隔（秒）
+        """
+        last_mtime = self._config_mtime()
+        while True:
+            await asyncio.sleep(interval)
+            mtime = self._config_mtime()
+            if mtime is None or mtime == last_mtime:
+                continue
+            last_mtime = mtime
+
+            logger.info("偵測到 MCP 配置變更，重新載入工具設定...")
+            if self.reload_config():
+                on_change(self.enabled_tools)
 
     def get_enabled_tools(self) -> list[BaseTool]:
         """
@@ -209,7 +386,7 @@ class MCPToolManager:
         Returns:
             工具是否啟用
         """
-        return any(tool.name == tool_name for tool in self.enabled_tools)
+        return self.registry.is_enabled(tool_name)
 
     def get_tools_status(self) -> dict:
         """
@@ -235,8 +412,8 @@ class MCPToolManager:
         """
         tools_config = self.config.get("toolsConfig", {})
 
-        enabled_count = len(self.enabled_tools)
-        total_count = len(self.all_tools) if self._initialized else 0
+        enabled_count = len(self.registry.enabled_names())
+        total_count = len(self.registry) if self._initialized else 0
 
         # 按伺服器分組統計
         servers_info = {}
@@ -250,15 +427,12 @@ class MCPToolManager:
         # 建立所有工具的詳細狀態列表
         tools_list = []
         if self._initialized:
-            for tool in self.all_tools:
-                server_name, pure_tool_name = self._parse_tool_name(tool.name)
-                is_enabled = tool in self.enabled_tools
-
+            for tool in self.registry.all_tools():
                 tools_list.append({
                     "name": tool.name,
-                    "pure_name": pure_tool_name,
-                    "server": server_name,
-                    "enabled": is_enabled,
+                    "pure_name": self.registry.pure_name_of(tool.name),
+                    "server": self.registry.server_of(tool.name),
+                    "enabled": self.registry.is_enabled(tool.name),
                     "description": getattr(tool, "description", "")
                 })
         else:
@@ -280,16 +454,31 @@ class MCPToolManager:
             "disabled": total_count - enabled_count,
             "initialized": self._initialized,
             "servers": servers_info,
-            "tools": tools_list
+            "tools": tools_list,
+            "breakers": self.call_guard.status(),
+            "rate_limits": self.rate_limiter.status(),
+            "replicas": {
+                server_name: group.status()
+                for server_name, group in self.replica_groups.items()
+            }
         }
 
     async def cleanup(self):
         """清理資源，關閉 MCP 連線"""
         if self.client:
             logger.info("清理 MCP 資源...")
-            # MultiServerMCPClient 會自動管理連線
+            # MultiServerMCPClient 每次呼叫自行建立連線；replica 的持續 session 需要關閉
+            for session in self.replica_sessions:
+                await session.close()
+            self.replica_sessions = []
             self.client = None
             self._initialized = False
+        if self.match_store:
+            self.match_store.close()
+            self.match_store = None
+        if self.static_data:
+            self.static_data.close()
+            self.static_data = None
 
     def __repr__(self) -> str:
         status = self.get_tools_status()
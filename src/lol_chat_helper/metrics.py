@@ -0,0 +1,123 @@
+"""In-process metrics registry for LOL Chat Helper."""
+
+import threading
+from collections import defaultdict, deque
+from typing import Optional
+
+
+def _pick(ordered: list[float], q: float) -> float:
+    """從已排序的樣本中取出分位數（最近秩法）"""
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))]
+
+
+class Metrics:
+    """
+    輕量的程序內指標登錄表
+
+    提供計數器（counter）與延遲樣本（timing）兩種指標。延遲樣本只保留最近
+    max_samples 筆，用來計算分位數（p50/p95/p99）。所有操作都是執行緒安全的。
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        初始化指標登錄表
+
+        Args:
+            max_samples: 每個延遲指標保留的樣本數
+        """
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._timings: dict[str, deque] = {}
+
+    def incr(self, name: str, value: float = 1.0):
+        """
+        增加計數器
+
+        Args:
+            name: 指標名稱
+            value: 增加量
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, seconds: float):
+        """
+        記錄一筆延遲樣本
+
+        Args:
+            name: 指標名稱
+            seconds: 延遲秒數
+        """
+        with self._lock:
+            samples = self._timings.get(name)
+            if samples is None:
+                samples = self._timings[name] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+
+    def counter(self, name: str) -> float:
+        """取得計數器目前的值"""
+        with self._lock:
+            return self._counters.get(name, 0.0)
+
+    def quantile(self, name: str, q: float) -> Optional[float]:
+        """
+        計算延遲指標的分位數
+
+        Args:
+            name: 指標名稱
+            q: 分位數（0.0 ~ 1.0）
+
+        Returns:
+            分位數值；沒有樣本時回傳 None
+        """
+        with self._lock:
+            samples = self._timings.get(name)
+            if not samples:
+                return None
+            ordered = sorted(samples)
+        return _pick(ordered, q)
+
+    def sample_count(self, name: str) -> int:
+        """取得延遲指標目前保留的樣本數"""
+        with self._lock:
+            samples = self._timings.get(name)
+            return len(samples) if samples else 0
+
+    def snapshot(self) -> dict:
+        """
+        取得所有指標的快照
+
+        Returns:
+            {
+                "counters": {名稱: 值},
+                "timings": {名稱: {"count", "p50", "p95", "p99", "max"}}
+            }
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {name: sorted(samples) for name, samples in self._timings.items() if samples}
+
+        return {
+            "counters": counters,
+            "timings": {
+                name: {
+                    "count": len(ordered),
+                    "p50": _pick(ordered, 0.50),
+                    "p95": _pick(ordered, 0.95),
+                    "p99": _pick(ordered, 0.99),
+                    "max": ordered[-1],
+                }
+                for name, ordered in timings.items()
+            },
+        }
+
+    def reset(self):
+        """清除所有指標"""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+# Global metrics registry
+metrics = Metrics()
@@ -1,33 +1,208 @@
 """Graph node functions for LOL Chat Helper."""
 
+import re
+import json
 import time
-from typing import Callable, Any
-from langchain_core.messages import SystemMessage
+import logging
+import reprlib
+from typing import Awaitable, Callable, Any, Optional, Sequence
+from langchain_core.messages import (
+    AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+)
 from langchain_core.language_models import BaseChatModel
 from langchain_core.tools import BaseTool
-from langgraph.graph import MessagesState
+from langgraph.graph import END, MessagesState
 from langgraph.prebuilt import ToolNode
 
-from lol_chat_helper.config import logger
+from lol_chat_helper.cache import ToolResultCache, RECALL_TOOL_NAME
+from lol_chat_helper.config import LogSampler, logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.prompts import get_chat_route_prompt
+from lol_chat_helper.results import ToolResultProcessor
+from lol_chat_helper.tokens import estimate_tokens, get_tokenizer
+from lol_chat_helper.tooling import content_to_text
+
+
+TOKEN_COUNT_KEY = "token_counts"
+AGED_KEY = "aged_ref"
+# 回答中的專有名詞、數字與百分比，用來挑出工具結果中實際被引用的行
+_FACT_TERM = re.compile(r"[A-Za-z][\w'.-]*|\d+(?:\.\d+)?%?|[\u4e00-\u9fff]{2,}")
+# 每則訊息的固定開銷（角色標記、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+ROUTE_CHAT = "chat"
+ROUTE_AGENT = "agent"
+# 路由到聊天節點後，模型判斷需要查詢資料時回覆的標記
+NEED_TOOLS_MARKER = "[NEED_TOOLS]"
+_RIOT_ID = re.compile(r"\S+#[0-9A-Za-z]{2,5}\b")
+_PUNCTUATION = re.compile(r"[\s!！?？.。,，~～…、:：;；'\"()（）\[\]]+")
+# 需要查詢資料的關鍵字（小寫比對）
+DATA_KEYWORDS = (
+    "勝率", "出場率", "登場率", "禁用率", "ban", "pick", "counter", "克制", "剋", "出裝", "裝備",
+    "符文", "天賦", "技能", "連招", "對線", "打野", "上路", "中路", "下路", "輔助", "射手", "路線",
+    "版本", "meta", "tier", "強勢", "排名", "排行", "牌位", "段位", "積分", "rank", "戰績", "對局",
+    "比賽", "幾場", "最近", "kda", "召喚師", "玩家", "英雄", "造型", "skin", "特價", "數據", "統計",
+    "build", "item", "rune", "matchup", "win rate", "winrate", "patch", "leaderboard",
+    "op.gg", "opgg", "synergy", "搭配", "組合", "games", "champion",
+)
+# 英文關鍵字前後不能緊接英文字母（"ban" 不會命中 "banana"），但可以緊接中文
+# （"李星build"）；中文關鍵字以子字串比對
+_DATA_WORDS = re.compile(
+    r"(?<![a-z])(?:" + "|".join(re.escape(k) for k in DATA_KEYWORDS if k.isascii()) + r")s?(?![a-z])",
+    re.IGNORECASE,
+)
+_DATA_PHRASES = tuple(k for k in DATA_KEYWORDS if not k.isascii())
+# 不需要查詢的閒聊（去掉標點後整句比對）
+SMALL_TALK = (
+    "謝謝", "感謝", "謝啦", "多謝", "thanks", "thank you", "thx", "ty", "ok", "okay", "好", "好的",
+    "好喔", "好哦", "了解", "知道了", "收到", "嗨", "哈囉", "你好", "hi", "hello", "hey", "早安",
+    "午安", "晚安", "再見", "掰掰", "bye", "哈哈", "哈哈哈", "讚", "👍", "不錯", "cool", "nice", "酷",
+    "沒事", "沒問題", "好吧", "嗯", "喔", "哦",
+)
+
+
+class TokenBudgeter:
+    """
+    在每次呼叫模型前控制 prompt 的 token 數
+
+    每則訊息的 token 數以可替換的 tokenizer 計算，並快取在訊息的
+    ``response_metadata["token_counts"][tokenizer 名稱]`` 中，同一則訊息在
+    後續回合不會重新計算。超過預算時從最大的 ToolMessage 開始截斷，
+    只影響送給模型的 prompt，graph state 中仍保留完整的工具結果。
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        tokenizer: str = "estimate",
+        min_tool_tokens: int = 200
+    ):
+        """
+        初始化預算控制器
+
+        Args:
+            max_tokens: prompt 的 token 上限
+            tokenizer: tokenizer 名稱，見 ``tokens.get_tokenizer``
+            min_tool_tokens: 每則工具結果截斷後至少保留的 token 數
+        """
+        self.max_tokens = max_tokens
+        self.tokenizer_name = tokenizer
+        self.count_text = get_tokenizer(tokenizer)
+        self.min_tool_tokens = min_tool_tokens
+
+    def count(self, message: BaseMessage) -> int:
+        """
+        計算（並快取）單則訊息的 token 數
+
+        Args:
+            message: 訊息
+
+        Returns:
+            token 數
+        """
+        counts = message.response_metadata.get(TOKEN_COUNT_KEY)
+        if counts and self.tokenizer_name in counts:
+            return counts[self.tokenizer_name]
+
+        tokens = self.count_text(content_to_text(message.content)) + MESSAGE_OVERHEAD_TOKENS
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            tokens += self.count_text(f"{tool_call.get('name', '')}{tool_call.get('args', {})}")
+
+        message.response_metadata.setdefault(TOKEN_COUNT_KEY, {})[self.tokenizer_name] = tokens
+        return tokens
+
+    def fit(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        """
+        讓訊息列表符合預算
+
+        Args:
+            messages: 完整的 prompt 訊息（含 system prompt）
+
+        Returns:
+            符合預算的訊息列表；未超過預算時回傳原列表
+        """
+        counts = [self.count(message) for message in messages]
+        total = sum(counts)
+        if total <= self.max_tokens:
+            return messages
+
+        fitted = list(messages)
+        # 從最大的工具結果開始截斷
+        candidates = sorted(
+            (i for i, message in enumerate(messages) if isinstance(message, ToolMessage)),
+            key=lambda i: counts[i],
+            reverse=True,
+        )
+        for i in candidates:
+            excess = total - self.max_tokens
+            if excess <= 0:
+                break
+            if counts[i] <= self.min_tool_tokens:
+                continue
+            target = max(self.min_tool_tokens, counts[i] - excess)
+            trimmed = self._trim(messages[i], counts[i], target)
+            trimmed_tokens = self.count(trimmed)
+            logger.info(
+                f"[Budget] Trimmed tool result '{messages[i].name}' "
+                f"from {counts[i]} to {trimmed_tokens} tokens"
+            )
+            total -= counts[i] - trimmed_tokens
+            fitted[i] = trimmed
+
+        if total > self.max_tokens:
+            logger.warning(
+                f"[Budget] Prompt still ~{total} tokens after trimming "
+                f"(budget {self.max_tokens})"
+            )
+        return fitted
+
+    def _trim(self, message: ToolMessage, tokens: int, target: int) -> ToolMessage:
+        """截斷單則工具結果，盡量在換行處切開並註明原始大小"""
+        note = (
+            f"\n…[已截斷：原始約 {tokens} tokens，僅保留開頭部分。"
+            "需要其他部分時請以更精確的參數重新查詢]"
+        )
+        text = content_to_text(message.content)
+        budget = max(1, target - self.count_text(note) - MESSAGE_OVERHEAD_TOKENS)
+        keep_chars = max(1, len(text) * budget // tokens)
+        head = text[:keep_chars]
+        cut = head.rfind("\n")
+        if cut > keep_chars // 2:
+            head = head[:cut]
+
+        return message.model_copy(update={
+            "content": head + note,
+            "response_metadata": {
+                key: value for key, value in message.response_metadata.items()
+                if key != TOKEN_COUNT_KEY
+            },
+        })
 
 
 def create_agent_node(
     model: BaseChatModel,
     system_prompt: str,
-    tools: list[BaseTool]
-) -> Callable[[MessagesState], dict]:
+    tools: list[BaseTool],
+    budgeter: Optional[TokenBudgeter] = None,
+    tool_model: Optional[BaseChatModel] = None
+) -> Callable[[MessagesState], Awaitable[dict]]:
     """
     建立帶有工具的 agent 節點
 
+    設定 tool_model 時，每一步先由這個較小的模型決定要呼叫哪些工具；
+    它判斷不再需要工具時捨棄它的回覆，改由 model 撰寫最後的回答。
+
     Args:
-        model: 語言模型實例
+        model: 語言模型實例（撰寫回答）
         system_prompt: System prompt 內容
         tools: 可用工具列表
+        budgeter: 呼叫模型前控制 prompt token 數（None 表示不限制）
+        tool_model: 決定工具呼叫的小模型（None 表示全部由 model 處理）
 
     Returns:
         Agent 節點函數
     """
-    def agent_node(state: MessagesState) -> dict:
+    async def agent_node(state: MessagesState) -> dict:
         """
         處理訊息並生成 AI 回應（支援工具調用）
 
@@ -38,7 +213,20 @@ def create_agent_node(
             包含新訊息的字典
         """
         messages = [SystemMessage(content=system_prompt)] + state["messages"]
-        response = model.bind_tools(tools).invoke(messages)
+        if budgeter is not None:
+            messages = budgeter.fit(messages)
+        start = time.monotonic()
+        if tool_model is not None:
+            response = await tool_model.bind_tools(tools).ainvoke(messages)
+            metrics.observe("model.tools", time.monotonic() - start)
+            if response.tool_calls:
+                metrics.observe("model.agent", time.monotonic() - start)
+                return {"messages": response}
+        # 大模型仍綁定工具：它認為資料不足時可以再呼叫，下一步又回到小模型
+        response = await model.bind_tools(tools).ainvoke(messages)
+        metrics.observe("model.agent", time.monotonic() - start)
+        if tool_model is not None:
+            metrics.incr("model.answers" if not response.tool_calls else "model.answer_tool_calls")
         return {"messages": response}
 
     return agent_node
@@ -46,19 +234,27 @@ def create_agent_node(
 
 def create_chat_node(
     model: BaseChatModel,
-    system_prompt: str
-) -> Callable[[MessagesState], dict]:
+    system_prompt: str,
+    budgeter: Optional[TokenBudgeter] = None,
+    escalate: bool = False
+) -> Callable[[MessagesState], Awaitable[dict]]:
     """
     建立純聊天節點（不帶工具）
 
     Args:
         model: 語言模型實例
         system_prompt: System prompt 內容
+        budgeter: 呼叫模型前控制 prompt token 數（None 表示不限制）
+        escalate: 由路由送來的聊天節點；模型回覆 NEED_TOOLS_MARKER 時不產生訊息，
+            交回 route_after_chat 轉給帶工具的 agent
 
     Returns:
         Chat 節點函數
     """
-    def chat_node(state: MessagesState) -> dict:
+    if escalate:
+        system_prompt = f"{system_prompt}\n\n{get_chat_route_prompt(NEED_TOOLS_MARKER)}"
+
+    async def chat_node(state: MessagesState) -> dict:
         """
         處理訊息並生成 AI 回應（不使用工具）
 
@@ -69,12 +265,171 @@ def create_chat_node(
             包含新訊息的字典
         """
         messages = [SystemMessage(content=system_prompt)] + state["messages"]
-        response = model.invoke(messages)
+        if budgeter is not None:
+            messages = budgeter.fit(messages)
+        start = time.monotonic()
+        response = await model.ainvoke(messages)
+        metrics.observe("model.chat", time.monotonic() - start)
+        if escalate and NEED_TOOLS_MARKER in content_to_text(response.content):
+            metrics.incr("route.misrouted")
+            logger.debug("[Router] Chat node asked for tools, handing the turn to the agent")
+            return {}
         return {"messages": response}
 
     return chat_node
 
 
+def _key_fact_lines(text: str, answer: str, max_lines: int) -> list[str]:
+    """從工具結果中挑出與回答內容重疊最多的行（保持原順序）"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) <= max_lines:
+        return lines
+
+    terms = {term.lower() for term in _FACT_TERM.findall(answer) if len(term) > 1}
+    # 區段標題（"## items (20 rows)"）和其後的欄位名稱列一律保留
+    keep = {0}
+    for i, line in enumerate(lines):
+        if line.startswith("## "):
+            keep.update((i, i + 1))
+    keep = {i for i in keep if i < len(lines)}
+
+    scored = sorted(
+        (
+            (sum(1 for term in _FACT_TERM.findall(line) if term.lower() in terms), -i)
+            for i, line in enumerate(lines)
+            if i not in keep
+        ),
+        reverse=True,
+    )
+    matched = [-neg_i for score, neg_i in scored if score > 0]
+    # 回答沒有引用任何內容時，保留開頭幾行
+    for i in matched or range(len(lines)):
+        if len(keep) >= max_lines:
+            break
+        keep.add(i)
+    return [lines[i] for i in sorted(keep)]
+
+
+def create_aging_node(
+    cache: ToolResultCache,
+    keep_turns: int = 1,
+    max_lines: int = 8,
+    min_chars: int = 600
+) -> Callable[[MessagesState], dict]:
+    """
+    建立回答後執行的工具結果歸檔節點
+
+    最近 keep_turns 個回合以前的工具結果會被精簡摘要取代（沿用相同的訊息 id，
+    由 add_messages 直接覆寫），完整內容存入 cache，模型可以透過
+    recall_tool_result 以摘要中的 ref 取回。
+
+    Args:
+        cache: 保存完整工具結果的快取
+        keep_turns: 保留完整內容的最近回合數（含剛回答的回合）
+        max_lines: 摘要最多保留幾行重點
+        min_chars: 小於此長度的工具結果不歸檔
+
+    Returns:
+        歸檔節點函數
+    """
+    def aging_node(state: MessagesState) -> dict:
+        """
+        以摘要取代舊回合的工具結果
+
+        Args:
+            state: 當前的訊息狀態
+
+        Returns:
+            包含被取代訊息的字典（沒有需要歸檔的訊息時為空）
+        """
+        messages = state["messages"]
+        turn_starts = [i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)]
+        if len(turn_starts) <= keep_turns:
+            return {}
+        boundary = turn_starts[-keep_turns]
+
+        tool_args: dict[str, dict] = {}
+        answers: dict[int, str] = {}
+        answer = ""
+        # 由後往前走，讓每個工具結果對應到同一回合的最終回答
+        for i in range(boundary - 1, -1, -1):
+            msg = messages[i]
+            if isinstance(msg, HumanMessage):
+                answer = ""
+            elif isinstance(msg, AIMessage):
+                if not msg.tool_calls and not answer:
+                    answer = content_to_text(msg.content)
+                for tool_call in msg.tool_calls:
+                    tool_args[tool_call.get("id", "")] = tool_call.get("args", {})
+            answers[i] = answer
+
+        aged = []
+        saved_tokens = 0
+        for i in range(boundary):
+            msg = messages[i]
+            if not isinstance(msg, ToolMessage) or AGED_KEY in msg.response_metadata:
+                continue
+            text = content_to_text(msg.content)
+            if len(text) < min_chars:
+                continue
+
+            ref = msg.tool_call_id
+            cache.put(ref, text)
+            args = json.dumps(tool_args.get(ref, {}), ensure_ascii=False, separators=(",", ":"))
+            tokens = estimate_tokens(text)
+            digest = "\n".join([
+                f"[已歸檔的工具結果 ref={ref}] {msg.name}({args})，原始約 {tokens} tokens",
+                "重點:",
+                *_key_fact_lines(text, answers.get(i, ""), max_lines),
+                f"需要完整內容時呼叫 {RECALL_TOOL_NAME}(ref=\"{ref}\")",
+            ])
+            metadata = {
+                key: value for key, value in msg.response_metadata.items()
+                if key != TOKEN_COUNT_KEY
+            }
+            metadata[AGED_KEY] = ref
+            aged.append(msg.model_copy(update={"content": digest, "response_metadata": metadata}))
+            saved_tokens += tokens - estimate_tokens(digest)
+
+        if not aged:
+            return {}
+
+        metrics.incr("aging.messages", len(aged))
+        metrics.incr("aging.tokens_saved", saved_tokens)
+        logger.info(f"[Aging] Replaced {len(aged)} old tool result(s) with digests (~{saved_tokens} tokens saved)")
+        return {"messages": aged}
+
+    return aging_node
+
+
+# Bounded repr for debug logs: big arguments and results are cut before they
+# are turned into strings
+_LOG_REPR = reprlib.Repr()
+_LOG_REPR.maxstring = 100
+_LOG_REPR.maxother = 100
+_LOG_REPR.maxlist = 5
+_LOG_REPR.maxdict = 8
+_LOG_REPR.maxlevel = 3
+PREVIEW_CHARS = 100
+
+
+def _preview(content: Any, limit: int = PREVIEW_CHARS) -> str:
+    """Short preview of message content without stringifying all of it."""
+    if isinstance(content, str):
+        return content[:limit] + "..." if len(content) > limit else content
+    if isinstance(content, list):
+        parts, size = [], 0
+        for block in content:
+            text = block.get("text") if isinstance(block, dict) else block
+            part = text[:limit - size] if isinstance(text, str) else _LOG_REPR.repr(block)
+            parts.append(part)
+            size += len(part)
+            if size >= limit:
+                return "".join(parts)[:limit] + "..."
+        return "".join(parts)
+    return _LOG_REPR.repr(content)
+
+
 class LoggingToolNode(ToolNode):
     """
     ToolNode with debug logging capabilities.
@@ -85,9 +440,37 @@ class LoggingToolNode(ToolNode):
     - Tool results after execution
     - Errors and exceptions
 
-    All logs use DEBUG level for development debugging.
+    All logs use DEBUG level for development debugging. Nothing is formatted
+    unless DEBUG is enabled, payloads are truncated before they are turned
+    into strings, and per-tool lines are sampled once a tool gets chatty.
+
+    Optional result processors run on every ToolMessage after execution and
+    before the message is stored in the graph state (e.g. trimming large
+    headers/rows payloads).
     """
 
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        *,
+        result_processors: Optional[Sequence[ToolResultProcessor]] = None,
+        log_sampler: Optional[LogSampler] = None,
+        **kwargs: Any
+    ):
+        """
+        Initialize the tool node.
+
+        Args:
+            tools: Tools available to the node
+            result_processors: Callables applied to each resulting ToolMessage
+            log_sampler: Sampler for the per-tool debug lines (default: first 20
+                per tool, then one in ten)
+            **kwargs: Passed through to ToolNode
+        """
+        super().__init__(tools, **kwargs)
+        self.result_processors = list(result_processors or [])
+        self.log_sampler = log_sampler or LogSampler()
+
     def invoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
         """
         Execute tool calls with detailed logging.
@@ -100,8 +483,52 @@ class LoggingToolNode(ToolNode):
         Returns:
             Tool execution results
         """
+        tool_call_messages = self._log_tool_calls(input)
+
+        # Start timing
+        start_time = time.time()
+
+        try:
+            # Execute tool calls via parent class
+            result = super().invoke(input, config, **kwargs)
+        except Exception as e:
+            self._log_failure(e, start_time)
+            raise
+
+        self._log_results(result, tool_call_messages, start_time)
+        return self._process_results(result)
+
+    async def ainvoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        """
+        Execute tool calls asynchronously with detailed logging.
+
+        Args:
+            input: Input state containing messages with tool calls
+            config: Optional configuration
+            **kwargs: Additional arguments
+
+        Returns:
+            Tool execution results
+        """
+        tool_call_messages = self._log_tool_calls(input)
+
+        # Start timing
+        start_time = time.time()
+
+        try:
+            # Execute tool calls via parent class
+            result = await super().ainvoke(input, config, **kwargs)
+        except Exception as e:
+            self._log_failure(e, start_time)
+            raise
+
+        self._log_results(result, tool_call_messages, start_time)
+        return self._process_results(result)
+
+    def _log_tool_calls(self, input: Any) -> list:
+        """Log tool calls before execution and return the messages carrying them."""
         # Extract messages from input
-        messages = input.get("messages", [])
+        messages = input.get("messages", []) if isinstance(input, dict) else []
 
         # Find messages with tool calls
         tool_call_messages = [
@@ -109,74 +536,219 @@ class LoggingToolNode(ToolNode):
             if hasattr(msg, "tool_calls") and msg.tool_calls
         ]
 
-        if tool_call_messages:
+        if tool_call_messages and logger.isEnabledFor(logging.DEBUG):
             # Log tool calls before execution
             for msg in tool_call_messages:
                 for tool_call in msg.tool_calls:
                     tool_name = tool_call.get("name", "unknown")
-                    tool_args = tool_call.get("args", {})
-                    tool_id = tool_call.get("id", "unknown")
-
+                    if not self.log_sampler.should_log(f"call:{tool_name}"):
+                        continue
                     logger.debug(
-                        f"[ToolNode] Calling tool: {tool_name} "
-                        f"(id: {tool_id}) with args: {tool_args}"
+                        "[ToolNode] Calling tool: %s (id: %s) with args: %s",
+                        tool_name,
+                        tool_call.get("id", "unknown"),
+                        _LOG_REPR.repr(tool_call.get("args", {})),
                     )
 
-        # Start timing
-        start_time = time.time()
-
-        try:
-            # Execute tool calls via parent class
-            result = super().invoke(input, config, **kwargs)
+        return tool_call_messages
+
+    def _log_results(self, result: Any, tool_call_messages: list, start_time: float):
+        """Log execution time and a preview of each tool result."""
+        if not tool_call_messages or not logger.isEnabledFor(logging.DEBUG):
+            return
+
+        # Calculate execution time
+        elapsed_time = time.time() - start_time
+        tool_count = sum(
+            len(msg.tool_calls)
+            for msg in tool_call_messages
+        )
+        logger.debug("[ToolNode] Executed %d tool(s) in %.3fs", tool_count, elapsed_time)
+
+        # Log individual tool results
+        result_messages = result.get("messages", []) if isinstance(result, dict) else []
+        for msg in result_messages:
+            if hasattr(msg, "name") and hasattr(msg, "content"):
+                if not self.log_sampler.should_log(f"result:{msg.name}"):
+                    continue
+                logger.debug("[ToolNode] Tool '%s' returned: %s", msg.name, _preview(msg.content))
+
+    def _log_failure(self, error: Exception, start_time: float):
+        """Log a failed execution with its elapsed time."""
+        elapsed_time = time.time() - start_time
+        logger.debug(
+            "[ToolNode] Tool execution failed after %.3fs: %s: %s",
+            elapsed_time, type(error).__name__, error
+        )
+        logger.exception("[ToolNode] Full traceback:")
+
+    def _process_results(self, result: Any) -> Any:
+        """Run the configured result processors over the produced ToolMessages."""
+        if not self.result_processors or not isinstance(result, dict):
+            return result
 
-            # Calculate execution time
-            elapsed_time = time.time() - start_time
-
-            # Log results
-            if tool_call_messages:
-                tool_count = sum(
-                    len(msg.tool_calls)
-                    for msg in tool_call_messages
-                )
-
-                logger.debug(
-                    f"[ToolNode] Executed {tool_count} tool(s) "
-                    f"in {elapsed_time:.3f}s"
-                )
-
-                # Log individual tool results
-                result_messages = result.get("messages", [])
-                for msg in result_messages:
-                    if hasattr(msg, "name") and hasattr(msg, "content"):
-                        content_preview = (
-                            str(msg.content)[:100] + "..."
-                            if len(str(msg.content)) > 100
-                            else str(msg.content)
-                        )
-                        logger.debug(
-                            f"[ToolNode] Tool '{msg.name}' returned: "
-                            f"{content_preview}"
+        processed = []
+        for msg in result.get("messages", []):
+            if isinstance(msg, ToolMessage):
+                for processor in self.result_processors:
+                    try:
+                        msg = processor(msg)
+                    except Exception as e:
+                        logger.warning(
+                            f"[ToolNode] Result processor {type(processor).__name__} "
+                            f"failed on '{msg.name}': {e}"
                         )
+            processed.append(msg)
 
-            return result
+        return {**result, "messages": processed}
 
-        except Exception as e:
-            # Log error with execution time
-            elapsed_time = time.time() - start_time
-            logger.debug(
-                f"[ToolNode] Tool execution failed after {elapsed_time:.3f}s: "
-                f"{type(e).__name__}: {str(e)}"
-            )
-            logger.exception("[ToolNode] Full traceback:")
-            raise
+
+def _entity_names(tools: Sequence[BaseTool]) -> set[str]:
+    """從工具參數的列舉值取出英雄名稱（"TWISTED_FATE" -> "twisted fate"）"""
+    names = set()
+    for tool in tools:
+        for param, spec in (tool.args or {}).items():
+            if "champion" not in param:
+                continue
+            values = spec.get("enum") or spec.get("items", {}).get("enum") or []
+            names.update(str(value).lower().replace("_", " ") for value in values)
+    return names
+
+
+def _starts_with_phrase(bare: str, phrase: str) -> bool:
+    """閒聊用語開頭加上很短的結尾（英文用語必須是完整的詞："hi" 不會命中 "history"）"""
+    if not bare.startswith(phrase) or len(bare) > len(phrase) + 6:
+        return False
+    return not phrase.isascii() or len(bare) == len(phrase) or bare[len(phrase)] == " "
+
+
+def _used_tools_last_turn(messages: list) -> bool:
+    """上一個回合（最後一則使用者訊息之前的那一回合）是否有工具結果"""
+    humans = [i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)]
+    if len(humans) < 2:
+        return False
+    return any(isinstance(msg, ToolMessage) for msg in messages[humans[-2]:humans[-1]])
+
+
+def classify_turn(text: str, entities: set[str], followup: bool) -> Optional[str]:
+    """
+    以規則判斷這一輪是否需要工具
+
+    Args:
+        text: 使用者輸入
+        entities: 英雄名稱等代表要查詢資料的詞（小寫）
+        followup: 上一個回合是否用到了工具
+
+    Returns:
+        ROUTE_CHAT、ROUTE_AGENT，無法判斷時回傳 None
+    """
+    lowered = text.lower()
+    if _RIOT_ID.search(text):
+        return ROUTE_AGENT
+    words = set(re.findall(r"[a-z]+", lowered))
+    if any(
+        (name in lowered if " " in name or len(name) > 3 else name in words)
+        for name in entities
+    ):
+        return ROUTE_AGENT
+    if _DATA_WORDS.search(lowered) or any(keyword in lowered for keyword in _DATA_PHRASES):
+        return ROUTE_AGENT
+
+    bare = _PUNCTUATION.sub(" ", lowered).strip()
+    if not bare or bare in SMALL_TALK or any(
+        _starts_with_phrase(bare, phrase) for phrase in SMALL_TALK if len(phrase) > 1
+    ):
+        return ROUTE_CHAT
+    # 對先前結果的追問通常不需要再查詢；聊天節點判斷需要時仍會轉給 agent
+    return ROUTE_CHAT if followup else None
+
+
+def create_routing_node(
+    tools: Sequence[BaseTool],
+    router_model: Optional[BaseChatModel] = None
+) -> Callable[[MessagesState], Awaitable[str]]:
+    """
+    建立 START 的路由：閒聊交給不帶工具的聊天節點，查詢資料交給 agent
+
+    先以規則判斷（Riot ID、英雄名稱、資料關鍵字、閒聊用語）；規則無法判斷時
+    交給 router_model（小模型，只回答 chat 或 tools），沒有設定則走 agent。
+
+    Args:
+        tools: 可用工具（取出英雄名稱等實體）
+        router_model: 規則無法判斷時使用的小模型（可選）
+
+    Returns:
+        回傳 ROUTE_CHAT 或 ROUTE_AGENT 的非同步路由函數（router_model 的呼叫不會阻塞事件迴圈）
+    """
+    entities = _entity_names(tools)
+
+    async def route(state: MessagesState) -> str:
+        messages = state["messages"]
+        last_human = next(
+            (msg for msg in reversed(messages) if isinstance(msg, HumanMessage)), None
+        )
+        if last_human is None:
+            return ROUTE_AGENT
+        text = content_to_text(last_human.content)
+        followup = _used_tools_last_turn(messages)
+
+        decision = classify_turn(text, entities, followup)
+        source = "rules"
+        if decision is None and router_model is not None:
+            source = "model"
+            try:
+                answer = await router_model.ainvoke([
+                    SystemMessage(content=(
+                        "判斷使用者這句話是否需要查詢英雄聯盟的即時資料（英雄、玩家、戰績、版本數據）。"
+                        "需要時只回答 tools，不需要時只回答 chat。"
+                    )),
+                    HumanMessage(content=text),
+                ])
+                decision = ROUTE_AGENT if "tool" in content_to_text(answer.content).lower() else ROUTE_CHAT
+            except Exception as e:
+                logger.warning(f"[Router] Router model failed, using the agent: {e}")
+        decision = decision or ROUTE_AGENT
+
+        metrics.incr(f"route.{decision}")
+        logger.debug(f"[Router] {decision} ({source}): {text[:60]}")
+        return decision
+
+    return route
+
+
+def route_after_chat(state: MessagesState) -> str:
+    """聊天節點要求工具時（沒有產生回覆）轉給 agent，否則結束"""
+    if isinstance(state["messages"][-1], HumanMessage):
+        return ROUTE_AGENT
+    return END
+
+
+def track_toolless_turns(route: Callable[[MessagesState], str]) -> Callable[[MessagesState], str]:
+    """
+    包裝 agent 之後的路由：路由到 agent 但整輪沒有用到工具時記錄指標
+
+    Args:
+        route: 原本的路由函數（例如 tools_condition）
+
+    Returns:
+        行為相同的路由函數
+    """
+    def tracked(state: MessagesState) -> str:
+        result = route(state)
+        if result == END:
+            for msg in reversed(state["messages"]):
+                if isinstance(msg, ToolMessage):
+                    break
+                if isinstance(msg, HumanMessage):
+                    metrics.incr("route.agent_no_tools")
+                    break
+        return result
+
+    return tracked
 
 
 # Future: Add more specialized node types
 # Example:
-# def create_routing_node(...) -> Callable:
-#     """建立路由節點，可以根據使用者輸入路由到不同的 agent"""
-#     pass
-#
 # def create_memory_node(...) -> Callable:
 #     """建立記憶節點，處理長期記憶的儲存和檢索"""
 #     pass
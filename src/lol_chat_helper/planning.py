@@ -0,0 +1,293 @@
+"""Plan-and-execute nodes: one planning call, concurrent tool waves, one synthesis call."""
+
+import re
+import json
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import tools_condition
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.nodes import LoggingToolNode, TokenBudgeter
+from lol_chat_helper.prompts import get_planner_prompt
+from lol_chat_helper.tooling import content_to_text
+from lol_chat_helper.turns import TurnBudget, TurnState, run_tool_calls, skipped_results, DEADLINE_NOTE
+
+
+PLAN_KEY = "plan"
+_JSON_BLOCK = re.compile(r"\{.*\}", re.DOTALL)
+
+
+class PlanState(TurnState):
+    """TurnState 加上規劃結果：依相依關係分好的批次，每批是 tool_call id 列表"""
+
+    plan: list[list[str]]
+
+
+def describe_tools(tools: list[BaseTool], max_enum: int = 4) -> str:
+    """
+    產生給規劃模型看的精簡工具清單
+
+    每個工具一行：名稱、參數（必填參數不加 ?，列舉值只列前幾個）與描述的第一句。
+
+    Args:
+        tools: 可用工具
+        max_enum: 每個列舉參數最多列出幾個值
+
+    Returns:
+        工具清單文字
+    """
+    lines = []
+    for tool in tools:
+        required = _required_args(tool)
+        params = []
+        for name, spec in (tool.args or {}).items():
+            if name == "desired_value_description":
+                continue
+            kind = spec.get("type", "any")
+            if "enum" in spec:
+                values = spec["enum"]
+                more = ", ..." if len(values) > max_enum else ""
+                kind = f"{'|'.join(map(str, values[:max_enum]))}{more}"
+            elif kind == "array" and "enum" in spec.get("items", {}):
+                values = spec["items"]["enum"]
+                kind = f"[{'|'.join(map(str, values[:max_enum]))}, ...]"
+            params.append(f"{name}{'' if name in required else '?'}: {kind}")
+        summary = (tool.description or "").strip().split(". ")[0].split("\n")[0]
+        lines.append(f"- {tool.name}({', '.join(params)}): {summary}")
+    return "\n".join(lines)
+
+
+def _required_args(tool: BaseTool) -> set[str]:
+    schema = tool.args_schema
+    try:
+        if isinstance(schema, dict):
+            return set(schema.get("required", []))
+        if schema is not None:
+            return set(schema.model_json_schema().get("required", []))
+    except Exception:
+        pass
+    return set()
+
+
+def parse_plan(text: str, tool_names: set[str], max_steps: int = 8) -> Optional[list[dict]]:
+    """
+    解析規劃模型輸出的 JSON
+
+    格式為 {"steps": [{"id": "s1", "tool": "...", "args": {...}, "after": ["s0"]}]}；
+    工具不存在的步驟會被捨棄，after 中不存在的 id 會被忽略。
+
+    Args:
+        text: 模型輸出（可以包在 ```json 區塊中）
+        tool_names: 可用的工具名稱
+        max_steps: 最多保留的步驟數
+
+    Returns:
+        步驟列表（可能為空，表示不需要工具）；無法解析時回傳 None
+    """
+    match = _JSON_BLOCK.search(text)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    raw_steps = data.get("steps") if isinstance(data, dict) else None
+    if not isinstance(raw_steps, list):
+        return None
+
+    steps = []
+    for i, step in enumerate(raw_steps):
+        if not isinstance(step, dict) or step.get("tool") not in tool_names:
+            logger.debug(f"[Planner] Dropping invalid step: {step}")
+            continue
+        args = step.get("args")
+        after = step.get("after", [])
+        steps.append({
+            "id": str(step.get("id") or f"s{i + 1}"),
+            "tool": step["tool"],
+            "args": args if isinstance(args, dict) else {},
+            "after": [str(a) for a in after] if isinstance(after, list) else [],
+        })
+    steps = steps[:max_steps]
+    known = {step["id"] for step in steps}
+    for step in steps:
+        step["after"] = [a for a in step["after"] if a in known and a != step["id"]]
+    return steps
+
+
+def schedule(steps: list[dict]) -> list[list[dict]]:
+    """
+    依 after 相依關係把步驟分成批次（同一批互不相依，可以並行）
+
+    Args:
+        steps: parse_plan 的結果
+
+    Returns:
+        批次列表；形成循環的步驟會被捨棄
+    """
+    remaining = {step["id"]: step for step in steps}
+    done: set[str] = set()
+    waves = []
+    while remaining:
+        wave = [step for step in remaining.values() if set(step["after"]) <= done]
+        if not wave:
+            logger.warning(f"[Planner] Dropping steps with cyclic dependencies: {list(remaining)}")
+            break
+        waves.append(wave)
+        for step in wave:
+            done.add(step["id"])
+            del remaining[step["id"]]
+    return waves
+
+
+def create_planner_node(
+    model: BaseChatModel,
+    system_prompt: str,
+    tools: list[BaseTool],
+    budgeter: Optional[TokenBudgeter] = None,
+    max_steps: int = 8
+) -> Callable[[PlanState], Awaitable[dict]]:
+    """
+    建立規劃節點：一次模型呼叫列出回答需要的所有工具呼叫
+
+    規劃結果轉成一則帶有 tool_calls 的 AIMessage（與一般 agent 的工具呼叫相同格式），
+    相依關係分成的批次存在 state 的 plan 欄位。不需要工具或無法解析時不產生訊息，
+    直接交給 agent 節點處理。
+
+    Args:
+        model: 語言模型實例
+        system_prompt: 一般 agent 的 system prompt（提供角色與日期）
+        tools: 可用工具列表
+        budgeter: 呼叫模型前控制 prompt token 數（None 表示不限制）
+        max_steps: 一次規劃最多的工具呼叫數
+
+    Returns:
+        規劃節點函數
+    """
+    tool_names = {tool.name for tool in tools}
+    planner_prompt = get_planner_prompt(describe_tools(tools), max_steps)
+
+    async def planner_node(state: PlanState) -> dict:
+        """
+        規劃這一輪需要的工具呼叫
+
+        Args:
+            state: 當前的訊息狀態
+
+        Returns:
+            包含規劃訊息與批次的字典
+        """
+        messages = [SystemMessage(content=f"{system_prompt}\n\n{planner_prompt}")] + state["messages"]
+        if budgeter is not None:
+            messages = budgeter.fit(messages)
+        response = await model.ainvoke(messages)
+        metrics.incr("plan.calls")
+
+        text = content_to_text(response.content)
+        steps = parse_plan(text, tool_names, max_steps)
+        if steps is None:
+            metrics.incr("plan.invalid")
+            logger.debug("[Planner] Could not parse plan: %s", text[:200])
+            return {PLAN_KEY: []}
+        if not steps:
+            metrics.incr("plan.empty")
+            return {PLAN_KEY: []}
+
+        waves = schedule(steps)
+        prefix = uuid.uuid4().hex[:8]
+        tool_calls = []
+        plan = []
+        for wave in waves:
+            ids = []
+            for step in wave:
+                call_id = f"plan_{prefix}_{step['id']}"
+                tool_calls.append(
+                    {"name": step["tool"], "args": step["args"], "id": call_id, "type": "tool_call"}
+                )
+                ids.append(call_id)
+            plan.append(ids)
+
+        metrics.incr("plan.steps", len(tool_calls))
+        metrics.incr("plan.waves", len(plan))
+        logger.info(f"[Planner] {len(tool_calls)} tool calls in {len(plan)} waves")
+        return {"messages": AIMessage(content="", tool_calls=tool_calls), PLAN_KEY: plan}
+
+    return planner_node
+
+
+def route_after_plan(state: PlanState) -> str:
+    """有規劃的工具呼叫時執行，否則直接交給 agent"""
+    last = state["messages"][-1]
+    if isinstance(last, AIMessage) and last.tool_calls and state.get(PLAN_KEY):
+        return "execute"
+    return "agent"
+
+
+def create_execute_node(
+    tool_node: LoggingToolNode,
+    budget: Optional[TurnBudget] = None
+) -> Callable[[PlanState], Any]:
+    """
+    建立執行節點：依批次並行執行規劃的工具呼叫
+
+    同一批的呼叫各自以一個任務並行執行，批次之間依序進行；結果處理器、
+    日誌與錯誤處理沿用 tools 節點的設定。期限到時已完成的結果照常保留。
+
+    Args:
+        tool_node: tools 節點使用的 ToolNode
+        budget: 回合預算；設定時所有批次最多執行到回合剩餘的時間（可選）
+
+    Returns:
+        非同步的執行節點函數
+    """
+    async def execute_node(state: PlanState, config: RunnableConfig) -> dict:
+        """
+        執行規劃好的工具呼叫
+
+        Args:
+            state: 當前的訊息狀態（最後一則為規劃訊息）
+            config: Graph 的執行設定
+
+        Returns:
+            包含所有 ToolMessage 的字典
+        """
+        planned = state["messages"][-1]
+        calls = {call["id"]: call for call in planned.tool_calls}
+        start = time.monotonic()
+        results: list[ToolMessage] = []
+        time_left = budget.tool_time_left(state) if budget is not None else None
+        deadline = start + time_left if time_left is not None else None
+
+        for wave in state.get(PLAN_KEY, []):
+            timeout = deadline - time.monotonic() if deadline is not None else None
+            done, cut = await run_tool_calls(
+                tool_node, [calls[i] for i in wave if i in calls], config, timeout
+            )
+            results.extend(done)
+            if cut:
+                # 已完成的結果保留，這一批逾時的與之後的批次都不再執行
+                metrics.incr("turn.tools_cut")
+                finished = {msg.tool_call_id for msg in results}
+                results.extend(skipped_results(
+                    [call for call_id, call in calls.items() if call_id not in finished], DEADLINE_NOTE
+                ))
+                break
+        metrics.observe("plan.execute", time.monotonic() - start)
+        return {"messages": results, PLAN_KEY: []}
+
+    return execute_node
+
+
+def route_after_synthesis(state: PlanState) -> str:
+    """與 tools_condition 相同；規劃遺漏而需要額外的工具回合時記錄指標"""
+    route = tools_condition(state)
+    if route == "tools":
+        metrics.incr("plan.followup_rounds")
+    return route
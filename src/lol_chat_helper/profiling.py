@@ -0,0 +1,255 @@
+"""Per-turn sampling profiler and allocation capture."""
+
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from lol_chat_helper.config import logger
+
+
+# 依堆疊中最靠近葉端的套件歸類樣本（比對模組路徑）
+CATEGORIES = (
+    ("JSON", ("json/", "lol_chat_helper/tabular.py", "lol_chat_helper/encoding.py")),
+    ("LLM client", ("openai/", "langchain_openai/", "httpx/", "httpcore/", "h11/")),
+    ("MCP", ("mcp/", "langchain_mcp_adapters/", "anyio/")),
+    ("LangGraph", ("langgraph/",)),
+    ("LangChain", ("langchain_core/", "pydantic/", "pydantic_core/")),
+    ("lol_chat_helper", ("lol_chat_helper/",)),
+)
+# 停在這些函數表示在等待：事件迴圈等待模型回應或 MCP stdio、worker 執行緒閒置
+_IDLE_FUNCTIONS = {"select", "poll", "wait", "_worker"}
+
+
+def _frame_label(frame) -> str:
+    """堆疊中一層的標籤：去掉 site-packages（或 src、lib）之前路徑的檔名加上函數名稱"""
+    path = frame.f_code.co_filename.replace(os.sep, "/")
+    for marker in ("site-packages/", "src/", "lib/"):
+        index = path.rfind(marker)
+        if index >= 0:
+            path = path[index + len(marker):]
+            break
+    return f"{path}:{frame.f_code.co_name}"
+
+
+def _categorize(stack: list[str]) -> str:
+    """由葉端往上找第一個屬於已知套件的層，決定樣本的類別"""
+    leaf_function = stack[-1].rsplit(":", 1)[-1] if stack else ""
+    if leaf_function in _IDLE_FUNCTIONS:
+        return "idle (waiting on I/O)"
+    for label in reversed(stack):
+        for category, paths in CATEGORIES:
+            if any(path in label for path in paths):
+                return category
+    return "other"
+
+
+@dataclass
+class TurnProfile:
+    """一個回合的分析結果"""
+
+    number: int
+    label: str
+    wall: float
+    cpu: float
+    samples: Counter
+    allocations: list = field(default_factory=list)
+    files: list[Path] = field(default_factory=list)
+
+    def summary(self, top_n: int = 15) -> str:
+        """
+        產生文字摘要
+
+        Args:
+            top_n: 每個排行列出的項目數
+
+        Returns:
+            摘要文字
+        """
+        total = sum(self.samples.values()) or 1
+        categories: Counter = Counter()
+        self_time: Counter = Counter()
+        inclusive: Counter = Counter()
+        for folded, count in self.samples.items():
+            stack = folded.split(";")[1:]  # 第一層是執行緒名稱
+            categories[_categorize(stack)] += count
+            if stack:
+                self_time[stack[-1]] += count
+            for label in set(stack):
+                inclusive[label] += count
+
+        lines = [
+            f"回合 {self.number}（{self.label}）: 經過 {self.wall:.2f} 秒，CPU {self.cpu:.2f} 秒，"
+            f"{sum(self.samples.values())} 個樣本",
+            "",
+            "時間分佈:",
+        ]
+        lines += [f"  {count / total:6.1%}  {name}" for name, count in categories.most_common()]
+        lines += ["", f"Self 時間前 {top_n}:"]
+        lines += [f"  {count / total:6.1%}  {label}" for label, count in self_time.most_common(top_n)]
+        lines += ["", f"累計時間前 {top_n}:"]
+        lines += [f"  {count / total:6.1%}  {label}" for label, count in inclusive.most_common(top_n)]
+        if self.allocations:
+            lines += ["", f"記憶體配置增加前 {top_n}:"]
+            lines += [f"  {stat}" for stat in self.allocations[:top_n]]
+        if self.files:
+            lines += ["", "輸出檔案:"] + [f"  {path}" for path in self.files]
+        return "\n".join(lines)
+
+
+class TurnProfiler:
+    """
+    以回合為單位的取樣分析
+
+    回合進行中，背景執行緒每 interval 秒擷取事件迴圈與 worker 執行緒的堆疊（wall-clock 取樣，
+    事件迴圈等待模型或 MCP 回應的時間會歸類為 idle），回合結束時寫出
+    flamegraph 相容的 folded stacks（flamegraph.pl、speedscope 皆可讀取）。
+    啟用 memory 時同時以 tracemalloc 比較回合前後的記憶體配置。
+    """
+
+    def __init__(
+        self,
+        directory: str = ".profiles",
+        interval: float = 0.005,
+        memory: bool = True,
+        memory_frames: int = 10,
+        top_n: int = 15
+    ):
+        """
+        初始化分析器
+
+        Args:
+            directory: 輸出目錄
+            interval: 取樣間隔（秒）
+            memory: 是否以 tracemalloc 擷取記憶體配置
+            memory_frames: tracemalloc 保存的堆疊深度
+            top_n: 摘要中每個排行的項目數
+        """
+        self.directory = Path(directory)
+        self.interval = interval
+        self.memory = memory
+        self.top_n = top_n
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.profiles: list[TurnProfile] = []
+        self._lock = threading.Lock()
+        self._samples: Counter = Counter()
+        self._active = False
+        self._stop = threading.Event()
+        self._turn_start = (0.0, 0.0)
+        self._memory_before: Optional[tracemalloc.Snapshot] = None
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(memory_frames)
+        self._thread = threading.Thread(target=self._sample_loop, name="turn-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"分析模式已啟用，每回合的結果寫入 {self.directory}")
+
+    @classmethod
+    def from_config(cls, config) -> "TurnProfiler":
+        """從 ProfileConfig 建立分析器"""
+        return cls(
+            directory=config.directory,
+            interval=config.interval,
+            memory=config.memory,
+            top_n=config.top_n,
+        )
+
+    def _sample_loop(self):
+        # 只取樣事件迴圈（主執行緒）與 asyncio.to_thread 的 worker；
+        # 讀取輸入等長時間阻塞的執行緒不代表回合的工作
+        main = threading.main_thread().ident
+        while not self._stop.wait(self.interval):
+            if not self._active:
+                continue
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != main and not names.get(thread_id, "").startswith("asyncio_"):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                folded = ";".join(reversed(stack))
+                with self._lock:
+                    self._samples[folded] += 1
+
+    def start_turn(self):
+        """回合開始：清空樣本並開始取樣"""
+        with self._lock:
+            self._samples = Counter()
+        if self.memory:
+            self._memory_before = tracemalloc.take_snapshot()
+        self._turn_start = (time.perf_counter(), time.process_time())
+        self._active = True
+
+    def finish_turn(self, label: str = "") -> TurnProfile:
+        """
+        回合結束：停止取樣並寫出結果
+
+        Args:
+            label: 回合說明（例如使用者輸入的開頭）
+
+        Returns:
+            本回合的分析結果
+        """
+        self._active = False
+        wall = time.perf_counter() - self._turn_start[0]
+        cpu = time.process_time() - self._turn_start[1]
+        with self._lock:
+            samples = self._samples
+
+        allocations = []
+        if self.memory and self._memory_before is not None:
+            ignore = (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            )
+            after = tracemalloc.take_snapshot().filter_traces(ignore)
+            before = self._memory_before.filter_traces(ignore)
+            allocations = [
+                stat for stat in after.compare_to(before, "lineno") if stat.size_diff > 0
+            ]
+            self._memory_before = None
+
+        profile = TurnProfile(len(self.profiles) + 1, label, wall, cpu, samples, allocations)
+        try:
+            self._write(profile)
+        except OSError as e:
+            logger.warning(f"無法寫入分析結果: {e}")
+        self.profiles.append(profile)
+        return profile
+
+    def _write(self, profile: TurnProfile):
+        """寫出 folded stacks、記憶體配置與摘要"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stem = self.directory / f"{self.session}-turn{profile.number:03d}"
+
+        folded = stem.with_suffix(".folded")
+        folded.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in profile.samples.most_common()),
+            encoding="utf-8",
+        )
+        profile.files.append(folded)
+        if profile.allocations:
+            alloc = stem.with_suffix(".alloc.txt")
+            alloc.write_text("\n".join(str(stat) for stat in profile.allocations[:200]), encoding="utf-8")
+            profile.files.append(alloc)
+        summary = stem.with_suffix(".txt")
+        profile.files.append(summary)
+        summary.write_text(profile.summary(self.top_n), encoding="utf-8")
+
+    def last(self) -> Optional[TurnProfile]:
+        """最近一個回合的分析結果"""
+        return self.profiles[-1] if self.profiles else None
+
+    def close(self):
+        """停止取樣執行緒與 tracemalloc"""
+        self._stop.set()
+        self._active = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
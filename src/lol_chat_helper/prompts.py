@@ -42,6 +42,7 @@ def get_lol_agent_prompt(with_tools: bool = True) -> str:
             "可用工具包括：\n"
             "- 召喚師查詢：查詢玩家的基本資訊和統計數據\n"
             "- 對局歷史：獲取玩家最近的對局記錄\n"
+            "- 戰績統計：以玩家最近的對局計算勝率、KDA、CS 等統計（問勝率、平均數據時優先使用）\n"
             "- 英雄分析：分析英雄的 counter、ban/pick 數據\n"
             "- 英雄 meta 數據：獲取英雄的統計和表現指標\n"
             "- 位置統計：查詢英雄在各位置的數據\n"
@@ -91,6 +92,68 @@ def get_system_prompt(
     )
 
 
+def get_planner_prompt(tool_catalog: str, max_steps: int = 8) -> str:
+    """
+    生成規劃節點的指示（接在一般 system prompt 之後）
+
+    Args:
+        tool_catalog: 精簡的工具清單
+        max_steps: 最多的工具呼叫數
+
+    Returns:
+        規劃指示字串
+    """
+    return (
+        "現在先不要回答，而是規劃回答這一輪問題需要的工具呼叫。\n"
+        f"可用工具（? 表示選填）：\n{tool_catalog}\n\n"
+        "只輸出一個 JSON 物件，格式如下：\n"
+        '{"steps": [{"id": "s1", "tool": "工具名稱", "args": {"參數": "值"}, "after": []}]}\n'
+        "規則：\n"
+        f"- 最多 {max_steps} 個步驟，把回答需要的資料一次列齊，互不相依的步驟會同時執行\n"
+        "- args 必須是確定的值；需要先看到其他工具結果才能決定參數的呼叫不要列入\n"
+        "- after 列出必須先完成的步驟 id（例如先更新玩家資料再查詢），沒有就留空\n"
+        "- 不需要任何工具（閒聊、根據先前的結果就能回答）時輸出 {\"steps\": []}"
+    )
+
+
+def get_chat_route_prompt(marker: str) -> str:
+    """
+    生成路由到聊天節點時附加的指示
+
+    Args:
+        marker: 需要工具時要回覆的標記
+
+    Returns:
+        指示字串
+    """
+    return (
+        "這一輪沒有提供工具。閒聊、或根據先前對話中的資料就能回答時，直接回答；"
+        f"如果回答需要查詢先前對話中沒有的最新資料，只回覆 {marker}，不要猜測數據。"
+    )
+
+
+def get_final_answer_prompt(reason: str) -> str:
+    """
+    生成回合預算用完、強制回答時附加的指示
+
+    Args:
+        reason: 強制回答的原因（deadline、steps、repeat）
+
+    Returns:
+        指示字串
+    """
+    causes = {
+        "deadline": "這一輪的查詢時間已經用完",
+        "steps": "這一輪的工具呼叫次數已經用完",
+        "repeat": "你重複呼叫了已經取得結果的工具",
+    }
+    return (
+        f"{causes.get(reason, '這一輪的查詢預算已經用完')}，不能再呼叫任何工具。"
+        "請根據對話中已取得的資料直接回答使用者；資料不足的部分明確說明，"
+        "不要猜測數據，並建議使用者可以縮小問題範圍再問一次。"
+    )
+
+
 # Prompt templates for future agent types
 class PromptTemplates:
     """Collection of prompt templates for different agent types."""
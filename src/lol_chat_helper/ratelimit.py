@@ -0,0 +1,309 @@
+"""Token-bucket rate limiting for upstream tool calls."""
+
+import heapq
+import time
+import asyncio
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from langchain_core.tools import BaseTool
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.resilience import ToolUnavailableError
+from lol_chat_helper.tooling import wrap_tool, tool_result
+
+
+# 數字越小越優先：使用者正在等待的呼叫優先於背景工作（快照、預熱）
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+traffic_priority: ContextVar[int] = ContextVar("traffic_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def batch_priority() -> Iterator[None]:
+    """在此區塊內（以及其中建立的任務）發出的工具呼叫以背景優先權排隊"""
+    token = traffic_priority.set(PRIORITY_BATCH)
+    try:
+        yield
+    finally:
+        traffic_priority.reset(token)
+
+
+class RateLimitExceeded(ToolUnavailableError):
+    """排隊超過最長等待時間"""
+
+
+class TokenBucket:
+    """
+    非同步的 token bucket
+
+    每秒補充 rate 個 token，最多累積 burst 個。沒有 token 時呼叫者依
+    (優先權, 到達順序) 排隊，由單一的補充任務依序放行，所以背景工作不會
+    插隊到使用者的呼叫前面。
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_wait: Optional[float] = None):
+        """
+        初始化 token bucket
+
+        Args:
+            name: 名稱（指標與日誌用）
+            rate: 每秒補充的 token 數
+            burst: 最多累積的 token 數
+            max_wait: 最長排隊時間（秒），None 表示不限
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_wait = max_wait
+        self.tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._drainer: Optional[asyncio.Task] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """
+        取得一個 token
+
+        Args:
+            priority: 排隊優先權（越小越優先）
+
+        Returns:
+            排隊等待的秒數
+
+        Raises:
+            RateLimitExceeded: 超過最長等待時間
+        """
+        self._refill()
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.create_task(self._drain(), name=f"ratelimit-{self.name}")
+
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if not future.cancel():
+                # 逾時的同時剛好被放行
+                return time.monotonic() - start
+            raise RateLimitExceeded(f"{self.name} 排隊超過 {self.max_wait:g} 秒")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        return time.monotonic() - start
+
+    def try_acquire(self) -> bool:
+        """
+        不排隊地取得一個 token
+
+        Returns:
+            是否取得；已有呼叫在排隊或 token 不足時回傳 False
+        """
+        self._refill()
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def refund(self):
+        """歸還一個沒有用到的 token（同一次呼叫的其他 bucket 排隊失敗時）"""
+        self._refill()
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    async def _drain(self):
+        """依優先權放行排隊中的呼叫，直到佇列清空"""
+        while self._waiters:
+            _, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                heapq.heappop(self._waiters)
+                future.set_result(None)
+                continue
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def status(self) -> dict:
+        """目前的 token 數與排隊數"""
+        self._refill()
+        return {
+            "tokens": self.tokens,
+            "waiting": sum(1 for _, _, future in self._waiters if not future.done()),
+        }
+
+
+class RateLimiter:
+    """
+    依伺服器與工具限制送往上游的呼叫速率
+
+    設定位於 mcp_config.json 的 rateLimit 區塊，按伺服器分組：
+    {
+      "rateLimit": {
+        "opgg-mcp": {
+          "rate": 5, "burst": 10, "maxWait": 15,
+          "tools": {"lol_get_summoner_profile": {"rate": 1, "burst": 3}}
+        }
+      }
+    }
+
+    呼叫需要同時取得伺服器與工具（有設定時）的 token，ToolCallGuard 送出的
+    hedged request 也要另外取得 token，取不到時就不 hedge。平順地放行請求比
+    觸發上游限流後再由模型重試便宜得多；排隊超過 maxWait 時回傳資料暫時
+    無法取得的說明，與 ToolCallGuard 的處理方式相同。
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        """
+        初始化速率限制
+
+        Args:
+            config: rateLimit 區塊（伺服器名稱對應設定）
+        """
+        self.config = config or {}
+        self.buckets: dict[str, TokenBucket] = {}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RateLimiter":
+        """從完整的 MCP 配置建立速率限制"""
+        return cls(config.get("rateLimit", {}))
+
+    @staticmethod
+    def _bucket_from(name: str, data: dict, defaults: dict) -> Optional[TokenBucket]:
+        rate = data.get("rate", defaults.get("rate"))
+        if not rate:
+            return None
+        return TokenBucket(
+            name,
+            rate=float(rate),
+            burst=int(data.get("burst", defaults.get("burst", max(1, int(rate))))),
+            max_wait=data.get("maxWait", defaults.get("maxWait")),
+        )
+
+    def _buckets_for(self, server: str, tool_name: str) -> list[TokenBucket]:
+        """取得（必要時建立）呼叫需要通過的 bucket"""
+        server_config = self.config.get(server)
+        if not server_config:
+            return []
+        buckets = []
+        if server not in self.buckets:
+            bucket = self._bucket_from(server, server_config, {})
+            if bucket is not None:
+                self.buckets[server] = bucket
+        if server in self.buckets:
+            buckets.append(self.buckets[server])
+
+        tool_config = server_config.get("tools", {}).get(tool_name)
+        if tool_config:
+            key = f"{server}.{tool_name}"
+            if key not in self.buckets:
+                # 工具沒有指定 maxWait 時沿用伺服器的設定
+                bucket = self._bucket_from(key, tool_config, {"maxWait": server_config.get("maxWait")})
+                if bucket is not None:
+                    self.buckets[key] = bucket
+            if key in self.buckets:
+                buckets.append(self.buckets[key])
+        return buckets
+
+    async def acquire(self, server: str, tool_name: str):
+        """
+        等待直到可以送出一次呼叫
+
+        Args:
+            server: 伺服器名稱
+            tool_name: 工具名稱
+
+        Raises:
+            RateLimitExceeded: 超過最長等待時間
+        """
+        priority = traffic_priority.get()
+        waited = 0.0
+        acquired: list[TokenBucket] = []
+        # 先取較窄的工具 bucket：工具排隊逾時就不會白白用掉伺服器的 token
+        for bucket in reversed(self._buckets_for(server, tool_name)):
+            try:
+                waited += await bucket.acquire(priority)
+            except (RateLimitExceeded, asyncio.CancelledError) as e:
+                for taken in acquired:
+                    taken.refund()
+                if isinstance(e, RateLimitExceeded):
+                    metrics.incr(f"ratelimit.{server}.rejected")
+                raise
+            acquired.append(bucket)
+        if waited > 0:
+            lane = "batch" if priority >= PRIORITY_BATCH else "interactive"
+            metrics.incr(f"ratelimit.{server}.throttled")
+            metrics.incr(f"ratelimit.{server}.throttled_seconds", waited)
+            metrics.observe(f"ratelimit.{server}.wait.{lane}", waited)
+
+    def try_acquire(self, server: str, tool_name: str) -> bool:
+        """
+        不排隊地為一次額外的呼叫（例如 hedged request）取得 token
+
+        Args:
+            server: 伺服器名稱
+            tool_name: 工具名稱
+
+        Returns:
+            是否取得所有需要的 token；未取得時不會扣除任何 token
+        """
+        acquired: list[TokenBucket] = []
+        for bucket in reversed(self._buckets_for(server, tool_name)):
+            if not bucket.try_acquire():
+                for taken in acquired:
+                    taken.refund()
+                return False
+            acquired.append(bucket)
+        return True
+
+    def wrap(self, tool: BaseTool, server: str) -> BaseTool:
+        """
+        包裝工具，使其呼叫先經過速率限制
+
+        Args:
+            tool: 原始工具
+            server: 工具所屬的伺服器名稱
+
+        Returns:
+            包裝後的工具；伺服器沒有設定時回傳原始工具
+        """
+        if server not in self.config:
+            return tool
+        prefix = f"{server}_"
+        tool_name = tool.name[len(prefix):] if tool.name.startswith(prefix) else tool.name
+
+        def wrapper(coroutine):
+            async def limited(**kwargs: Any):
+                try:
+                    await self.acquire(server, tool_name)
+                except RateLimitExceeded as e:
+                    logger.warning(f"工具 {tool.name} 排隊過久: {e}")
+                    return tool_result(
+                        tool,
+                        f"[資料暫時無法取得] {server} 目前查詢量過大（{e}）。"
+                        "請直接告知使用者稍後再試，不要重複呼叫此工具。"
+                    )
+                return await coroutine(**kwargs)
+            return limited
+
+        return wrap_tool(tool, wrapper)
+
+    def status(self) -> dict:
+        """取得各 bucket 的狀態"""
+        return {name: bucket.status() for name, bucket in self.buckets.items()}
@@ -0,0 +1,102 @@
+"""Name-indexed registry of loaded MCP tools."""
+
+from typing import Optional
+
+from langchain_core.tools import BaseTool
+
+
+class ToolRegistry:
+    """
+    以名稱索引的工具登錄表
+
+    所有查詢（工具是否存在、是否啟用、所屬伺服器）都是 O(1) 的 dict/set 查找。
+    啟用集合由 toolsConfig 決定，可以在不重新載入工具的情況下重建。
+    """
+
+    def __init__(self):
+        """初始化空的登錄表"""
+        self._tools: dict[str, BaseTool] = {}
+        self._servers: dict[str, str] = {}
+        self._pure_names: dict[str, str] = {}
+        self._enabled: set[str] = set()
+
+    def register(self, tool: BaseTool, server: str, pure_name: str):
+        """
+        登錄一個工具
+
+        Args:
+            tool: 工具實例
+            server: 所屬伺服器名稱
+            pure_name: 不含伺服器前綴的工具名稱
+        """
+        self._tools[tool.name] = tool
+        self._servers[tool.name] = server
+        self._pure_names[tool.name] = pure_name
+
+    def apply_config(self, tools_config: dict) -> tuple[set[str], set[str]]:
+        """
+        依 toolsConfig 重建啟用集合
+
+        toolsConfig 按伺服器分組，enabled 是工具名稱陣列；伺服器不在 toolsConfig
+        中的工具，只要純名稱或完整名稱出現在任一伺服器的 enabled 陣列中即啟用。
+
+        Args:
+            tools_config: mcp_config.json 的 toolsConfig 區塊
+
+        Returns:
+            (新啟用的工具名稱, 新停用的工具名稱)
+        """
+        enabled_by_server = {
+            server_name: set(server_config.get("enabled", []))
+            for server_name, server_config in tools_config.items()
+        }
+        enabled_anywhere = set().union(*enabled_by_server.values())
+
+        enabled = set()
+        for name in self._tools:
+            pure_name = self._pure_names[name]
+            server_enabled = enabled_by_server.get(self._servers[name])
+            if server_enabled is not None:
+                if pure_name in server_enabled:
+                    enabled.add(name)
+            elif pure_name in enabled_anywhere or name in enabled_anywhere:
+                enabled.add(name)
+
+        added = enabled - self._enabled
+        removed = self._enabled - enabled
+        self._enabled = enabled
+        return added, removed
+
+    def get(self, name: str) -> Optional[BaseTool]:
+        """依名稱取得工具"""
+        return self._tools.get(name)
+
+    def server_of(self, name: str) -> str:
+        """取得工具所屬伺服器（未知時為空字串）"""
+        return self._servers.get(name, "")
+
+    def pure_name_of(self, name: str) -> str:
+        """取得工具的純名稱"""
+        return self._pure_names.get(name, name)
+
+    def is_enabled(self, name: str) -> bool:
+        """檢查工具是否啟用"""
+        return name in self._enabled
+
+    def all_tools(self) -> list[BaseTool]:
+        """所有已登錄的工具（依登錄順序）"""
+        return list(self._tools.values())
+
+    def enabled_tools(self) -> list[BaseTool]:
+        """啟用的工具（依登錄順序）"""
+        return [tool for name, tool in self._tools.items() if name in self._enabled]
+
+    def enabled_names(self) -> set[str]:
+        """啟用的工具名稱集合"""
+        return set(self._enabled)
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
@@ -0,0 +1,310 @@
+"""Load balancing across replicas of the same MCP server."""
+
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncContextManager, Awaitable, Callable, Optional
+
+from langchain_core.tools import BaseTool, ToolException
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.tooling import wrap_tool
+
+
+REPLICA_SEPARATOR = "@"
+
+
+def replica_names(server_name: str, count: int) -> list[str]:
+    """
+    產生 replica 的連線名稱
+
+    第一個 replica 沿用原本的伺服器名稱，其餘加上編號，例如
+    ``opgg-mcp``、``opgg-mcp@2``、``opgg-mcp@3``。
+
+    Args:
+        server_name: 伺服器（群組）名稱
+        count: replica 數量
+
+    Returns:
+        連線名稱列表
+    """
+    return [server_name] + [
+        f"{server_name}{REPLICA_SEPARATOR}{i}" for i in range(2, count + 1)
+    ]
+
+
+class ReplicaSession:
+    """
+    單一 replica 持續開啟的 MCP session
+
+    沒有綁定 session 的 MCP 工具每次呼叫都會建立新的連線（stdio 伺服器則是
+    新的程序），replica 之間的路由也就沒有意義。這裡在專屬的任務中維持一個
+    session，工具透過這個物件呼叫；連線中斷（傳輸層錯誤）後，下一次呼叫
+    會重新連線。
+    """
+
+    def __init__(self, name: str, open_session: Callable[[], AsyncContextManager[Any]]):
+        """
+        初始化 replica session
+
+        Args:
+            name: replica 連線名稱
+            open_session: 建立 session context manager 的函數（例如 client.session(name)）
+        """
+        self.name = name
+        self._open_session = open_session
+        self._session: Any = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self) -> Any:
+        """
+        取得（必要時建立）目前的 session
+
+        Returns:
+            已初始化的 MCP ClientSession
+        """
+        async with self._lock:
+            if self._task is not None and not self._task.done() and not self._stop.is_set():
+                return self._session
+            ready = asyncio.get_running_loop().create_future()
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(
+                self._hold(ready, self._stop), name=f"mcp-session-{self.name}"
+            )
+            self._session = await ready
+            return self._session
+
+    async def _hold(self, ready: asyncio.Future, stop: asyncio.Event):
+        """在同一個任務中進入與離開 session，直到被要求關閉"""
+        try:
+            async with self._open_session() as session:
+                ready.set_result(session)
+                await stop.wait()
+        except asyncio.CancelledError:
+            ready.cancel()
+            raise
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning(f"replica {self.name} 的連線中斷: {e}")
+
+    async def list_tools(self, *args: Any, **kwargs: Any) -> Any:
+        """列出 replica 上的工具"""
+        session = await self.connect()
+        return await session.list_tools(*args, **kwargs)
+
+    async def call_tool(self, *args: Any, **kwargs: Any) -> Any:
+        """
+        透過持續開啟的 session 呼叫工具
+
+        傳輸層錯誤時關閉目前的 session，下一次呼叫會重新連線；
+        上游回報的協定錯誤（McpError）不影響連線。
+        """
+        from mcp.shared.exceptions import McpError
+
+        session = await self.connect()
+        try:
+            return await session.call_tool(*args, **kwargs)
+        except McpError:
+            raise
+        except Exception:
+            if self._session is session and self._stop is not None:
+                self._stop.set()
+            raise
+
+    def __getattr__(self, name: str) -> Any:
+        # 其他 ClientSession 方法直接交給目前的 session
+        if name.startswith("_") or self._session is None:
+            raise AttributeError(name)
+        return getattr(self._session, name)
+
+    async def close(self):
+        """關閉 session 並等待連線結束"""
+        if self._stop is not None:
+            self._stop.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+        self._session = None
+
+
+@dataclass
+class Replica:
+    """單一 replica 的路由狀態"""
+
+    name: str
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+
+    def available(self, now: float) -> bool:
+        """是否可以接收請求（未被剔除）"""
+        return now >= self.ejected_until
+
+
+class ReplicaGroup:
+    """
+    同一個 MCP 伺服器的多個 replica
+
+    以最少進行中請求（least outstanding requests）選擇 replica；
+    連續失敗 eject_after 次的 replica 會被剔除 eject_seconds 秒，
+    期滿後重新加入並接受請求。請求失敗時會改送到另一個 replica 重試一次。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        replicas: list[str],
+        eject_after: int = 3,
+        eject_seconds: float = 30.0
+    ):
+        """
+        初始化 replica 群組
+
+        Args:
+            name: 群組名稱（邏輯伺服器名稱）
+            replicas: replica 連線名稱列表
+            eject_after: 連續失敗幾次後剔除
+            eject_seconds: 剔除時間（秒）
+        """
+        self.name = name
+        self.replicas = {replica: Replica(replica) for replica in replicas}
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+
+    def pick(self, exclude: Optional[set[str]] = None) -> Optional[Replica]:
+        """
+        選擇進行中請求最少的可用 replica
+
+        全部被剔除時退而選擇最早期滿的 replica，確保請求仍有去處。
+
+        Args:
+            exclude: 不考慮的 replica 名稱
+
+        Returns:
+            選中的 replica；沒有可選的 replica 時回傳 None
+        """
+        exclude = exclude or set()
+        candidates = [r for name, r in self.replicas.items() if name not in exclude]
+        if not candidates:
+            return None
+
+        now = time.monotonic()
+        available = [r for r in candidates if r.available(now)]
+        if available:
+            return min(available, key=lambda r: r.outstanding)
+        return min(candidates, key=lambda r: r.ejected_until)
+
+    async def call(
+        self,
+        tool_name: str,
+        calls: dict[str, Callable[[], Awaitable[Any]]]
+    ) -> Any:
+        """
+        將一次工具呼叫路由到某個 replica
+
+        Args:
+            tool_name: 工具名稱（記錄用）
+            calls: replica 名稱對應的呼叫函數
+
+        Returns:
+            工具回傳值
+        """
+        tried: set[str] = set(self.replicas) - set(calls)
+        last_error: Optional[Exception] = None
+
+        for _ in range(2):
+            replica = self.pick(exclude=tried)
+            if replica is None:
+                break
+            tried.add(replica.name)
+
+            replica.outstanding += 1
+            metrics.incr(f"replica.{replica.name}.requests")
+            start = time.monotonic()
+            try:
+                result = await calls[replica.name]()
+            except ToolException:
+                # 上游有回應，只是回報了業務錯誤；不影響 replica 健康狀態
+                self._record_success(replica)
+                raise
+            except Exception as e:
+                metrics.incr(f"replica.{replica.name}.errors")
+                self._record_failure(replica)
+                logger.warning(f"replica {replica.name} 呼叫 {tool_name} 失敗: {e}")
+                last_error = e
+                continue
+            finally:
+                replica.outstanding -= 1
+
+            metrics.observe(f"replica.{replica.name}.latency", time.monotonic() - start)
+            self._record_success(replica)
+            return result
+
+        raise last_error or RuntimeError(f"{self.name} 沒有可用的 replica")
+
+    def _record_success(self, replica: Replica):
+        replica.consecutive_failures = 0
+        replica.ejected_until = 0.0
+
+    def _record_failure(self, replica: Replica):
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= self.eject_after:
+            replica.ejected_until = time.monotonic() + self.eject_seconds
+            metrics.incr(f"replica.{replica.name}.ejected")
+            logger.warning(
+                f"replica {replica.name} 連續失敗 {replica.consecutive_failures} 次，"
+                f"剔除 {self.eject_seconds:g} 秒"
+            )
+
+    def wrap(self, tools_by_replica: dict[str, BaseTool]) -> BaseTool:
+        """
+        將各 replica 上的同名工具合併成一個路由工具
+
+        Args:
+            tools_by_replica: replica 名稱對應該 replica 載入的工具
+
+        Returns:
+            以第一個 replica 的工具為樣板、呼叫時自動選擇 replica 的工具
+        """
+        template = next(iter(tools_by_replica.values()))
+        coroutines = {
+            replica: tool.coroutine
+            for replica, tool in tools_by_replica.items()
+            if getattr(tool, "coroutine", None) is not None
+        }
+
+        def wrapper(_coroutine):
+            async def routed(**kwargs):
+                return await self.call(
+                    template.name,
+                    {
+                        replica: (lambda c=coroutine: c(**kwargs))
+                        for replica, coroutine in coroutines.items()
+                    },
+                )
+            return routed
+
+        return wrap_tool(template, wrapper)
+
+    def status(self) -> dict:
+        """取得各 replica 的狀態與指標"""
+        now = time.monotonic()
+        result = {}
+        for name, replica in self.replicas.items():
+            result[name] = {
+                "outstanding": replica.outstanding,
+                "ejected": not replica.available(now),
+                "consecutive_failures": replica.consecutive_failures,
+                "requests": metrics.counter(f"replica.{name}.requests"),
+                "errors": metrics.counter(f"replica.{name}.errors"),
+                "p50": metrics.quantile(f"replica.{name}.latency", 0.5),
+            }
+        return result
@@ -0,0 +1,384 @@
+"""Deadlines, hedged requests and circuit breaking for MCP tool calls."""
+
+import time
+import asyncio
+from dataclasses import dataclass, field, replace
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.tools import BaseTool, ToolException
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.tooling import wrap_tool, tool_result
+
+
+class ToolUnavailableError(Exception):
+    """上游暫時無法提供資料（逾時或斷路器開啟）"""
+
+
+class CircuitOpenError(ToolUnavailableError):
+    """斷路器開啟，呼叫被直接拒絕"""
+
+
+class ToolDeadlineExceeded(ToolUnavailableError):
+    """工具呼叫超過期限"""
+
+
+@dataclass
+class CallPolicy:
+    """
+    單一工具呼叫的策略
+
+    Attributes:
+        timeout: 呼叫期限（秒），None 表示不限制
+        hedge: 是否啟用 hedged request
+        hedge_quantile: 以歷史延遲的哪個分位數作為 hedge 觸發時間
+        hedge_min_samples: 累積多少樣本後才開始 hedge
+        hedge_delay: 固定的 hedge 觸發時間（秒），設定後忽略分位數
+    """
+
+    timeout: Optional[float] = None
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+    hedge_delay: Optional[float] = None
+
+    def merged(self, data: dict) -> "CallPolicy":
+        """
+        以 mcp_config.json 中的設定覆寫目前策略
+
+        Args:
+            data: 例如 {"timeout": 20, "hedge": {"enabled": true, "quantile": 0.95}}
+
+        Returns:
+            新的策略
+        """
+        updates: dict[str, Any] = {}
+        if "timeout" in data:
+            updates["timeout"] = data["timeout"]
+        hedge = data.get("hedge")
+        if isinstance(hedge, bool):
+            updates["hedge"] = hedge
+        elif isinstance(hedge, dict):
+            if "enabled" in hedge:
+                updates["hedge"] = bool(hedge["enabled"])
+            if "quantile" in hedge:
+                updates["hedge_quantile"] = float(hedge["quantile"])
+            if "minSamples" in hedge:
+                updates["hedge_min_samples"] = int(hedge["minSamples"])
+            if "delay" in hedge:
+                updates["hedge_delay"] = hedge["delay"]
+        return replace(self, **updates)
+
+
+class CircuitBreaker:
+    """
+    伺服器層級的斷路器
+
+    連續失敗達到 failure_threshold 次後開啟，期間所有呼叫直接失敗；
+    經過 recovery_timeout 秒後進入半開狀態，只放行一個試探呼叫，
+    成功則關閉，失敗則重新開啟。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        初始化斷路器
+
+        Args:
+            name: 名稱（通常是伺服器名稱）
+            failure_threshold: 開啟前允許的連續失敗次數
+            recovery_timeout: 開啟後多久進入半開狀態（秒）
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """檢查是否允許呼叫"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"斷路器 {self.name} 進入半開狀態")
+        # Half-open: only one probe at a time
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        """記錄成功的呼叫"""
+        if self.state != self.CLOSED:
+            logger.info(f"斷路器 {self.name} 已關閉，上游恢復正常")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self):
+        """釋放半開狀態的試探名額（呼叫被取消時使用）"""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        """記錄失敗的呼叫"""
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    f"斷路器 {self.name} 開啟（連續失敗 {self.failures} 次），"
+                    f"{self.recovery_timeout:g} 秒內直接拒絕呼叫"
+                )
+                metrics.incr(f"breaker.{self.name}.opened")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+@dataclass
+class ServerPolicy:
+    """單一 MCP 伺服器的呼叫策略"""
+
+    default: CallPolicy = field(default_factory=CallPolicy)
+    tools: dict[str, CallPolicy] = field(default_factory=dict)
+    failure_threshold: int = 5
+    recovery_timeout: float = 30.0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ServerPolicy":
+        """
+        從 mcp_config.json 的 callPolicy 區塊建立策略
+
+        Args:
+            data: 單一伺服器的設定
+
+        Returns:
+            ServerPolicy 實例
+        """
+        default = CallPolicy().merged(data)
+        tools = {
+            tool_name: default.merged(tool_config)
+            for tool_name, tool_config in data.get("tools", {}).items()
+        }
+        breaker = data.get("circuitBreaker", {})
+        return cls(
+            default=default,
+            tools=tools,
+            failure_threshold=int(breaker.get("failureThreshold", 5)),
+            recovery_timeout=float(breaker.get("recoveryTimeout", 30.0)),
+        )
+
+    def for_tool(self, tool_name: str) -> CallPolicy:
+        """取得指定工具的策略"""
+        return self.tools.get(tool_name, self.default)
+
+
+class ToolCallGuard:
+    """
+    為工具呼叫加上期限、hedged request 和斷路器
+
+    設定位於 mcp_config.json 的 callPolicy 區塊，按伺服器分組：
+    {
+      "callPolicy": {
+        "opgg-mcp": {
+          "timeout": 20,
+          "hedge": {"enabled": true, "quantile": 0.95, "minSamples": 20},
+          "circuitBreaker": {"failureThreshold": 5, "recoveryTimeout": 30},
+          "tools": {"lol_list_items": {"timeout": 30}}
+        }
+      }
+    }
+
+    逾時或斷路器開啟時，工具不會拋出例外，而是回傳一段說明資料暫時無法取得的
+    文字，讓 agent 直接告知使用者，而不是反覆重試。
+    """
+
+    def __init__(
+        self,
+        policies: Optional[dict[str, ServerPolicy]] = None,
+        hedge_admission: Optional[Callable[[str, str], bool]] = None
+    ):
+        """
+        初始化呼叫防護
+
+        Args:
+            policies: 伺服器名稱對應的策略
+            hedge_admission: 送出 hedged request 前的檢查（伺服器, 工具），
+                回傳 False 時不 hedge；用來讓 hedge 也受速率限制
+        """
+        self.policies = policies or {}
+        self.hedge_admission = hedge_admission
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict,
+        hedge_admission: Optional[Callable[[str, str], bool]] = None
+    ) -> "ToolCallGuard":
+        """從完整的 MCP 配置建立呼叫防護"""
+        return cls({
+            server_name: ServerPolicy.from_dict(server_config)
+            for server_name, server_config in config.get("callPolicy", {}).items()
+        }, hedge_admission=hedge_admission)
+
+    def _policy(self, server: str) -> ServerPolicy:
+        return self.policies.get(server) or self.policies.setdefault(server, ServerPolicy())
+
+    def breaker(self, server: str) -> CircuitBreaker:
+        """取得（必要時建立）伺服器的斷路器"""
+        breaker = self.breakers.get(server)
+        if breaker is None:
+            policy = self._policy(server)
+            breaker = self.breakers[server] = CircuitBreaker(
+                server,
+                failure_threshold=policy.failure_threshold,
+                recovery_timeout=policy.recovery_timeout,
+            )
+        return breaker
+
+    async def call(
+        self,
+        server: str,
+        tool_name: str,
+        call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        在策略保護下執行一次工具呼叫
+
+        Args:
+            server: 伺服器名稱
+            tool_name: 工具名稱
+            call: 建立呼叫協程的函數（hedge 時會被呼叫兩次）
+
+        Returns:
+            工具回傳值
+
+        Raises:
+            CircuitOpenError: 斷路器開啟
+            ToolDeadlineExceeded: 超過呼叫期限
+        """
+        breaker = self.breaker(server)
+        if not breaker.allow():
+            metrics.incr(f"tool.{server}.fast_fail")
+            raise CircuitOpenError(f"{server} 斷路器開啟")
+
+        policy = self._policy(server).for_tool(tool_name)
+        latency_key = f"tool.{server}.{tool_name}.latency"
+        start = time.monotonic()
+
+        try:
+            hedge_delay = self._hedge_delay(policy, latency_key)
+            if hedge_delay is not None:
+                awaitable = self._run_hedged(call, hedge_delay, server, tool_name)
+            else:
+                awaitable = call()
+            result = await asyncio.wait_for(awaitable, timeout=policy.timeout)
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            metrics.incr(f"tool.{server}.timeout")
+            raise ToolDeadlineExceeded(f"{tool_name} 超過 {policy.timeout} 秒未回應")
+        except ToolException:
+            # 上游有回應，只是回報了業務錯誤（例如找不到召喚師），不算故障
+            breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            # 取消不代表上游故障，但要釋放半開狀態的試探名額
+            breaker.release_probe()
+            raise
+        except Exception:
+            breaker.record_failure()
+            metrics.incr(f"tool.{server}.error")
+            raise
+
+        breaker.record_success()
+        metrics.observe(latency_key, time.monotonic() - start)
+        return result
+
+    def _hedge_delay(self, policy: CallPolicy, latency_key: str) -> Optional[float]:
+        """計算 hedge 觸發時間；不需要 hedge 時回傳 None"""
+        if not policy.hedge:
+            return None
+        if policy.hedge_delay is not None:
+            return float(policy.hedge_delay)
+        if metrics.sample_count(latency_key) < policy.hedge_min_samples:
+            return None
+        return metrics.quantile(latency_key, policy.hedge_quantile)
+
+    async def _run_hedged(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        delay: float,
+        server: str,
+        tool_name: str
+    ) -> Any:
+        """先送出一個請求，超過 delay 仍未完成時再送出一個，採用先成功者"""
+        tasks = {asyncio.ensure_future(call())}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if self.hedge_admission is None or self.hedge_admission(server, tool_name):
+                    metrics.incr(f"tool.{server}.hedge_fired")
+                    tasks.add(asyncio.ensure_future(call()))
+                else:
+                    # 已經在限流邊緣，再多送一個只會讓情況更糟
+                    metrics.incr(f"tool.{server}.hedge_throttled")
+
+            last_error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def wrap(self, tool: BaseTool, server: str) -> BaseTool:
+        """
+        包裝工具，使其呼叫經過本防護
+
+        Args:
+            tool: 原始工具
+            server: 工具所屬的伺服器名稱
+
+        Returns:
+            包裝後的工具
+        """
+        prefix = f"{server}_"
+        tool_name = tool.name[len(prefix):] if tool.name.startswith(prefix) else tool.name
+
+        def wrapper(coroutine):
+            async def guarded(**kwargs):
+                try:
+                    return await self.call(server, tool_name, lambda: coroutine(**kwargs))
+                except ToolUnavailableError as e:
+                    logger.warning(f"工具 {tool.name} 無法取得資料: {e}")
+                    return tool_result(
+                        tool,
+                        f"[資料暫時無法取得] {server} 上游服務目前不穩定（{e}）。"
+                        "請直接告知使用者此資料暫時無法查詢，稍後再試，不要重複呼叫此工具。"
+                    )
+            return guarded
+
+        return wrap_tool(tool, wrapper)
+
+    def status(self) -> dict:
+        """取得各伺服器斷路器狀態"""
+        return {
+            name: {"state": breaker.state, "failures": breaker.failures}
+            for name, breaker in self.breakers.items()
+        }
@@ -0,0 +1,123 @@
+"""Post-processing of tool results before they are stored as ToolMessages."""
+
+import json
+from typing import Callable, Optional
+
+from langchain_core.messages import ToolMessage
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.tabular import TabularDecoder, is_tabular, nest_extra
+from lol_chat_helper.tooling import content_to_text
+
+
+# A processor receives a ToolMessage and returns it (possibly replaced)
+ToolResultProcessor = Callable[[ToolMessage], ToolMessage]
+
+
+class TabularResultFilter:
+    """
+    依 toolResults 設定裁剪 headers/rows 格式的工具結果
+
+    設定位於 mcp_config.json 的 toolResults 區塊，以工具名稱為鍵：
+    {
+      "toolResults": {
+        "lol_list_items": {
+          "columns": ["item_id", "name", "gold_total", "plaintext"],
+          "limit": 200
+        },
+        "lol_list_lane_meta_champions": {"where": {"is_rip": false}}
+      }
+    }
+
+    - sections：只保留這些區段
+    - columns：只保留這些欄位
+    - where：只保留欄位值相等的列
+    - limit：最多保留幾列，達到後停止解碼
+
+    解碼是增量的，所以耗時與記憶體取決於保留下來的資料量，而不是原始結果大小。
+    """
+
+    def __init__(self, rules: Optional[dict[str, dict]] = None):
+        """
+        初始化結果過濾器
+
+        Args:
+            rules: 工具名稱對應的裁剪規則
+        """
+        self.rules = rules or {}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "TabularResultFilter":
+        """從完整的 MCP 配置建立過濾器"""
+        return cls(config.get("toolResults", {}))
+
+    def __call__(self, message: ToolMessage) -> ToolMessage:
+        rule = self.rules.get(message.name or "")
+        if not rule or not any(key in rule for key in ("sections", "columns", "where", "limit")):
+            return message
+
+        text = content_to_text(message.content)
+        if not is_tabular(text):
+            return message
+
+        try:
+            filtered = self.filter_text(text, rule)
+        except ValueError as e:
+            logger.debug(f"[ToolResult] {message.name} 不是可解碼的表格格式，保留原始結果: {e}")
+            return message
+
+        logger.debug(
+            f"[ToolResult] {message.name} 裁剪結果: {len(text)} -> {len(filtered)} 字元"
+        )
+        return message.model_copy(update={"content": filtered})
+
+    @staticmethod
+    def filter_text(text: str, rule: dict) -> str:
+        """
+        依規則裁剪表格格式的文字
+
+        Args:
+            text: 原始 JSON 文字
+            rule: 裁剪規則（sections / columns / where / limit）
+
+        Returns:
+            裁剪後的 JSON 文字
+        """
+        columns = set(rule["columns"]) if rule.get("columns") else None
+        limit = rule.get("limit")
+        decoder = TabularDecoder(
+            text,
+            sections=rule.get("sections"),
+            where=rule.get("where"),
+            limit=limit,
+        )
+
+        sections: dict[str, dict] = {}
+        indexes: dict[str, list[int]] = {}
+        for row in decoder:
+            section = sections.get(row.section)
+            if section is None:
+                keep = [
+                    i for i, header in enumerate(row.headers)
+                    if columns is None or header in columns
+                ]
+                indexes[row.section] = keep
+                section = sections[row.section] = {
+                    "headers": [row.headers[i] for i in keep],
+                    "rows": [],
+                }
+            section["rows"].append([row.values[i] for i in indexes[row.section]])
+
+        descriptions = decoder.column_descriptions
+        if columns is not None:
+            descriptions = {
+                key: value for key, value in descriptions.items()
+                if key.rsplit(".", 1)[-1] in columns
+            }
+
+        payload = nest_extra(decoder.extra)
+        payload["column_descriptions"] = descriptions
+        payload.setdefault("data", {}).update(sections)
+        if not decoder.exhausted:
+            payload["truncated"] = f"只保留前 {limit} 列符合條件的資料"
+        return json.dumps(payload, ensure_ascii=False)
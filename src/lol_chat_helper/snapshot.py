@@ -0,0 +1,379 @@
+"""Patch-versioned, memory-mapped snapshots of static OP.GG datasets.
+
+Champion lists, items, champion details and lane meta only change with a
+game patch, yet every process would otherwise fetch and hold its own copy.
+``StaticDataStore`` fetches them once per patch into a single file::
+
+    MAGIC (8 bytes) | index offset (u64) | index length (u64) | payloads... | index JSON
+
+Processes open the file read-only with ``mmap``, so the payload pages are
+shared through the OS page cache; a tool call for a snapshotted dataset is
+answered by slicing the mapping at the offset recorded in the index.
+"""
+
+import os
+import re
+import json
+import mmap
+import time
+import struct
+import asyncio
+import urllib.request
+from pathlib import Path
+from typing import Any, Optional
+
+from langchain_core.tools import BaseTool
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.ratelimit import batch_priority
+from lol_chat_helper.tooling import content_to_text, tool_result, wrap_tool
+
+
+MAGIC = b"LOLSNAP1"
+_HEADER = struct.Struct("<8sQQ")
+FORMAT_VERSION = 1
+DDRAGON_VERSIONS_URL = "https://ddragon.leagueoflegends.com/api/versions.json"
+
+# 參數中不影響資料內容的欄位（上游用來挑選輸出欄位，快照一律保存完整資料）
+_IGNORED_ARGS = ("desired_value_description",)
+
+
+def dataset_key(tool_name: str, args: dict) -> str:
+    """
+    資料集在快照中的鍵，例如 ``lol_list_items|{"lang":"en_US"}``
+
+    Args:
+        tool_name: 不含伺服器前綴的工具名稱
+        args: 工具參數
+
+    Returns:
+        與參數順序無關的鍵
+    """
+    params = {k: v for k, v in args.items() if k not in _IGNORED_ARGS and v is not None}
+    return f"{tool_name}|{json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(',', ':'))}"
+
+
+def _schema_defaults(tool: BaseTool) -> dict:
+    """工具參數 schema 中的預設值（省略參數與明確傳入預設值應對應到同一個資料集）"""
+    try:
+        return {name: spec["default"] for name, spec in tool.args.items() if "default" in spec}
+    except Exception:
+        return {}
+
+
+def write_snapshot(path: Path, patch: str, datasets: dict[str, str]):
+    """
+    寫入快照檔案（先寫到暫存檔再原子性地取代）
+
+    Args:
+        path: 快照檔案路徑
+        patch: 遊戲版本
+        datasets: 資料集鍵對應的內容文字
+    """
+    entries = {}
+    payloads = []
+    offset = _HEADER.size
+    for key, text in datasets.items():
+        data = text.encode("utf-8")
+        entries[key] = [offset, len(data)]
+        payloads.append(data)
+        offset += len(data)
+
+    index = json.dumps(
+        {"format": FORMAT_VERSION, "patch": patch, "built_at": time.time(), "entries": entries},
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, offset, len(index)))
+        for data in payloads:
+            f.write(data)
+        f.write(index)
+    os.replace(tmp_path, path)
+
+
+class StaticSnapshot:
+    """唯讀、以 mmap 開啟的快照檔案"""
+
+    def __init__(self, path: Path):
+        """
+        開啟快照
+
+        Args:
+            path: 快照檔案路徑
+
+        Raises:
+            ValueError: 檔案格式不正確
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} 不是快照檔案")
+        index = json.loads(self._mm[index_offset:index_offset + index_length])
+        if index.get("format") != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} 的格式版本不支援")
+        self.patch: str = index["patch"]
+        self.built_at: float = index["built_at"]
+        self.entries: dict[str, list[int]] = index["entries"]
+
+    def get(self, key: str) -> Optional[str]:
+        """取得資料集內容（不存在時回傳 None）"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        offset, length = entry
+        return self._mm[offset:offset + length].decode("utf-8")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def size(self) -> int:
+        return len(self._mm)
+
+    def close(self):
+        self._mm.close()
+
+
+class StaticDataStore:
+    """
+    依遊戲版本管理靜態資料快照
+
+    設定位於 mcp_config.json 的 staticSnapshot 區塊：
+    {
+      "staticSnapshot": {
+        "enabled": true,
+        "path": ".cache/static",
+        "patch": "auto",
+        "checkInterval": 21600,
+        "datasets": [
+          {"tool": "lol_list_champions", "args": {"lang": "en_US"}},
+          {"tool": "lol_list_items", "args": {"lang": "en_US"}}
+        ]
+      }
+    }
+
+    patch 為 "auto" 時從 Data Dragon 的版本列表取得目前版本（例如 "15.21"），
+    也可以直接指定版本字串。版本改變時重新建立快照並刪除舊檔。
+    """
+
+    def __init__(
+        self,
+        directory: str = ".cache/static",
+        datasets: Optional[list[dict]] = None,
+        patch: str = "auto",
+        check_interval: float = 6 * 3600,
+        versions_url: str = DDRAGON_VERSIONS_URL
+    ):
+        """
+        初始化快照管理
+
+        Args:
+            directory: 快照檔案目錄（同一台主機的程序共用）
+            datasets: 要快照的資料集，每個為 {"tool": 工具名稱, "args": 參數}
+            patch: "auto" 或固定的版本字串
+            check_interval: 背景檢查版本的間隔（秒）
+            versions_url: 版本列表的網址
+        """
+        self.directory = Path(directory)
+        self.datasets = datasets or []
+        self.patch_setting = patch
+        self.check_interval = check_interval
+        self.versions_url = versions_url
+        self.snapshot: Optional[StaticSnapshot] = None
+        self.tools: dict[str, BaseTool] = {}
+        self._build_lock = asyncio.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["StaticDataStore"]:
+        """從完整的 MCP 配置建立；停用或沒有資料集時回傳 None"""
+        data = config.get("staticSnapshot", {})
+        if not data.get("enabled", True) or not data.get("datasets"):
+            return None
+        return cls(
+            directory=data.get("path", ".cache/static"),
+            datasets=data["datasets"],
+            patch=str(data.get("patch", "auto")),
+            check_interval=float(data.get("checkInterval", 6 * 3600)),
+            versions_url=data.get("versionsUrl", DDRAGON_VERSIONS_URL),
+        )
+
+    @property
+    def tool_names(self) -> set[str]:
+        return {dataset["tool"] for dataset in self.datasets}
+
+    def _snapshot_path(self, patch: str) -> Path:
+        safe = re.sub(r"[^0-9A-Za-z._-]", "_", patch)
+        return self.directory / f"static-{safe}.snap"
+
+    # -- Patch detection -----------------------------------------------------
+
+    def _fetch_patch(self) -> str:
+        with urllib.request.urlopen(self.versions_url, timeout=5) as response:
+            versions = json.load(response)
+        # "15.21.1" -> "15.21"：同一個版本的小更新不影響這些資料
+        return ".".join(str(versions[0]).split(".")[:2])
+
+    async def current_patch(self) -> Optional[str]:
+        """
+        取得目前的遊戲版本
+
+        Returns:
+            版本字串；自動偵測失敗時回傳 None
+        """
+        if self.patch_setting != "auto":
+            return self.patch_setting
+        try:
+            return await asyncio.to_thread(self._fetch_patch)
+        except Exception as e:
+            logger.warning(f"無法取得目前的遊戲版本: {e}")
+            return None
+
+    def _latest_on_disk(self) -> Optional[Path]:
+        files = sorted(self.directory.glob("static-*.snap"), key=lambda p: p.stat().st_mtime)
+        return files[-1] if files else None
+
+    # -- Open / build --------------------------------------------------------
+
+    def _open(self, path: Path) -> bool:
+        try:
+            snapshot = StaticSnapshot(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"無法開啟靜態資料快照 {path}: {e}")
+            return False
+        previous, self.snapshot = self.snapshot, snapshot
+        if previous is not None:
+            previous.close()
+        logger.info(
+            f"已載入靜態資料快照（版本 {snapshot.patch}，{len(snapshot)} 個資料集，"
+            f"{snapshot.size / 1024:.0f} KB）"
+        )
+        return True
+
+    async def refresh(self) -> bool:
+        """
+        確認快照與目前版本一致，必要時重新建立
+
+        Returns:
+            是否換用了新的快照
+        """
+        async with self._build_lock:
+            patch = await self.current_patch()
+            if patch is None:
+                # 版本不明時沿用磁碟上最新的快照
+                if self.snapshot is None and (latest := self._latest_on_disk()):
+                    return self._open(latest)
+                return False
+            if self.snapshot is not None and self.snapshot.patch == patch:
+                return False
+
+            path = self._snapshot_path(patch)
+            if not path.exists():
+                # 其他程序可能已經建好同版本的快照；沒有才自己建立
+                await self._build(path, patch)
+            if not path.exists() or not self._open(path):
+                return False
+            self._remove_stale(keep=path)
+            return True
+
+    async def _build(self, path: Path, patch: str):
+        """從上游取得所有資料集並寫入快照"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        datasets: dict[str, str] = {}
+        for dataset in self.datasets:
+            tool = self.tools.get(dataset["tool"])
+            if tool is None or getattr(tool, "coroutine", None) is None:
+                continue
+            args = dict(dataset.get("args", {}))
+            try:
+                result = await tool.coroutine(**args)
+                args = {**_schema_defaults(tool), **args}
+            except Exception as e:
+                logger.warning(f"建立快照時 {dataset['tool']} 查詢失敗，略過: {e}")
+                continue
+            text = content_to_text(result[0] if isinstance(result, tuple) else result)
+            if text.lstrip().startswith("{"):
+                datasets[dataset_key(dataset["tool"], args)] = text
+
+        if not datasets:
+            logger.warning("沒有取得任何靜態資料，這次不建立快照")
+            return
+        write_snapshot(path, patch, datasets)
+        metrics.incr("snapshot.built")
+        logger.info(f"已建立版本 {patch} 的靜態資料快照（{len(datasets)} 個資料集）")
+
+    def _remove_stale(self, keep: Path):
+        for path in self.directory.glob("static-*.snap"):
+            if path != keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    async def maintain(self):
+        """背景任務：啟動時載入或建立快照，之後定期檢查版本"""
+        while True:
+            try:
+                # 建立快照的上游呼叫排在使用者的呼叫之後
+                with batch_priority():
+                    await self.refresh()
+            except Exception as e:
+                logger.warning(f"更新靜態資料快照失敗: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    # -- Tool wrapping -------------------------------------------------------
+
+    def wrap(self, tool: BaseTool, pure_name: str) -> BaseTool:
+        """
+        讓靜態資料工具優先從快照回應
+
+        Args:
+            tool: 已包裝好呼叫防護的工具
+            pure_name: 不含伺服器前綴的工具名稱
+
+        Returns:
+            包裝後的工具；不在快照資料集中的工具回傳原工具
+        """
+        if pure_name not in self.tool_names:
+            return tool
+        # 建立快照時直接呼叫上游
+        self.tools[pure_name] = tool
+        defaults = _schema_defaults(tool)
+
+        def wrapper(coroutine):
+            async def snapshotted(**kwargs: Any):
+                snapshot = self.snapshot
+                if snapshot is not None:
+                    text = snapshot.get(dataset_key(pure_name, {**defaults, **kwargs}))
+                    if text is not None:
+                        metrics.incr("snapshot.hit")
+                        return tool_result(tool, text)
+                metrics.incr("snapshot.miss")
+                return await coroutine(**kwargs)
+            return snapshotted
+
+        return wrap_tool(tool, wrapper)
+
+    def status(self) -> dict:
+        """快照狀態"""
+        if self.snapshot is None:
+            return {"patch": None, "datasets": 0, "bytes": 0}
+        return {
+            "patch": self.snapshot.patch,
+            "datasets": len(self.snapshot),
+            "bytes": self.snapshot.size,
+        }
+
+    def close(self):
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
@@ -0,0 +1,414 @@
+"""Incremental decoding of OP.GG headers/rows tool payloads.
+
+OP.GG tools return JSON shaped like::
+
+    {
+      "column_descriptions": {...},
+      "data": {
+        "items": {"headers": [...], "rows": [[...], [...], ...]},
+        ...
+      }
+    }
+
+``TabularDecoder`` walks that structure with ``json.JSONDecoder.raw_decode``
+one value at a time, so rows can be filtered and yielded as soon as they are
+parsed and decoding stops as soon as a limit is reached. Each value, including
+a whole section that was not requested, is still built in full by the C
+decoder before it is filtered or dropped; scanning bracket depth in Python to
+skip a section measured about 3x slower than simply decoding it.
+
+The incremental path only pays off when a limit can stop decoding early. MCP
+delivers each tool result as one complete string, so a string read without a
+limit is parsed with ``json.loads`` and the resulting tree is walked instead,
+which is several times faster. The source may also be an iterable of text
+chunks (consumed chunk data is dropped as the decoder advances), but no
+upstream currently produces one.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_COMPACT_THRESHOLD = 64 * 1024
+
+# Top-level keys that hold section tables (some tools nest them, e.g. {"flat": {"data": ...}})
+DATA_KEY = "data"
+DESCRIPTIONS_KEY = "column_descriptions"
+
+RowFilter = Union[Callable[[dict], bool], dict]
+
+
+class _LimitReached(Exception):
+    """內部用：達到 limit 時中止解碼"""
+
+
+@dataclass
+class TabularRow:
+    """解碼出的一列資料"""
+
+    section: str
+    headers: list[str]
+    values: list[Any]
+
+    def as_dict(self) -> dict:
+        """以 {欄位: 值} 形式回傳"""
+        return dict(zip(self.headers, self.values))
+
+
+class _Buffer:
+    """可從 chunk 串流補充資料的文字緩衝區"""
+
+    def __init__(self, source: Union[str, Iterable[str]]):
+        if isinstance(source, str):
+            self.text = source
+            self._chunks: Optional[Iterator[str]] = None
+        else:
+            self.text = ""
+            self._chunks = iter(source)
+        self.pos = 0
+
+    def fill(self) -> bool:
+        """讀入下一個 chunk；沒有更多資料時回傳 False"""
+        if self._chunks is None:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                if self.pos > _COMPACT_THRESHOLD:
+                    self.text = self.text[self.pos:]
+                    self.pos = 0
+                self.text += chunk
+                return True
+        self._chunks = None
+        return False
+
+    def peek(self) -> str:
+        """略過空白後回傳下一個字元（EOF 時為空字串）"""
+        while True:
+            text, pos = self.text, self.pos
+            while pos < len(text) and text[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(text):
+                return text[pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        """消耗指定字元，不符時拋出 ValueError"""
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def decode(self) -> Any:
+        """解碼下一個完整的 JSON 值"""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # 值可能被 chunk 邊界切斷，補充資料後重試
+                if self.fill():
+                    continue
+                raise
+            # 數字可能恰好在 chunk 邊界被截斷（例如 "12" + "34"）
+            if end == len(self.text) and self._chunks is not None and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+class TabularDecoder:
+    """
+    OP.GG headers/rows 格式的增量解碼器
+
+    Example:
+        decoder = TabularDecoder(text, sections=["items"], limit=20)
+        for row in decoder:
+            print(row.as_dict())
+        decoder.column_descriptions  # 解碼過程中讀到的欄位說明
+    """
+
+    def __init__(
+        self,
+        source: Union[str, Iterable[str], dict],
+        sections: Optional[Iterable[str]] = None,
+        where: Optional[RowFilter] = None,
+        limit: Optional[int] = None
+    ):
+        """
+        初始化解碼器
+
+        Args:
+            source: 完整的 JSON 字串、文字 chunk 的 iterable，或已用 json.loads 解析好的 dict
+            sections: 只解碼這些區段（None 表示全部）
+            where: 列篩選條件：接收 {欄位: 值} 的函數，或要求欄位相等的 dict
+            limit: 最多輸出幾列（跨所有區段），達到後立即停止解碼
+        """
+        self._source = source
+        self._buffer = _Buffer(source) if not isinstance(source, dict) else None
+        self.sections = set(sections) if sections is not None else None
+        self.where = where
+        self.limit = limit
+        self.column_descriptions: dict[str, str] = {}
+        # 非表格的值，以點分隔的完整路徑為鍵（例如 "data.metadata_maps.champion_ids"）
+        self.extra: dict[str, Any] = {}
+        self.rows_seen = 0
+        self.rows_emitted = 0
+        self.exhausted = False
+
+    def __iter__(self) -> Iterator[TabularRow]:
+        if self.limit is not None and self.limit <= 0:
+            return
+        try:
+            if isinstance(self._source, dict) or (isinstance(self._source, str) and self.limit is None):
+                # 整份文件已經在記憶體中，也不會提早停止：json.loads 比逐值解碼快得多
+                document = self._source if isinstance(self._source, dict) else json.loads(self._source)
+                if not isinstance(document, dict):
+                    raise ValueError("Expected a JSON object")
+                for key, value in document.items():
+                    yield from self._walk_top_level_member(key, value)
+            else:
+                yield from self._parse_object(self._parse_top_level_member)
+            self.exhausted = True
+        except _LimitReached:
+            return
+
+    def _matches(self, headers: list[str], values: list[Any]) -> bool:
+        if self.where is None:
+            return True
+        row = dict(zip(headers, values))
+        if callable(self.where):
+            return bool(self.where(row))
+        return all(row.get(column) == value for column, value in self.where.items())
+
+    def _parse_object(self, member: Callable[[str], Iterator[TabularRow]]) -> Iterator[TabularRow]:
+        """解析一個 JSON 物件，每個成員交給 member 處理"""
+        buffer = self._buffer
+        buffer.expect("{")
+        if buffer.peek() == "}":
+            buffer.pos += 1
+            return
+        while True:
+            key = buffer.decode()
+            buffer.expect(":")
+            yield from member(key)
+            char = buffer.peek()
+            buffer.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or '}}' at offset {buffer.pos - 1}")
+
+    def _parse_top_level_member(self, key: str, path: str = "") -> Iterator[TabularRow]:
+        buffer = self._buffer
+        full_key = f"{path}.{key}" if path else key
+        if key == DATA_KEY and buffer.peek() == "{":
+            yield from self._parse_object(lambda name: self._parse_section(name, full_key))
+        elif key == DESCRIPTIONS_KEY:
+            self.column_descriptions.update(buffer.decode())
+        elif buffer.peek() == "{":
+            # 巢狀容器（例如 "flat": {"column_descriptions": ..., "data": ...}）
+            yield from self._parse_object(
+                lambda member_key: self._parse_top_level_member(member_key, full_key)
+            )
+        else:
+            self.extra[full_key] = buffer.decode()
+
+    def _walk_top_level_member(self, key: str, value: Any, path: str = "") -> Iterator[TabularRow]:
+        """與 _parse_top_level_member 相同，但處理 json.loads 已解析好的值"""
+        full_key = f"{path}.{key}" if path else key
+        if key == DATA_KEY and isinstance(value, dict):
+            for name, section in value.items():
+                yield from self._walk_section(name, section, full_key)
+        elif key == DESCRIPTIONS_KEY:
+            self.column_descriptions.update(value)
+        elif isinstance(value, dict):
+            for member_key, member in value.items():
+                yield from self._walk_top_level_member(member_key, member, full_key)
+        else:
+            self.extra[full_key] = value
+
+    def _walk_section(self, name: str, section: Any, data_path: str) -> Iterator[TabularRow]:
+        """與 _parse_section 相同，但處理 json.loads 已解析好的值"""
+        if self.sections is not None and name not in self.sections:
+            return
+        if not isinstance(section, dict):
+            self.extra[f"{data_path}.{name}"] = section
+            return
+        headers = None
+        pending: list = []
+        for key, value in section.items():
+            if key == "headers":
+                headers = value
+                for values in pending:
+                    yield from self._emit(name, headers, values)
+                pending = []
+            elif key == "rows" and isinstance(value, list):
+                for values in value:
+                    if headers is None:
+                        pending.append(values)
+                    else:
+                        yield from self._emit(name, headers, values)
+            else:
+                self.extra[f"{data_path}.{name}.{key}"] = value
+
+    def _parse_section(self, name: str, data_path: str) -> Iterator[TabularRow]:
+        buffer = self._buffer
+        if self.sections is not None and name not in self.sections:
+            # raw_decode 是 C 實作，比在 Python 裡掃描括號深度更快；建好的值直接丟棄
+            buffer.decode()
+            return
+        if buffer.peek() != "{":
+            self.extra[f"{data_path}.{name}"] = buffer.decode()
+            return
+
+        state: dict[str, Any] = {"headers": None, "pending": []}
+
+        def member(key: str) -> Iterator[TabularRow]:
+            if key == "headers":
+                state["headers"] = buffer.decode()
+                # rows 出現在 headers 之前時暫存，現在補上
+                pending, state["pending"] = state["pending"], []
+                for values in pending:
+                    yield from self._emit(name, state["headers"], values)
+            elif key == "rows" and buffer.peek() == "[":
+                yield from self._parse_rows(name, state)
+            else:
+                # 非表格資料（例如 metadata_maps）以完整路徑保留
+                self.extra[f"{data_path}.{name}.{key}"] = buffer.decode()
+
+        yield from self._parse_object(member)
+
+    def _parse_rows(self, name: str, state: dict) -> Iterator[TabularRow]:
+        buffer = self._buffer
+        buffer.expect("[")
+        if buffer.peek() == "]":
+            buffer.pos += 1
+            return
+        while True:
+            values = buffer.decode()
+            if state["headers"] is None:
+                state["pending"].append(values)
+            else:
+                yield from self._emit(name, state["headers"], values)
+            char = buffer.peek()
+            buffer.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' at offset {buffer.pos - 1}")
+
+    def _emit(self, name: str, headers: list[str], values: list[Any]) -> Iterator[TabularRow]:
+        self.rows_seen += 1
+        if not self._matches(headers, values):
+            return
+        self.rows_emitted += 1
+        yield TabularRow(name, headers, values)
+        if self.limit is not None and self.rows_emitted >= self.limit:
+            # 停止整個解碼，後面的資料不再讀取
+            raise _LimitReached
+
+
+def iter_rows(
+    source: Union[str, Iterable[str]],
+    sections: Optional[Iterable[str]] = None,
+    where: Optional[RowFilter] = None,
+    limit: Optional[int] = None
+) -> Iterator[TabularRow]:
+    """
+    增量解碼 headers/rows 格式並逐列輸出
+
+    Args:
+        source: 完整的 JSON 字串或文字 chunk 的 iterable
+        sections: 只解碼這些區段
+        where: 列篩選條件
+        limit: 最多輸出幾列
+
+    Yields:
+        TabularRow
+    """
+    yield from TabularDecoder(source, sections=sections, where=where, limit=limit)
+
+
+def nest_extra(extra: dict[str, Any]) -> dict:
+    """
+    將 TabularDecoder.extra 的點分隔路徑還原為巢狀 dict
+
+    Args:
+        extra: {"data.metadata_maps.champion_ids": {...}, "champion": "AHRI"}
+
+    Returns:
+        {"data": {"metadata_maps": {"champion_ids": {...}}}, "champion": "AHRI"}
+    """
+    nested: dict = {}
+    for path, value in extra.items():
+        *parents, leaf = path.split(".")
+        node = nested
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = value
+    return nested
+
+
+def decode_sections(source: Union[str, Iterable[str]]) -> tuple[dict[str, list[dict]], dict]:
+    """
+    解碼 headers/rows 結果為 {區段: 列} 與巢狀的非表格資料
+
+    Args:
+        source: 完整的 JSON 字串或文字 chunk 的 iterable
+
+    Returns:
+        (區段名稱對應列的 dict 列表, nest_extra 還原的非表格資料)
+    """
+    decoder = TabularDecoder(source)
+    sections: dict[str, list[dict]] = {}
+    for row in decoder:
+        sections.setdefault(row.section, []).append(row.as_dict())
+    return sections, nest_extra(decoder.extra)
+
+
+def find_map(data: Any, name: str) -> dict:
+    """
+    在巢狀資料中找出名為 name 的對照表（例如 metadata_maps.champion_ids）
+
+    Args:
+        data: nest_extra 還原的資料
+        name: 對照表名稱
+
+    Returns:
+        找到的 dict；沒有時為空 dict
+    """
+    if isinstance(data, dict):
+        if isinstance(data.get(name), dict):
+            return data[name]
+        for value in data.values():
+            found = find_map(value, name)
+            if found:
+                return found
+    return {}
+
+
+def parse_ids(value: Any) -> list[str]:
+    """'[3118,4645]' 或 [3118, 4645] -> ['3118', '4645']"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return [str(v) for v in value] if isinstance(value, list) else []
+
+
+def is_tabular(text: str) -> bool:
+    """
+    快速判斷文字是否可能是 headers/rows 格式（只檢查開頭，不解析）
+
+    Args:
+        text: 工具結果文字
+
+    Returns:
+        是否值得嘗試以 TabularDecoder 解碼
+    """
+    return text[:4096].lstrip().startswith("{") and '"headers"' in text[:1 << 16]
@@ -0,0 +1,53 @@
+"""Token counting helpers."""
+
+from typing import Callable
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗估文字的 token 數
+
+    不依賴特定 tokenizer：ASCII 字元約 4 個一個 token，其他字元（中日韓文字等）
+    大約一個字一個 token。用於比較與預算控制已足夠準確。
+
+    Args:
+        text: 要估算的文字
+
+    Returns:
+        估計的 token 數
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for char in text if char < "\x80")
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def get_tokenizer(name: str = "estimate") -> Callable[[str], int]:
+    """
+    依名稱取得 token 計數函數
+
+    Args:
+        name: "estimate"（預設的粗估）或 "tiktoken:<encoding>"，例如
+              "tiktoken:o200k_base"（需要另外安裝 tiktoken）
+
+    Returns:
+        接收文字、回傳 token 數的函數
+
+    Raises:
+        ValueError: 名稱不支援
+        ImportError: 指定 tiktoken 但未安裝
+    """
+    if name == "estimate":
+        return estimate_tokens
+
+    if name.startswith("tiktoken:"):
+        try:
+            import tiktoken
+        except ImportError as e:
+            raise ImportError(
+                "使用 tiktoken 計算 token 需要安裝 tiktoken: pip install tiktoken"
+            ) from e
+        encoding = tiktoken.get_encoding(name.split(":", 1)[1])
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+    raise ValueError(f"Unknown tokenizer: {name}")
@@ -0,0 +1,77 @@
+"""Helpers for wrapping LangChain tools with extra behaviour."""
+
+from typing import Any, Awaitable, Callable
+
+from langchain_core.tools import BaseTool
+
+from lol_chat_helper.config import logger
+
+
+ToolCoroutine = Callable[..., Awaitable[Any]]
+
+
+def wrap_tool(
+    tool: BaseTool,
+    wrapper: Callable[[ToolCoroutine], ToolCoroutine]
+) -> BaseTool:
+    """
+    以包裝函數替換工具的非同步實作
+
+    MCP 轉換出的工具是 StructuredTool，實際的呼叫位於 ``tool.coroutine``。
+    這裡複製一份工具並替換 coroutine，名稱、描述和參數 schema 保持不變，
+    所以 ToolNode 和 bind_tools 看到的仍是同一個工具。
+
+    Args:
+        tool: 原始工具
+        wrapper: 接收原始 coroutine、回傳新 coroutine 的函數
+
+    Returns:
+        包裝後的工具；不支援包裝時回傳原始工具
+    """
+    coroutine = getattr(tool, "coroutine", None)
+    if coroutine is None:
+        logger.debug(f"工具 {tool.name} 沒有 coroutine，略過包裝")
+        return tool
+    return tool.model_copy(update={"coroutine": wrapper(coroutine)})
+
+
+def tool_result(tool: BaseTool, content: str) -> Any:
+    """
+    依照工具的 response_format 建立回傳值
+
+    Args:
+        tool: 工具
+        content: 要交給 agent 的文字內容
+
+    Returns:
+        ``content_and_artifact`` 工具回傳 (content, None)，其他回傳 content
+    """
+    if getattr(tool, "response_format", "content") == "content_and_artifact":
+        return content, None
+    return content
+
+
+def content_to_text(content: Any) -> str:
+    """
+    將工具結果或 ToolMessage 的 content 轉為純文字
+
+    MCP 工具可能回傳字串，或是 ``[{"type": "text", "text": ...}]`` 形式的
+    content block 列表。
+
+    Args:
+        content: 原始內容
+
+    Returns:
+        合併後的文字
+    """
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+        return "".join(parts)
+    return str(content)
@@ -0,0 +1,77 @@
+"""Shared HTTP connection pool for the language model backend."""
+
+from typing import Any
+
+from lol_chat_helper.config import HTTPConfig, logger
+
+
+class ModelHTTPClients:
+    """
+    所有模型共用的 httpx 連線池
+
+    主要模型與各角色的模型（以及熱重載後重建的 graph、每個對話 session）
+    都透過同一組 client 連到 LLM 伺服器，連線保持 keep-alive 重複使用，
+    不必每次呼叫重新建立 TCP 連線。httpx 依 origin 分開管理連線，
+    不同 base_url 的模型也可以共用。
+    """
+
+    def __init__(self, config: HTTPConfig):
+        """
+        建立同步與非同步的 client
+
+        Args:
+            config: 連線池設定
+        """
+        import httpx
+
+        self.config = config
+        http2 = config.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("MODEL_HTTP2 需要安裝 h2（pip install httpx[http2]），改用 HTTP/1.1")
+                http2 = False
+
+        limits = httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive,
+            keepalive_expiry=config.keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(config.read_timeout, connect=config.connect_timeout)
+        # 指定 transport 時 limits/http2 必須設定在 transport 上
+        self.client = httpx.Client(
+            timeout=self.timeout,
+            transport=httpx.HTTPTransport(
+                limits=limits, http2=http2, retries=config.connect_retries
+            ),
+        )
+        self.async_client = httpx.AsyncClient(
+            timeout=self.timeout,
+            transport=httpx.AsyncHTTPTransport(
+                limits=limits, http2=http2, retries=config.connect_retries
+            ),
+        )
+        logger.debug(
+            f"[HTTP] Model connection pool: max {config.max_connections}, "
+            f"keep-alive {config.max_keepalive}, http2={http2}"
+        )
+
+    def model_kwargs(self) -> dict[str, Any]:
+        """
+        傳給 ChatOpenAI 的連線參數
+
+        Returns:
+            http_client、http_async_client、timeout 與 max_retries
+        """
+        return {
+            "http_client": self.client,
+            "http_async_client": self.async_client,
+            "timeout": self.timeout,
+            "max_retries": self.config.max_retries,
+        }
+
+    async def aclose(self):
+        """關閉連線池中的所有連線"""
+        self.client.close()
+        await self.async_client.aclose()
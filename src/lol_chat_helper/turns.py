@@ -0,0 +1,394 @@
+"""Per-turn time and step budget for the agent/tools loop."""
+
+import json
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END, MessagesState
+
+from lol_chat_helper.config import logger
+from lol_chat_helper.metrics import metrics
+from lol_chat_helper.nodes import LoggingToolNode, TokenBudgeter
+from lol_chat_helper.prompts import get_final_answer_prompt
+
+
+TURN_KEY = "turn"
+ROUTE_FINALIZE = "finalize"
+
+# 強制回答的原因
+REASON_DEADLINE = "deadline"
+REASON_STEPS = "steps"
+REASON_REPEAT = "repeat"
+DEADLINE_NOTE = "工具呼叫超過本回合的時間上限，已中止"
+FALLBACK_ANSWER = (
+    "抱歉，這一輪的查詢花了太久，來不及整理出完整的回答。"
+    "請稍後再問一次，或把問題拆成比較小的部分。"
+)
+
+
+class TurnState(MessagesState):
+    """MessagesState 加上本回合的起始資訊：{"id": 使用者訊息 id, "started": 開始時間}"""
+
+    turn: dict
+
+
+def _call_signature(tool_call: dict) -> str:
+    """工具名稱加上排序後的參數，用來比對重複的呼叫"""
+    args = json.dumps(tool_call.get("args", {}), sort_keys=True, ensure_ascii=False, default=str)
+    return f"{tool_call.get('name', '')}:{args}"
+
+
+def _current_turn(messages: list) -> list:
+    """最後一則使用者訊息之後的訊息（本回合）"""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return messages[i + 1:]
+    return list(messages)
+
+
+class TurnBudget:
+    """
+    每個回合的時間與步驟預算
+
+    回合開始時間記錄在 graph state 的 ``turn`` 中；步驟數（帶有工具呼叫的
+    AI 訊息數）與重複呼叫直接從本回合的訊息計算。預算用完時不再執行工具，
+    改由 finalize 節點根據已取得的資料強制產生最後的回答。
+
+    工具與模型呼叫（agent、planner、chat）都只能用到扣除回答保留時間後的
+    剩餘時間，finalize 則固定有 answer_reserve 秒，所以整個回合不會超過期限。
+    """
+
+    def __init__(
+        self,
+        deadline: float = 90.0,
+        max_steps: int = 6,
+        answer_reserve: float = 15.0
+    ):
+        """
+        初始化回合預算
+
+        Args:
+            deadline: 每回合的時間上限（秒，0 表示不限）
+            max_steps: 每回合最多的工具呼叫輪數（0 表示不限）
+            answer_reserve: 保留給最後回答的時間（秒）；剩餘時間少於此值時不再呼叫工具
+        """
+        self.deadline = deadline
+        self.max_steps = max_steps
+        self.answer_reserve = answer_reserve
+
+    def elapsed(self, state: dict) -> float:
+        """本回合已經過的秒數（沒有起始資訊時為 0）"""
+        turn = state.get(TURN_KEY) or {}
+        started = turn.get("started")
+        return time.time() - started if started else 0.0
+
+    def tool_time_left(self, state: dict) -> Optional[float]:
+        """
+        還可以花在工具上的秒數
+
+        Args:
+            state: 當前的 graph state
+
+        Returns:
+            扣除回答保留時間後的剩餘秒數；不限時間時回傳 None
+        """
+        if self.deadline <= 0:
+            return None
+        return self.deadline - self.answer_reserve - self.elapsed(state)
+
+    def exhausted(self, state: dict) -> Optional[str]:
+        """
+        判斷最後一則 AI 訊息的工具呼叫是否還能執行
+
+        Args:
+            state: 當前的 graph state
+
+        Returns:
+            需要強制回答的原因（deadline、steps、repeat），還有預算時回傳 None
+        """
+        time_left = self.tool_time_left(state)
+        if time_left is not None and time_left <= 0:
+            return REASON_DEADLINE
+
+        turn = _current_turn(state["messages"])
+        steps = [msg for msg in turn if isinstance(msg, AIMessage) and msg.tool_calls]
+        if self.max_steps > 0 and len(steps) > self.max_steps:
+            return REASON_STEPS
+
+        if steps and steps[-1] is turn[-1]:
+            earlier = {_call_signature(call) for msg in steps[:-1] for call in msg.tool_calls}
+            if all(_call_signature(call) in earlier for call in steps[-1].tool_calls):
+                return REASON_REPEAT
+        return None
+
+    def limit(
+        self,
+        node: Callable[[Any], Awaitable[dict]],
+        name: str
+    ) -> Callable[[TurnState], Awaitable[dict]]:
+        """
+        讓模型節點最多執行到回合的剩餘時間（扣除回答保留時間）
+
+        逾時的節點不產生訊息，只在 ``turn`` 中記錄被中止的節點；之後的路由
+        （guard）看到這個記錄就改走 finalize。
+
+        Args:
+            node: 非同步的模型節點（agent、planner、chat）
+            name: 節點名稱（日誌與指標用）
+
+        Returns:
+            受期限限制的節點函數
+        """
+        async def limited(state: TurnState) -> dict:
+            time_left = self.tool_time_left(state)
+            if time_left is None:
+                return await node(state)
+            if time_left > 0:
+                try:
+                    return await asyncio.wait_for(node(state), time_left)
+                except asyncio.TimeoutError:
+                    pass
+            metrics.incr(f"turn.model_cut.{name}")
+            logger.warning(f"[Turn] {name} model call cut off after {self.elapsed(state):.1f}s (turn deadline)")
+            return {TURN_KEY: {**(state.get(TURN_KEY) or {}), "cut": name}}
+
+        return limited
+
+    def guard(self, route: Callable[[MessagesState], str]) -> Callable[[TurnState], str]:
+        """
+        包裝 agent 之後的路由：要執行工具但預算已用完，或模型呼叫被中止時改走 finalize
+
+        Args:
+            route: 原本的路由函數（例如 tools_condition）
+
+        Returns:
+            可能回傳 ROUTE_FINALIZE 的路由函數
+        """
+        def guarded(state: TurnState) -> str:
+            if (state.get(TURN_KEY) or {}).get("cut"):
+                return ROUTE_FINALIZE
+            result = route(state)
+            if result == "tools":
+                reason = self.exhausted(state)
+                if reason is not None:
+                    return ROUTE_FINALIZE
+            elif result == END:
+                metrics.observe("turn.seconds", self.elapsed(state))
+            return result
+
+        return guarded
+
+    def after_tools(self, state: TurnState) -> str:
+        """工具執行完後：還有時間就交回 agent，否則直接強制回答"""
+        time_left = self.tool_time_left(state)
+        if time_left is not None and time_left <= 0:
+            return ROUTE_FINALIZE
+        return "agent"
+
+
+def create_turn_node(budget: TurnBudget) -> Callable[[TurnState], dict]:
+    """
+    建立回合開始節點：記錄這一回合的使用者訊息與開始時間
+
+    Args:
+        budget: 回合預算
+
+    Returns:
+        回合開始節點函數
+    """
+    def turn_node(state: TurnState) -> dict:
+        """
+        記錄回合開始時間
+
+        Args:
+            state: 當前的訊息狀態
+
+        Returns:
+            包含回合資訊的字典
+        """
+        last_human = next(
+            (msg for msg in reversed(state["messages"]) if isinstance(msg, HumanMessage)), None
+        )
+        return {TURN_KEY: {"id": getattr(last_human, "id", None), "started": time.time()}}
+
+    return turn_node
+
+
+def skipped_results(tool_calls: list[dict], text: str) -> list[ToolMessage]:
+    """
+    為沒有執行（或被中止）的工具呼叫補上錯誤結果，讓每個 tool_call 都有對應的 ToolMessage
+
+    Args:
+        tool_calls: 沒有結果的工具呼叫
+        text: 結果內容
+
+    Returns:
+        ToolMessage 列表
+    """
+    return [
+        ToolMessage(content=text, name=call["name"], tool_call_id=call["id"], status="error")
+        for call in tool_calls
+    ]
+
+
+def _pending_calls(message: Any) -> list[dict]:
+    """最後一則訊息是帶有工具呼叫的 AI 訊息時回傳這些呼叫"""
+    return message.tool_calls if isinstance(message, AIMessage) else []
+
+
+async def run_tool_calls(
+    tool_node: LoggingToolNode,
+    tool_calls: list[dict],
+    config: RunnableConfig,
+    timeout: Optional[float]
+) -> tuple[list[ToolMessage], list[dict]]:
+    """
+    每個工具呼叫各自以一個任務執行，期限到時保留已完成的結果
+
+    Args:
+        tool_node: 實際執行工具的 ToolNode
+        tool_calls: 要執行的工具呼叫
+        config: Graph 的執行設定
+        timeout: 最長等待秒數（None 表示不限）
+
+    Returns:
+        (依呼叫順序排列的 ToolMessage, 期限到時仍未完成而被取消的呼叫)
+    """
+    tasks = {
+        asyncio.ensure_future(
+            tool_node.ainvoke({"messages": [AIMessage(content="", tool_calls=[call])]}, config)
+        ): call
+        for call in tool_calls
+    }
+    if not tasks:
+        return [], []
+    try:
+        _, pending = await asyncio.wait(
+            tasks, timeout=max(timeout, 0.0) if timeout is not None else None
+        )
+    finally:
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    results: list[ToolMessage] = []
+    for task in tasks:
+        if task not in pending:
+            output = task.result()
+            results.extend(output["messages"] if isinstance(output, dict) else output)
+    return results, [tasks[task] for task in tasks if task in pending]
+
+
+def create_deadline_tool_node(
+    tool_node: LoggingToolNode,
+    budget: TurnBudget
+) -> Callable[[TurnState, RunnableConfig], Any]:
+    """
+    建立受回合期限限制的工具節點
+
+    工具呼叫最多執行到回合剩餘的時間（扣除回答保留時間）。每個呼叫各自執行，
+    期限到時已完成的結果照常保留，只有逾時的呼叫會被取消並回報為錯誤結果，
+    之後由 TurnBudget.after_tools 轉給 finalize。
+
+    Args:
+        tool_node: 實際執行工具的 ToolNode
+        budget: 回合預算
+
+    Returns:
+        非同步的工具節點函數
+    """
+    async def tools_node(state: TurnState, config: RunnableConfig) -> Any:
+        """
+        在期限內執行工具呼叫
+
+        Args:
+            state: 當前的訊息狀態
+            config: Graph 的執行設定
+
+        Returns:
+            工具執行結果
+        """
+        time_left = budget.tool_time_left(state)
+        if time_left is None:
+            return await tool_node.ainvoke(state, config)
+        results, cut = await run_tool_calls(
+            tool_node, _pending_calls(state["messages"][-1]), config, time_left
+        )
+        if cut:
+            metrics.incr("turn.tools_cut")
+            logger.warning(
+                f"[Turn] {len(cut)} tool call(s) cut off after {budget.elapsed(state):.1f}s "
+                f"(turn deadline), {len(results)} kept"
+            )
+        return {"messages": results + skipped_results(cut, DEADLINE_NOTE)}
+
+    return tools_node
+
+
+def create_finalize_node(
+    model: BaseChatModel,
+    system_prompt: str,
+    budget: TurnBudget,
+    budgeter: Optional[TokenBudgeter] = None
+) -> Callable[[TurnState], Awaitable[dict]]:
+    """
+    建立強制回答節點：預算用完時不綁定工具，根據已取得的資料直接回答
+
+    最後一則 AI 訊息仍有未執行的工具呼叫時，先補上「未執行」的工具結果，
+    對話記錄在下一回合仍然合法。回答最多花 answer_reserve 秒，逾時時改用
+    固定的道歉訊息，回合不會無限期地等待模型。
+
+    Args:
+        model: 語言模型實例（撰寫回答）
+        system_prompt: System prompt 內容
+        budget: 回合預算
+        budgeter: 呼叫模型前控制 prompt token 數（None 表示不限制）
+
+    Returns:
+        強制回答節點函數
+    """
+    async def finalize_node(state: TurnState) -> dict:
+        """
+        產生最後的回答
+
+        Args:
+            state: 當前的訊息狀態
+
+        Returns:
+            包含補上的工具結果與回答的字典
+        """
+        reason = budget.exhausted(state) or REASON_DEADLINE
+        skipped = skipped_results(
+            _pending_calls(state["messages"][-1]), "本回合的查詢預算已用完，這個工具呼叫沒有執行"
+        )
+
+        prompt = f"{system_prompt}\n\n{get_final_answer_prompt(reason)}"
+        messages = [SystemMessage(content=prompt)] + state["messages"] + skipped
+        if budgeter is not None:
+            messages = budgeter.fit(messages)
+        start = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                model.ainvoke(messages), budget.answer_reserve if budget.answer_reserve > 0 else None
+            )
+            metrics.observe("model.agent", time.monotonic() - start)
+        except asyncio.TimeoutError:
+            metrics.incr("turn.answer_timeout")
+            logger.warning(f"[Turn] Final answer timed out after {budget.answer_reserve:g}s, sending the fallback")
+            response = AIMessage(content=FALLBACK_ANSWER)
+
+        metrics.incr(f"turn.forced.{reason}")
+        metrics.observe("turn.seconds", budget.elapsed(state))
+        logger.info(
+            f"[Turn] Forced a final answer ({reason}) after {budget.elapsed(state):.1f}s, "
+            f"{len(skipped)} pending tool call(s) skipped"
+        )
+        return {"messages": skipped + [response]}
+
+    return finalize_node
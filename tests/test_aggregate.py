@@ -0,0 +1,61 @@
+"""測試本地比賽紀錄的向量化統計"""
+
+import math
+
+from lol_chat_helper.aggregate import MatchFrame, aggregate, format_stats
+
+
+MATCHES = [
+    {"champion": "Ahri", "position": "mid", "result": "WIN",
+     "stats": {"kill": 10, "death": 2, "assist": 6, "minion_kill": 200}, "created_at": "2025-01-06T10:00:00"},
+    {"champion": "Ahri", "position": "mid", "result": "LOSE",
+     "stats": {"kill": 2, "death": 0, "assist": 4, "minion_kill": 180}, "created_at": "2025-01-07T10:00:00"},
+    {"champion": "Lux", "position": "support", "result": "WIN",
+     "stats": {"kill": 1, "death": 3, "assist": 15}, "created_at": 1738400000000},
+]
+
+
+def test_from_matches_resolves_nested_fields():
+    frame = MatchFrame.from_matches(MATCHES)
+    assert len(frame) == 3
+    assert list(frame.win) == [1.0, 0.0, 1.0]
+    assert list(frame.kills) == [10.0, 2.0, 1.0]
+    assert list(frame.position) == ["MID", "MID", "SUPPORT"]
+    assert math.isnan(frame.cs[2])
+
+
+def test_aggregate_by_champion():
+    rows = aggregate(MatchFrame.from_matches(MATCHES), "champion")
+    ahri, lux = rows
+    assert (ahri["champion"], ahri["games"], ahri["wins"]) == ("Ahri", 2, 1)
+    assert ahri["win_rate"] == 0.5
+    assert ahri["kills"] == 6.0
+    # 死亡數平均低於 1 時以 1 計算 KDA
+    assert ahri["kda"] == (6.0 + 5.0) / 1.0
+    assert ahri["cs"] == 190.0
+    assert lux["champion"] == "Lux"
+    assert math.isnan(lux["cs"])
+
+
+def test_aggregate_by_period_and_none():
+    frame = MatchFrame.from_matches(MATCHES)
+    months = {row["month"]: row["games"] for row in aggregate(frame, "month")}
+    assert months == {"2025-01": 2, "2025-02": 1}
+    (total,) = aggregate(frame, "none")
+    assert (total["group"], total["games"]) == ("all", 3)
+    assert aggregate(MatchFrame.from_matches([]), "champion") == []
+
+
+def test_select_and_format():
+    frame = MatchFrame.from_matches(MATCHES)
+    wins = frame.select(frame.win == 1.0)
+    assert len(wins) == 2
+
+    text = format_stats(aggregate(wins, "position"), "勝場")
+    lines = text.splitlines()
+    assert lines[0] == "## 勝場"
+    assert lines[1].split("\t")[:4] == ["position", "games", "wins", "win_rate"]
+    assert lines[2].split("\t")[3] == "100.0%"
+    # 沒有資料的欄位留空
+    assert lines[-1].endswith("\t\t")
+    assert "沒有符合條件的比賽" in format_stats([], "勝場")
@@ -0,0 +1,88 @@
+"""測試 checkpoint 的記憶體上限、寫入磁碟與載回"""
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from lol_chat_helper.checkpoint import AccountedMemorySaver, ContentStore
+
+
+def _build(saver):
+    def node(state: MessagesState) -> dict:
+        call_id = f"c{len(state['messages'])}"
+        question = state["messages"][-1].content
+        return {"messages": [
+            AIMessage(content="", tool_calls=[{"name": "lol_list_items", "args": {}, "id": call_id}]),
+            ToolMessage(content=question * 3000, tool_call_id=call_id),
+        ]}
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("node", node)
+    graph.add_edge(START, "node")
+    graph.add_edge("node", END)
+    return graph.compile(checkpointer=saver)
+
+
+def _ask(app, thread_id, text):
+    app.invoke({"messages": [HumanMessage(text)]}, {"configurable": {"thread_id": thread_id}})
+
+
+def test_content_store_refcounts():
+    store = ContentStore()
+    digest = store.put("x" * 100)
+    assert store.put("x" * 100) == digest
+    assert store.put("x" * 100, digest) == digest
+    assert len(store) == 1
+
+    store.release(digest, 2)
+    assert store.get(digest) == "x" * 100
+    store.release(digest)
+    assert store.get(digest) is None
+    assert store.total_bytes == 0
+
+
+def test_spill_and_reload(tmp_path):
+    saver = AccountedMemorySaver(max_bytes=20_000, spill_dir=str(tmp_path), dedup_min_bytes=100)
+    app = _build(saver)
+    for thread_id in "abcd":
+        _ask(app, thread_id, f"{thread_id}?")
+
+    status = saver.status()
+    assert status["threads_spilled"] > 0
+    # 上限包含共用的工具結果內容
+    assert status["bytes"] == status["thread_bytes"] + status["shared_bytes"]
+    assert status["bytes"] <= 20_000
+    assert any(tmp_path.rglob("*.pkl"))
+
+    messages = app.get_state({"configurable": {"thread_id": "a"}}).values["messages"]
+    assert [m.content for m in messages if isinstance(m, ToolMessage)] == ["a?" * 3000]
+    assert "a" not in saver._spilled
+
+    saver.close()
+    assert not any(tmp_path.rglob("*.pkl"))
+
+
+def test_spilled_thread_releases_its_content(tmp_path):
+    saver = AccountedMemorySaver(max_bytes=1, spill_dir=str(tmp_path), dedup_min_bytes=100)
+    app = _build(saver)
+    _ask(app, "a", "a?")
+    _ask(app, "b", "b?")
+
+    # a 已寫入磁碟，只剩使用中的 b 的內容留在記憶體
+    assert saver.status()["threads_spilled"] == 1
+    assert len(saver.content_store) == 1
+
+    _ask(app, "a", "again?")
+    messages = app.get_state({"configurable": {"thread_id": "a"}}).values["messages"]
+    assert [len(m.content) for m in messages if isinstance(m, ToolMessage)] == [6000, 18000]
+    saver.close()
+
+
+def test_delete_thread_releases_content():
+    saver = AccountedMemorySaver(dedup_min_bytes=100)
+    app = _build(saver)
+    _ask(app, "a", "a?")
+    assert len(saver.content_store) == 1
+
+    saver.delete_thread("a")
+    assert len(saver.content_store) == 0
+    assert saver.status()["bytes"] == 0
@@ -0,0 +1,66 @@
+"""測試表格工具結果的精簡編碼"""
+
+import json
+
+import pytest
+from langchain_core.messages import ToolMessage
+
+from lol_chat_helper.encoding import ToolResultEncoder, encode_tabular
+from lol_chat_helper.tabular import TabularDecoder
+
+
+PAYLOAD = json.dumps({
+    "column_descriptions": {"name": "名稱", "price": "價格", "unused": "沒有出現的欄位"},
+    "data": {"items": {"headers": ["name", "price"], "rows": [["多蘭之劍", 450], ["a|b", None]]}},
+    "champion": "AHRI",
+}, ensure_ascii=False)
+
+
+def test_tsv_lists_headers_once_and_only_used_legend():
+    assert encode_tabular(PAYLOAD, "tsv") == (
+        "champion: AHRI\n\n"
+        "## items (2 rows)\n"
+        "name\tprice\n"
+        "多蘭之劍\t450\n"
+        "a|b\t\n\n"
+        "欄位說明:\n- name: 名稱\n- price: 價格"
+    )
+
+
+def test_markdown_escapes_pipes():
+    encoded = encode_tabular(PAYLOAD, "markdown", legend=False)
+    assert "| name | price |" in encoded
+    assert "| a\\|b |  |" in encoded
+    assert "欄位說明" not in encoded
+
+
+def test_json_is_compact_and_lossless():
+    assert json.loads(encode_tabular(PAYLOAD, "json")) == json.loads(PAYLOAD)
+
+
+def test_nested_container_matches_decoder_over_text():
+    # encode_tabular 以 json.loads 解析後走訪，結果要與逐值解碼一致
+    nested = json.dumps({"flat": json.loads(PAYLOAD), "note": "x"}, ensure_ascii=False)
+    full = TabularDecoder(json.loads(nested))
+    incremental = TabularDecoder(nested, limit=100)
+    assert [r.values for r in full] == [r.values for r in incremental]
+    assert full.extra == incremental.extra == {"flat.champion": "AHRI", "note": "x"}
+    assert "## items (2 rows)" in encode_tabular(nested)
+
+
+def test_unknown_encoding():
+    with pytest.raises(ValueError):
+        encode_tabular(PAYLOAD, "xml")
+
+
+def test_encoder_rewrites_only_tabular_results():
+    encoder = ToolResultEncoder({"*": {"encoding": "tsv"}, "raw_tool": {"encoding": "raw"}})
+
+    message = encoder(ToolMessage(content=PAYLOAD, name="lol_list_items", tool_call_id="1"))
+    assert message.content.startswith("champion: AHRI")
+
+    plain = ToolMessage(content="找不到召喚師", name="lol_list_items", tool_call_id="2")
+    assert encoder(plain) is plain
+
+    raw = ToolMessage(content=PAYLOAD, name="raw_tool", tool_call_id="3")
+    assert encoder(raw) is raw
@@ -0,0 +1,58 @@
+"""測試 fast path 的英雄辨識"""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Literal, Optional
+
+import pytest
+from langchain_core.tools import StructuredTool
+
+from lol_chat_helper.fastpath import FastPath
+
+
+ROOT = Path(__file__).resolve().parent.parent
+CHAMPIONS = (ROOT / "champion_list.json").read_text(encoding="utf-8")
+ANALYSIS = (ROOT / "lol_get_champion_analysis.json").read_text(encoding="utf-8")
+
+
+@pytest.fixture
+def fast_path():
+    async def lol_list_champions(lang: str) -> str:
+        return CHAMPIONS
+
+    async def lol_get_champion_analysis(
+        champion: Literal["AHRI", "SONA", "SION", "LEE_SIN", "TWISTED_FATE"],
+        game_mode: str,
+        lang: str,
+        position: Optional[str] = None
+    ) -> str:
+        return ANALYSIS
+
+    tools = [
+        StructuredTool.from_function(coroutine=f, name=f.__name__, description="d")
+        for f in (lol_list_champions, lol_get_champion_analysis)
+    ]
+    fast_path = FastPath.from_tools(tools)
+    asyncio.run(fast_path._load_champions())
+    return fast_path
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Ahri build", ["AHRI"]),
+    ("阿璃出裝", ["AHRI"]),
+    ("ahri出裝", ["AHRI"]),
+    ("lee sin core build", ["LEE_SIN"]),
+    ("Twisted Fate 出裝", ["TWISTED_FATE"]),
+    # 英文別名只比對完整的詞
+    ("personal build", []),
+    ("best build this version", []),
+    ("sona and sion", ["SION", "SONA"]),
+])
+def test_find_champions(fast_path, text, expected):
+    assert fast_path._find_champions(text) == expected
+
+
+def test_unrecognized_champion_falls_back(fast_path):
+    assert asyncio.run(fast_path.answer("personal build")) is None
+    assert asyncio.run(fast_path.answer("best build this version")) is None
@@ -0,0 +1,39 @@
+"""測試上游工具結果的 TTL 快取"""
+
+import asyncio
+import json
+
+from langchain_core.tools import StructuredTool
+
+from lol_chat_helper.hotcache import ResponseCache
+
+
+def _meta_tool():
+    calls = []
+
+    async def list_meta(position: str, desired_value_description: str = "") -> str:
+        calls.append(desired_value_description)
+        return json.dumps({"position": position, "fields": desired_value_description})
+
+    tool = StructuredTool.from_function(
+        coroutine=list_meta, name="lol_list_lane_meta_champions", description="List lane meta"
+    )
+    return tool, calls
+
+
+def test_desired_value_description_is_passed_through_and_keyed():
+    cache = ResponseCache({"lol_list_lane_meta_champions": 60})
+    tool, calls = _meta_tool()
+    wrapped = cache.wrap(tool, "lol_list_lane_meta_champions")
+
+    async def run():
+        first = await wrapped.ainvoke({"position": "mid", "desired_value_description": "win rate"})
+        again = await wrapped.ainvoke({"position": "mid", "desired_value_description": "win rate"})
+        other = await wrapped.ainvoke({"position": "mid", "desired_value_description": "ban rate"})
+        return first, again, other
+
+    first, again, other = asyncio.run(run())
+    assert calls == ["win rate", "ban rate"]
+    assert json.loads(first)["fields"] == "win rate"
+    assert again == first
+    assert json.loads(other)["fields"] == "ban rate"
@@ -0,0 +1,69 @@
+"""測試本地比賽紀錄庫的同步與工具包裝"""
+
+import asyncio
+import json
+import threading
+
+from langchain_core.tools import StructuredTool
+
+from lol_chat_helper.matches import MATCH_LIST_TOOL, MatchStore
+
+
+def _match_tool(responses):
+    calls = []
+
+    async def list_matches(game_name: str, tag_line: str, region: str, limit: int = 20) -> str:
+        calls.append(limit)
+        return responses.pop(0)
+
+    tool = StructuredTool.from_function(
+        coroutine=list_matches, name=MATCH_LIST_TOOL, description="List matches"
+    )
+    return tool, calls
+
+
+def _matches(*ids):
+    return json.dumps({"data": [{"game_id": i, "created_at": f"2025-01-0{i}"} for i in ids]})
+
+
+ARGS = {"game_name": "Hide on bush", "tag_line": "KR1", "region": "KR", "limit": 2}
+
+
+def test_non_match_result_is_returned_without_a_second_call():
+    store = MatchStore(":memory:")
+    tool, calls = _match_tool(["找不到召喚師", "second call"])
+    wrapped = store.wrap(tool, MATCH_LIST_TOOL)
+
+    assert asyncio.run(wrapped.ainvoke(ARGS)) == "找不到召喚師"
+    assert calls == [2]
+
+
+def test_sync_then_serve_locally():
+    store = MatchStore(":memory:")
+    tool, calls = _match_tool([_matches(1, 2)])
+    wrapped = store.wrap(tool, MATCH_LIST_TOOL)
+
+    first = json.loads(asyncio.run(wrapped.ainvoke(ARGS)))
+    second = json.loads(asyncio.run(wrapped.ainvoke(ARGS)))
+    assert calls == [2]
+    assert [row[0] for row in first["data"]["matches"]["rows"]] == [2, 1]
+    assert second == first
+
+
+def test_store_access_runs_off_the_event_loop(monkeypatch):
+    store = MatchStore(":memory:")
+    tool, _ = _match_tool([_matches(1, 2)])
+    wrapped = store.wrap(tool, MATCH_LIST_TOOL)
+    threads = set()
+
+    for name in ("summoner", "known_ids", "add_matches", "render"):
+        original = getattr(store, name)
+
+        def recorded(*args, _original=original):
+            threads.add(threading.current_thread())
+            return _original(*args)
+
+        monkeypatch.setattr(store, name, recorded)
+
+    asyncio.run(wrapped.ainvoke(ARGS))
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,55 @@
+"""測試規劃結果的解析與批次排程"""
+
+from lol_chat_helper.planning import parse_plan, schedule
+
+
+TOOLS = {"lol_get_champion_analysis", "lol_list_items"}
+
+
+def _ids(waves):
+    return [[step["id"] for step in wave] for wave in waves]
+
+
+def test_independent_steps_share_a_wave():
+    steps = [
+        {"id": "a", "tool": "lol_list_items", "args": {}, "after": []},
+        {"id": "b", "tool": "lol_get_champion_analysis", "args": {}, "after": []},
+        {"id": "c", "tool": "lol_list_items", "args": {}, "after": ["a", "b"]},
+        {"id": "d", "tool": "lol_list_items", "args": {}, "after": ["c"]},
+    ]
+    assert _ids(schedule(steps)) == [["a", "b"], ["c"], ["d"]]
+
+
+def test_cyclic_steps_are_dropped():
+    steps = [
+        {"id": "a", "tool": "lol_list_items", "args": {}, "after": []},
+        {"id": "b", "tool": "lol_list_items", "args": {}, "after": ["c"]},
+        {"id": "c", "tool": "lol_list_items", "args": {}, "after": ["b"]},
+    ]
+    assert _ids(schedule(steps)) == [["a"]]
+    assert schedule([]) == []
+
+
+def test_parse_plan_filters_unknown_tools_and_dependencies():
+    text = """```json
+    {"steps": [
+      {"id": "s1", "tool": "lol_list_items", "args": {"lang": "zh_TW"}},
+      {"id": "s2", "tool": "not_a_tool", "args": {}},
+      {"id": "s3", "tool": "lol_get_champion_analysis", "args": "bad", "after": ["s1", "s2", "s3"]}
+    ]}
+    ```"""
+    steps = parse_plan(text, TOOLS)
+    assert [(s["id"], s["args"], s["after"]) for s in steps] == [
+        ("s1", {"lang": "zh_TW"}, []),
+        ("s3", {}, ["s1"]),
+    ]
+
+
+def test_parse_plan_limits_and_failures():
+    text = '{"steps": [' + ",".join(
+        f'{{"id": "s{i}", "tool": "lol_list_items"}}' for i in range(5)
+    ) + "]}"
+    assert len(parse_plan(text, TOOLS, max_steps=2)) == 2
+    assert parse_plan('{"steps": []}', TOOLS) == []
+    assert parse_plan("不需要工具", TOOLS) is None
+    assert parse_plan('{"steps": [}', TOOLS) is None
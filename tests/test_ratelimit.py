@@ -0,0 +1,81 @@
+"""測試 token bucket 與速率限制"""
+
+import asyncio
+
+import pytest
+
+from lol_chat_helper.ratelimit import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimitExceeded, RateLimiter, TokenBucket,
+)
+
+
+def test_burst_then_wait():
+    async def scenario():
+        bucket = TokenBucket("test", rate=50, burst=2)
+        assert await bucket.acquire() == 0.0
+        assert await bucket.acquire() == 0.0
+        waited = await bucket.acquire()
+        assert 0.0 < waited < 0.2
+
+    asyncio.run(scenario())
+
+
+def test_interactive_callers_go_first():
+    async def scenario():
+        bucket = TokenBucket("test", rate=20, burst=1)
+        await bucket.acquire()
+        order = []
+
+        async def caller(name, priority):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        await asyncio.gather(
+            caller("batch-1", PRIORITY_BATCH),
+            caller("batch-2", PRIORITY_BATCH),
+            caller("user", PRIORITY_INTERACTIVE),
+        )
+        return order
+
+    assert asyncio.run(scenario()) == ["user", "batch-1", "batch-2"]
+
+
+def test_max_wait_and_try_acquire():
+    async def scenario():
+        bucket = TokenBucket("test", rate=0.1, burst=1, max_wait=0.05)
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        with pytest.raises(RateLimitExceeded):
+            await bucket.acquire()
+
+    asyncio.run(scenario())
+
+
+def test_tool_timeout_keeps_the_server_token():
+    async def scenario():
+        limiter = RateLimiter({
+            "opgg-mcp": {
+                "rate": 0.1, "burst": 3, "maxWait": 0.05,
+                "tools": {"lol_list_items": {"rate": 0.1, "burst": 1}},
+            }
+        })
+        await limiter.acquire("opgg-mcp", "lol_list_items")
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire("opgg-mcp", "lol_list_items")
+        # 工具 bucket 排隊逾時，伺服器的 token 沒有被消耗
+        assert limiter.status()["opgg-mcp"]["tokens"] == pytest.approx(2, abs=0.01)
+        assert not limiter.try_acquire("opgg-mcp", "lol_list_items")
+        assert limiter.status()["opgg-mcp"]["tokens"] == pytest.approx(2, abs=0.01)
+        assert limiter.try_acquire("opgg-mcp", "lol_get_champion_analysis")
+
+    asyncio.run(scenario())
+
+
+def test_unconfigured_servers_are_not_limited():
+    async def scenario():
+        limiter = RateLimiter({})
+        for _ in range(100):
+            await limiter.acquire("other", "tool")
+        assert limiter.try_acquire("other", "tool")
+
+    asyncio.run(scenario())
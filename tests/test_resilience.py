@@ -0,0 +1,60 @@
+"""測試斷路器狀態轉換"""
+
+from lol_chat_helper import resilience
+from lol_chat_helper.resilience import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_opens_after_threshold(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock.monotonic)
+    breaker = CircuitBreaker("opgg-mcp", failure_threshold=2, recovery_timeout=30)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_allows_a_single_probe(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock.monotonic)
+    breaker = CircuitBreaker("opgg-mcp", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+
+    clock.now += 31
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    # 試探失敗立即重新開啟
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock.now += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_cancelled_probe_is_released(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock.monotonic)
+    breaker = CircuitBreaker("opgg-mcp", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock.now += 31
+
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
@@ -0,0 +1,42 @@
+"""測試閒聊／查詢路由"""
+
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from lol_chat_helper.fastpath import FAST_PATH_KEY, route_after_fast_path
+from lol_chat_helper.nodes import ROUTE_AGENT, ROUTE_CHAT, classify_turn, create_routing_node
+
+
+class AsyncOnlyModel(GenericFakeChatModel):
+    """同步呼叫會阻塞事件迴圈，路由只能使用 ainvoke"""
+
+    def invoke(self, *args, **kwargs):
+        raise AssertionError("router must not call the model synchronously")
+
+
+def _route(route, text):
+    return asyncio.run(route({"messages": [HumanMessage(text)]}))
+
+
+def test_undecided_turns_ask_the_router_model_asynchronously():
+    model = AsyncOnlyModel(messages=iter([AIMessage("chat"), AIMessage("tools")]))
+    route = create_routing_node([], model)
+    assert _route(route, "你覺得呢") == ROUTE_CHAT
+    assert _route(route, "你覺得呢") == ROUTE_AGENT
+
+
+def test_fast_path_route_awaits_the_entry_route():
+    route = route_after_fast_path(create_routing_node([]), ROUTE_AGENT)
+    assert _route(route, "謝謝") == ROUTE_CHAT
+    answered = {"messages": [HumanMessage("x"), AIMessage("y", response_metadata={FAST_PATH_KEY: "build"})]}
+    assert asyncio.run(route(answered)) == "__end__"
+
+
+def test_english_keywords_inside_chinese_sentences():
+    for text in ("那build呢", "李星build", "這版本ban誰", "Ahri的KDA多少", "最新meta是什麼"):
+        assert classify_turn(text, set(), followup=False) == ROUTE_AGENT, text
+    # 英文單字內的關鍵字仍然不算
+    assert classify_turn("banana bread", set(), followup=False) is None
+    assert classify_turn("hi there", set(), followup=False) == ROUTE_CHAT
@@ -0,0 +1,84 @@
+"""測試 headers/rows 增量解碼"""
+
+import json
+
+from lol_chat_helper.tabular import (
+    TabularDecoder, decode_sections, find_map, is_tabular, iter_rows, nest_extra, parse_ids,
+)
+
+
+PAYLOAD = json.dumps({
+    "column_descriptions": {"name": "名稱", "price": "價格"},
+    "data": {
+        "items": {"headers": ["name", "price"], "rows": [["多蘭之劍", 450], ["無盡之刃", 3400], ["守護天使", 3200]]},
+        "runes": {"rows": [["征服者"]], "headers": ["name"]},
+        "metadata_maps": {"champion_ids": {"103": "Ahri"}},
+    },
+    "champion": "AHRI",
+}, ensure_ascii=False)
+
+
+def test_decodes_rows_descriptions_and_extra():
+    decoder = TabularDecoder(PAYLOAD)
+    rows = [(row.section, row.as_dict()) for row in decoder]
+
+    assert rows == [
+        ("items", {"name": "多蘭之劍", "price": 450}),
+        ("items", {"name": "無盡之刃", "price": 3400}),
+        ("items", {"name": "守護天使", "price": 3200}),
+        # rows 在 headers 之前也能正確對應
+        ("runes", {"name": "征服者"}),
+    ]
+    assert decoder.column_descriptions == {"name": "名稱", "price": "價格"}
+    assert decoder.extra["champion"] == "AHRI"
+    assert decoder.exhausted
+
+
+def test_sections_filter_and_limit():
+    rows = list(iter_rows(PAYLOAD, sections=["items"], where=lambda row: row["price"] > 1000, limit=1))
+    assert [row.values for row in rows] == [["無盡之刃", 3400]]
+
+    decoder = TabularDecoder(PAYLOAD, where={"name": "守護天使"})
+    assert [row.values for row in decoder] == [["守護天使", 3200]]
+    assert decoder.rows_seen == 4
+
+
+def test_limit_stops_before_the_rest_is_read():
+    # 第一列之後的資料是截斷的，limit 達到後不會再讀取
+    truncated = PAYLOAD[:PAYLOAD.index('["無盡之刃"') + 3]
+    decoder = TabularDecoder(truncated, limit=1)
+    assert len(list(decoder)) == 1
+    assert not decoder.exhausted
+
+
+def test_chunked_source_matches_full_string():
+    chunks = [PAYLOAD[i:i + 7] for i in range(0, len(PAYLOAD), 7)]
+    assert [r.values for r in iter_rows(chunks)] == [r.values for r in iter_rows(PAYLOAD)]
+
+
+def test_full_read_and_incremental_read_agree():
+    # 沒有 limit 時走 json.loads；給一個用不到的 limit 則強制逐值解碼
+    for kwargs in ({}, {"sections": ["runes"]}):
+        full = TabularDecoder(PAYLOAD, **kwargs)
+        incremental = TabularDecoder(PAYLOAD, limit=100, **kwargs)
+        assert [(r.section, r.values) for r in full] == [(r.section, r.values) for r in incremental]
+        assert full.extra == incremental.extra
+        assert full.column_descriptions == incremental.column_descriptions
+        assert full.rows_seen == incremental.rows_seen
+        assert full.exhausted and incremental.exhausted
+
+
+def test_decode_sections_and_helpers():
+    sections, extra = decode_sections(PAYLOAD)
+    assert list(sections) == ["items", "runes"]
+    assert find_map(extra, "champion_ids") == {"103": "Ahri"}
+    assert find_map(extra, "missing") == {}
+    assert nest_extra({"a.b": 1, "c": 2}) == {"a": {"b": 1}, "c": 2}
+    assert parse_ids("[3118,4645]") == ["3118", "4645"]
+    assert parse_ids([1, 2]) == ["1", "2"]
+    assert parse_ids("not json") == []
+
+
+def test_is_tabular():
+    assert is_tabular(PAYLOAD)
+    assert not is_tabular("找不到召喚師")